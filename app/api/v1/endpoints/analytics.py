@@ -0,0 +1,34 @@
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, status
+from typing import Optional
+
+from app.domain.models import AnalyticsGranularity, DecisionAnalytics
+from app.usecases.analytics import AnalyticsService
+
+router = APIRouter()
+
+@router.get(
+    "/",
+    response_model=DecisionAnalytics,
+    summary="Get decision analytics",
+    description="Approval rates, amount and term distributions and unique applicants per hour or day"
+)
+async def get_decision_analytics(
+    granularity: AnalyticsGranularity = AnalyticsGranularity.HOUR,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> DecisionAnalytics:
+    """
+    Get decision analytics for each window from start to end, and combined.
+    
+    Windows are aligned to UTC hours or days, and start defaults to 24
+    windows before end (now by default). Served from rollups kept up to date
+    as decisions are made, so the cost depends on the number of windows,
+    not of applications.
+    """
+    try:
+        analytics = await AnalyticsService.get(granularity, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    return DecisionAnalytics(**analytics)
@@ -1,18 +1,115 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Optional
+import json
+import math
+from datetime import datetime
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+from typing import Callable, List, Optional
 from uuid import UUID
 
 from app.domain.models import (
     LoanApplicationCreate,
     LoanApplicationInDB,
-    ApplicationStatus
+    ApplicationStatus,
+    ApplicationExportFilter,
+    ApplicationHistoryPage,
+    ApplicationStatusBatchRequest,
+    ApplicationStatusBatchResponse
 )
 from app.usecases.application_handlers import LoanApplicationService
+from app.usecases import idempotency
+from app.usecases.bulk_submission import BulkSubmissionService
+from app.usecases.export import MEDIA_TYPES, ExportFormat, ExportService, export_filename
+from app.usecases.status_stream import StatusStreamService
 from app.infrastructure.messaging.kafka_client import kafka_client
+from app.core.admission import admission_controller, submission_slot
 from app.core.config import settings
 
 router = APIRouter()
 
+class _Slots:
+    """Counts the responses holding one of a limited number of slots.
+    
+    Slots are taken without waiting, before the response is returned, so
+    requests over the limit are refused rather than queued.
+    """
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.taken = 0
+    
+    def try_acquire(self) -> bool:
+        if self.taken >= self.limit:
+            return False
+        self.taken += 1
+        return True
+    
+    def release(self) -> None:
+        self.taken -= 1
+
+class _SlotStreamingResponse(StreamingResponse):
+    """Streaming response that gives back its slot once sent, or abandoned"""
+    def __init__(self, content, release: Callable[[], None], **kwargs):
+        super().__init__(content, **kwargs)
+        self.release = release
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
+
+# Caps the exports running at once in this worker, so they can't take
+# every database connection
+_export_slots = _Slots(settings.EXPORT_MAX_CONCURRENT)
+
+# Caps the status streams held open at once by this worker
+_stream_slots = _Slots(settings.STATUS_STREAM_MAX_CONNECTIONS)
+
+def _event_stream(events) -> StreamingResponse:
+    """Serve server-sent events, or raise if the worker holds too many streams"""
+    if not settings.STATUS_STREAM_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Status streaming is disabled")
+    if not _stream_slots.try_acquire():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many open status streams, try again later",
+            headers={"Retry-After": str(math.ceil(settings.STATUS_STREAM_RETRY_MS / 1000))}
+        )
+    
+    return _SlotStreamingResponse(
+        events,
+        _stream_slots.release,
+        media_type="text/event-stream",
+        # Keep caches and proxies from holding events back
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Whether an If-None-Match header matches the ETag, using weak comparison"""
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+class DuplexStreamingResponse(StreamingResponse):
+    """Streaming response that may be sent while the request body is still being read.
+    
+    StreamingResponse normally listens for client disconnects by draining
+    ``receive``, which would swallow the request body chunks the response
+    generator is still consuming. Disconnects surface through
+    ``request.stream()`` instead.
+    """
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+class _SlotDuplexStreamingResponse(_SlotStreamingResponse, DuplexStreamingResponse):
+    """Duplex streaming response that gives back its slot once sent, or abandoned"""
+
 @router.post(
     "/",
     response_model=LoanApplicationInDB,
@@ -21,13 +118,51 @@ router = APIRouter()
     description="Submits a new loan application for processing"
 )
 async def create_application(
-    application: LoanApplicationCreate
+    application: LoanApplicationCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    _slot: None = Depends(submission_slot)
 ) -> LoanApplicationInDB:
     """
     Submit a new loan application.
     
-    The application will be sent to Kafka for asynchronous processing.
+    The application will be sent to Kafka for asynchronous processing,
+    keyed by applicant ID so that an applicant's applications stay ordered.
+    Retries carrying the same Idempotency-Key get the original response back
+    instead of submitting the application again, whatever the applicant's
+    rate limit. Answers 503 while the service is overloaded and 429 once
+    the applicant's rate limit is spent, with Retry-After in both cases.
     """
+    body_fingerprint = None
+    if idempotency_key is not None:
+        if not idempotency_key or len(idempotency_key) > settings.IDEMPOTENCY_KEY_MAX_LENGTH:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Idempotency-Key must be 1 to {settings.IDEMPOTENCY_KEY_MAX_LENGTH} characters"
+            )
+        body_fingerprint = idempotency.fingerprint(application.dict())
+        try:
+            replay = await idempotency.claim(application.applicant_id, idempotency_key, body_fingerprint)
+        except idempotency.IdempotencyKeyMismatch as e:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+        except idempotency.IdempotencyKeyInUse:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still being processed"
+            )
+        if replay is not None:
+            response.headers["Idempotent-Replayed"] = "true"
+            return replay
+    
+    # Only after a replay was ruled out, so retries of accepted requests
+    # aren't rate limited
+    try:
+        await admission_controller.check_rate_limit(application.applicant_id)
+    except HTTPException:
+        if idempotency_key is not None:
+            await idempotency.release(application.applicant_id, idempotency_key)
+        raise
+    
     # Create the application
     db_application = await LoanApplicationService.create_application(application)
     
@@ -35,16 +170,206 @@ async def create_application(
     try:
         await kafka_client.send_message(
             topic=settings.KAFKA_APPLICATION_TOPIC,
-            value=application.dict()
+            value=db_application.dict(),
+            key=application.applicant_id.encode('utf-8')
         )
     except Exception as e:
+        if idempotency_key is not None:
+            await idempotency.release(application.applicant_id, idempotency_key)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to submit application: {str(e)}"
         )
     
+    if idempotency_key is not None:
+        await idempotency.complete(
+            application.applicant_id, idempotency_key, body_fingerprint, jsonable_encoder(db_application)
+        )
     return db_application
 
+@router.post(
+    "/bulk",
+    status_code=status.HTTP_200_OK,
+    response_class=DuplexStreamingResponse,
+    summary="Submit loan applications in bulk",
+    description=(
+        "Accepts an NDJSON or JSON array body of applications and streams back "
+        "one NDJSON result per record, in upload order"
+    )
+)
+async def create_applications_bulk(request: Request) -> DuplexStreamingResponse:
+    """
+    Submit many loan applications in one streamed upload.
+    
+    Records are validated and published to Kafka as they arrive, so memory use
+    does not grow with the size of the upload. Each result line carries the
+    record's index and a status of ``accepted``, ``rejected`` (invalid record)
+    or ``failed`` (could not be published). The upload takes one in-flight
+    slot and is refused with 503 while the service is overloaded.
+    """
+    admission_controller.acquire()
+    
+    async def results():
+        async for result in BulkSubmissionService.submit(request.stream()):
+            yield json.dumps(result) + "\n"
+    
+    return _SlotDuplexStreamingResponse(
+        results(), admission_controller.release, media_type="application/x-ndjson"
+    )
+
+@router.post(
+    "/status:batch",
+    response_model=ApplicationStatusBatchResponse,
+    summary="Get application statuses in bulk",
+    description="Retrieves the status of the most recent application for each of the given applicant IDs"
+)
+async def get_application_statuses(
+    request: ApplicationStatusBatchRequest
+) -> ApplicationStatusBatchResponse:
+    """
+    Get the status of the most recent loan application for many applicants at once.
+    
+    Applicants without an application map to null.
+    """
+    if len(request.applicant_ids) > settings.STATUS_BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.STATUS_BATCH_MAX_IDS} applicant IDs can be looked up at once"
+        )
+    
+    applications = await LoanApplicationService.get_application_statuses(request.applicant_ids)
+    return ApplicationStatusBatchResponse(applications=applications)
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    summary="Export applications",
+    description="Streams the applications matching the filters as NDJSON, CSV or Parquet"
+)
+async def export_applications(
+    export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+    status_filter: Optional[ApplicationStatus] = Query(None, alias="status"),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    processed_from: Optional[datetime] = None,
+    processed_to: Optional[datetime] = None
+) -> StreamingResponse:
+    """
+    Export applications in created_at order.
+    
+    Lower bounds are inclusive and upper bounds exclusive. Rows are streamed
+    from a server-side cursor, so exports of any size use constant memory.
+    """
+    export_filter = ApplicationExportFilter(
+        status=status_filter,
+        created_from=created_from,
+        created_to=created_to,
+        processed_from=processed_from,
+        processed_to=processed_to
+    )
+    try:
+        chunks = ExportService.stream(export_format, export_filter)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if not _export_slots.try_acquire():
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many exports in progress, try again later"
+        )
+    
+    return _SlotStreamingResponse(
+        chunks,
+        _export_slots.release,
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{export_filename(export_format)}"'}
+    )
+
+@router.get(
+    "/{applicant_id}/events",
+    response_class=StreamingResponse,
+    summary="Stream application status",
+    description="Streams the status of the applicant's most recent application as server-sent events"
+)
+async def stream_application_status(
+    applicant_id: str,
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID")
+) -> StreamingResponse:
+    """
+    Stream an applicant's application status instead of polling for it.
+    
+    Sends the current status, if any, then a ``status`` event for every new
+    decision, with the application ID as the event ID. Idle streams get a
+    comment line every STATUS_STREAM_HEARTBEAT_SECONDS. Answers 503 with
+    Retry-After while the worker holds STATUS_STREAM_MAX_CONNECTIONS streams.
+    """
+    return _event_stream(StatusStreamService.applicant_events(applicant_id, last_event_id))
+
+@router.get(
+    "/by-id/{application_id}/events",
+    response_class=StreamingResponse,
+    summary="Stream an application's status",
+    description="Streams the decision on an application as a server-sent event"
+)
+async def stream_application(
+    application_id: UUID,
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID")
+) -> StreamingResponse:
+    """
+    Wait for the decision on an application without polling for it.
+    
+    Sends a ``status`` event as soon as the application is decided, or
+    straight away if it already is.
+    """
+    return _event_stream(StatusStreamService.application_events(application_id, last_event_id))
+
+@router.get(
+    "/{applicant_id}/history",
+    response_model=ApplicationHistoryPage,
+    summary="List an applicant's applications",
+    description="Lists an applicant's applications, newest first, one page at a time"
+)
+async def get_application_history(
+    applicant_id: str,
+    limit: int = Query(settings.HISTORY_PAGE_SIZE, ge=1, le=settings.HISTORY_PAGE_MAX_SIZE),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page")
+) -> ApplicationHistoryPage:
+    """
+    List an applicant's loan applications, newest first.
+    
+    Pass the returned next_cursor to get the following page; it is null on
+    the last page.
+    """
+    try:
+        applications, next_cursor = await LoanApplicationService.get_application_history(
+            applicant_id, limit, cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    return ApplicationHistoryPage(applications=applications, next_cursor=next_cursor)
+
+@router.get(
+    "/by-id/{application_id}",
+    response_model=LoanApplicationInDB,
+    summary="Get an application",
+    description="Retrieves a processed application by its ID"
+)
+async def get_application(
+    application_id: UUID
+) -> LoanApplicationInDB:
+    """
+    Get a loan application by the ID returned when it was submitted.
+    """
+    application = await LoanApplicationService.get_application(application_id)
+    
+    if not application:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No processed application found with this ID"
+        )
+    
+    return application
+
 @router.get(
     "/{applicant_id}",
     response_model=LoanApplicationInDB,
@@ -52,18 +377,28 @@ async def create_application(
     description="Retrieves the status of the most recent application for the given applicant ID"
 )
 async def get_application_status(
-    applicant_id: str
-) -> LoanApplicationInDB:
+    applicant_id: str,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match")
+) -> Response:
     """
     Get the status of the most recent loan application for an applicant.
+    
+    The cached response body is sent as is, with an ETag; requests whose
+    If-None-Match carries that ETag get 304 and no body.
     """
     # Try to get from cache/database
-    app_status = await LoanApplicationService.get_application_status(applicant_id)
+    cached = await LoanApplicationService.get_application_status_response(applicant_id)
     
-    if not app_status:
+    if not cached:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No application found for this applicant ID"
         )
     
-    return app_status
+    etag, body = cached
+    # Clients may cache the status but must check it is still current
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match is not None and _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    # Already serialized from a validated model, so response_model is bypassed
+    return Response(body, media_type="application/json", headers=headers)
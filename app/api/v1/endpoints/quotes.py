@@ -0,0 +1,61 @@
+import json
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from typing import Optional
+
+from app.domain.models import Quote, QuoteBatchRequest, QuoteBatchResponse
+from app.usecases.quotes import quote_engine
+
+router = APIRouter()
+
+@router.post(
+    "/",
+    response_model=QuoteBatchResponse,
+    summary="Quote loans",
+    description="Monthly payment and totals for each of the given (amount, term, rate) combinations"
+)
+async def create_quotes(request: QuoteBatchRequest) -> QuoteBatchResponse:
+    """
+    Quote many loans at once, e.g. to compare what-if scenarios.
+
+    A combination without an annual rate is quoted at the rate band the
+    decision engine would give it. Quotes are computed together in one
+    vectorized pass and cached, so repeated combinations are free.
+    """
+    try:
+        quotes = quote_engine.quote_many(
+            [(quote.amount, quote.term_months, quote.annual_rate) for quote in request.quotes]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return QuoteBatchResponse(quotes=[Quote(**quote) for quote in quotes])
+
+@router.get(
+    "/schedule",
+    response_class=StreamingResponse,
+    summary="Get an amortization schedule",
+    description="Streams the month by month amortization schedule of a loan as NDJSON"
+)
+async def get_amortization_schedule(
+    amount: float = Query(..., gt=0),
+    term_months: int = Query(..., ge=1),
+    annual_rate: Optional[float] = Query(None, ge=0, le=1)
+) -> StreamingResponse:
+    """
+    Get the amortization schedule of a loan, one line per month.
+
+    Each line has the month's payment, how it splits into principal and
+    interest, and the balance left. The schedule is computed and sent in
+    chunks of months, so long terms don't have to be built in full first.
+    """
+    try:
+        chunks = quote_engine.schedule(amount, term_months, annual_rate)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    def lines():
+        for rows in chunks:
+            yield "".join(json.dumps(row) + "\n" for row in rows)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
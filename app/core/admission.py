@@ -0,0 +1,103 @@
+"""
+Admission control for the submission endpoints.
+
+Submissions are turned away straight away, with 503 and Retry-After, once
+ADMISSION_MAX_IN_FLIGHT are being handled by this worker or the producer
+has ADMISSION_MAX_PRODUCER_PENDING records awaiting acknowledgement. The
+requests that are admitted then keep their latency when Kafka slows down,
+instead of every request queueing until it times out. Each applicant is
+also rate limited by a token bucket in Redis and gets 429 once it is empty.
+"""
+import math
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.core.metrics import ADMISSION_REJECTIONS, SUBMISSIONS_IN_FLIGHT
+from app.infrastructure.cache.redis_client import redis_cache
+from app.infrastructure.messaging.kafka_client import kafka_client
+
+_REJECTED_IN_FLIGHT = ADMISSION_REJECTIONS.labels("in_flight")
+_REJECTED_PRODUCER_BACKLOG = ADMISSION_REJECTIONS.labels("producer_backlog")
+_REJECTED_RATE_LIMITED = ADMISSION_REJECTIONS.labels("rate_limited")
+
+
+def _overloaded(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=detail,
+        headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER_SECONDS)}
+    )
+
+
+class AdmissionController:
+    """Caps the submissions handled at once by this worker"""
+
+    def __init__(self):
+        self.in_flight = 0
+
+    def check_capacity(self) -> None:
+        """Raise a 503 if a new submission should be shed"""
+        max_in_flight = settings.ADMISSION_MAX_IN_FLIGHT
+        if max_in_flight and self.in_flight >= max_in_flight:
+            _REJECTED_IN_FLIGHT.inc()
+            raise _overloaded("Too many submissions in progress, try again later")
+        max_pending = settings.ADMISSION_MAX_PRODUCER_PENDING
+        if max_pending and kafka_client.pending_deliveries >= max_pending:
+            _REJECTED_PRODUCER_BACKLOG.inc()
+            raise _overloaded("Submissions are backed up, try again later")
+
+    def acquire(self) -> None:
+        """Take one in-flight slot, or raise a 503 if the worker is at capacity"""
+        self.check_capacity()
+        self.in_flight += 1
+        SUBMISSIONS_IN_FLIGHT.inc()
+
+    def release(self) -> None:
+        """Give back a slot taken with acquire"""
+        self.in_flight -= 1
+        SUBMISSIONS_IN_FLIGHT.dec()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one in-flight slot, or raise a 503 if the worker is at capacity"""
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def check_rate_limit(self, applicant_id: str) -> None:
+        """Raise a 429 if the applicant has used up its token bucket.
+
+        Fails open if Redis is unavailable.
+        """
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        try:
+            allowed, wait = await redis_cache.take_token(
+                f"rate:{applicant_id}",
+                settings.RATE_LIMIT_PER_APPLICANT_PER_SECOND,
+                settings.RATE_LIMIT_PER_APPLICANT_BURST
+            )
+        except Exception as e:
+            print(f"Error checking rate limit, admitting the request: {e}")
+            return
+        if not allowed:
+            _REJECTED_RATE_LIMITED.inc()
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many submissions for this applicant, try again later",
+                headers={"Retry-After": str(max(1, math.ceil(wait)))}
+            )
+
+
+admission_controller = AdmissionController()
+
+
+async def submission_slot() -> AsyncIterator[None]:
+    """Dependency holding an in-flight slot for the duration of a submission"""
+    async with admission_controller.slot():
+        yield
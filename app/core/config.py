@@ -1,19 +1,72 @@
 import os
 from functools import lru_cache
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import List, Optional
 
 class Settings(BaseSettings):
     # App
     APP_ENV: str = "development"
     DEBUG: bool = True
     
+    # Decision rules: path to a JSON rule table, or None for the built-in rules
+    DECISION_RULES_PATH: Optional[str] = None
+    DECISION_EXPOSURE_WINDOW_DAYS: int = 365  # Approvals this recent count towards an applicant's exposure
+    
+    # Metrics: /metrics on the API; the consumer serves its own on this port
+    METRICS_ENABLED: bool = True
+    METRICS_CONSUMER_PORT: int = 9100
+    
+    # Profiling: requests sending PROFILING_HEADER (with PROFILING_TOKEN, if
+    # set) or picked at PROFILING_SAMPLE_RATE are profiled; the consumer
+    # profiles on SIGUSR1 (next N batches) or SIGUSR2 (a time window)
+    PROFILING_ENABLED: bool = False
+    PROFILING_HEADER: str = "X-Profile"
+    PROFILING_TOKEN: Optional[str] = None
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_OUTPUT_DIR: str = "/tmp/loan-app-profiles"
+    PROFILING_CONSUMER_BATCHES: int = 10
+    PROFILING_CONSUMER_WINDOW_SECONDS: float = 30.0
+    
+    # Security
+    PASSWORD_HASH_THREADS: int = 4  # Threads running bcrypt for the async helpers
+    PASSWORD_HASH_MAX_CONCURRENCY: int = 4  # Hashes queued or running at once; others wait
+    TOKEN_CACHE_ENABLED: bool = True  # Reuse verified JWT claims until the token expires
+    TOKEN_CACHE_MAX_ENTRIES: int = 10000
+    TOKEN_CACHE_TTL_SECONDS: float = 300.0
+    
     # Database
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
     POSTGRES_DB: str
     POSTGRES_HOST: str
     POSTGRES_PORT: str
+    DB_ECHO: bool = False  # Log every SQL statement
+    
+    # Database connection pool (per engine: the primary and each replica)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20  # Extra connections opened under load, closed when returned
+    DB_POOL_TIMEOUT: float = 30.0  # Seconds to wait for a free connection
+    DB_POOL_PRE_PING: bool = True  # Check connections on checkout, replacing dead ones
+    DB_POOL_RECYCLE: int = 1800  # Seconds before a connection is replaced; -1 to never
+    DB_STATEMENT_CACHE_SIZE: int = 100  # Prepared statements cached per connection
+    DB_PGBOUNCER_MODE: bool = False  # Disable prepared statement caching for PgBouncer
+    
+    # Read replicas for read-only queries such as status lookups: a JSON list
+    # of postgresql+asyncpg:// URLs. Empty sends everything to the primary.
+    DB_READ_REPLICA_URLS: List[str] = []
+    DB_REPLICA_CONNECT_TIMEOUT: float = 2.0
+    DB_REPLICA_RETRY_SECONDS: float = 30.0  # How long to skip a replica after it failed
+    
+    # Write-behind persistence of processed applications
+    DB_WRITE_BEHIND_MAX_ROWS: int = 500  # Flush at the next commit once this many applications are buffered
+    DB_WRITE_BEHIND_FLUSH_INTERVAL_MS: int = 1000  # ...or once the oldest has waited this long
+    
+    # Table partitioning
+    DB_PARTITION_PREMAKE_MONTHS: int = 3  # Monthly partitions created ahead of the current month
+    DB_PARTITION_CHECK_INTERVAL_SECONDS: float = 3600.0  # How often consumers create upcoming partitions
+    DB_PARTITION_RETENTION_MONTHS: int = 24  # Older partitions are detached and archived by scripts/manage_partitions.py
+    DB_PARTITION_ARCHIVE_DIR: str = "archive"
+    DB_RECENT_WINDOW_DAYS: int = 62  # Latest-status lookups search this far back before every partition
     
     # Redis
     REDIS_HOST: str
@@ -21,12 +74,116 @@ class Settings(BaseSettings):
     REDIS_DB: int = 0
     REDIS_TTL: int = 3600  # 1 hour in seconds
     
+    # Payload codecs: json, orjson or msgpack. Readers accept every format,
+    # so writers can be switched once all readers are deployed.
+    CACHE_CODEC: str = "json"
+    KAFKA_CODEC: str = "json"
+    
+    # In-process (L1) cache in front of Redis
+    CACHE_L1_ENABLED: bool = True
+    CACHE_L1_MAX_ENTRIES: int = 10000
+    CACHE_L1_MAX_BYTES: int = 16 * 1024 * 1024
+    CACHE_L1_TTL_SECONDS: float = 5.0  # Upper bound on how long an entry can be served stale
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidate"
+    
+    # Application status read-through
+    STATUS_CACHE_NOT_FOUND_TTL: int = 30  # Seconds to cache "no application" results
+    STATUS_CACHE_LOCK_ENABLED: bool = False  # Also coalesce misses across workers with a Redis lock
+    STATUS_CACHE_LOCK_TTL_MS: int = 5000
+    STATUS_CACHE_LOCK_WAIT_MS: int = 2000  # How long to wait for another worker to fill the cache
+    STATUS_CACHE_LOCK_POLL_MS: int = 50
+    STATUS_BATCH_MAX_IDS: int = 500  # Max applicant IDs per batch status lookup
+    
+    # Application history
+    HISTORY_CACHE_MAX_ENTRIES: int = 100  # Most recent applications indexed in Redis per applicant
+    HISTORY_PAGE_SIZE: int = 20
+    HISTORY_PAGE_MAX_SIZE: int = 100
+    
+    # Admission control for submissions
+    ADMISSION_MAX_IN_FLIGHT: int = 1000  # Submissions handled at once per API worker; 0 disables
+    ADMISSION_MAX_PRODUCER_PENDING: int = 10000  # Shed while this many records await broker acks; 0 disables
+    ADMISSION_RETRY_AFTER_SECONDS: int = 1  # Retry-After sent with 503s
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_PER_APPLICANT_PER_SECOND: float = 1.0  # Token bucket refill rate
+    RATE_LIMIT_PER_APPLICANT_BURST: int = 5  # Token bucket size
+    
+    # Idempotent submission (Idempotency-Key header)
+    IDEMPOTENCY_TTL_SECONDS: int = 86400  # How long a response is replayed to repeats of its key
+    IDEMPOTENCY_LOCK_TTL_SECONDS: int = 30  # Claim held while the first request is in flight
+    IDEMPOTENCY_KEY_MAX_LENGTH: int = 255
+    
+    # Exports
+    EXPORT_CHUNK_SIZE: int = 5000  # Rows fetched from the cursor and encoded at a time
+    EXPORT_MAX_CONCURRENT: int = 2  # Exports running at once per API worker
+    
+    # Decision analytics
+    ANALYTICS_ENABLED: bool = True
+    ANALYTICS_AMOUNT_BUCKETS: List[float] = [1000, 5000, 10000, 25000, 50000, 100000]  # Upper bounds, inclusive
+    ANALYTICS_TERM_BUCKETS: List[int] = [6, 12, 24, 36, 48, 60]  # Upper bounds in months, inclusive
+    ANALYTICS_REDIS_TTL_SECONDS: int = 259200  # Live rollups stay in Redis for 3 days, then only in Postgres
+    ANALYTICS_COMPACT_INTERVAL_SECONDS: float = 60.0  # How often consumers copy rollups into Postgres
+    ANALYTICS_MAX_WINDOWS: int = 1000  # Windows one analytics request can span
+    
+    # Status streaming (server-sent events)
+    STATUS_STREAM_ENABLED: bool = True
+    STATUS_EVENTS_CHANNEL_PREFIX: str = "app_events:"
+    STATUS_STREAM_QUEUE_SIZE: int = 16  # Events buffered per client; the oldest is dropped beyond this
+    STATUS_STREAM_HEARTBEAT_SECONDS: float = 15.0  # Comment line sent on idle streams to keep proxies from closing them
+    STATUS_STREAM_MAX_CONNECTIONS: int = 1000  # Open streams per API worker
+    STATUS_STREAM_RETRY_MS: int = 3000  # Reconnection delay suggested to clients
+    
+    # Loan quotes
+    QUOTE_DEFAULT_ANNUAL_RATE: float = 0.12  # When neither the request nor a rate band gives one
+    QUOTE_MAX_TERM_MONTHS: int = 480
+    QUOTE_MAX_BATCH: int = 10000  # Quotes per request
+    QUOTE_CACHE_MAX_ENTRIES: int = 100000
+    QUOTE_SCHEDULE_CHUNK_MONTHS: int = 120  # Schedule rows computed and streamed at a time
+    
     # Kafka
     KAFKA_BOOTSTRAP_SERVERS: str = "kafka:29092"  # Internal Docker network
     KAFKA_APPLICATION_TOPIC: str = "loan_applications"
     KAFKA_CONSUMER_GROUP_ID: str = "loan_processor"
     KAFKA_AUTO_OFFSET_RESET: str = "earliest"
     
+    # Kafka producer
+    KAFKA_PRODUCER_LINGER_MS: int = 5  # How long to wait for more records before sending a batch
+    KAFKA_PRODUCER_MAX_BATCH_SIZE: int = 65536  # Max bytes buffered per partition batch
+    KAFKA_PRODUCER_COMPRESSION_TYPE: Optional[str] = "gzip"  # gzip, snappy, lz4, zstd or None
+    KAFKA_PRODUCER_ACKS: str = "all"  # 0, 1 or all
+    KAFKA_PRODUCER_WAIT_FOR_DELIVERY: bool = True  # False returns as soon as the record is buffered
+    
+    # Bulk submission
+    BULK_SUBMIT_BATCH_SIZE: int = 500  # Records published per pipelined batch
+    BULK_SUBMIT_PIPELINE_DEPTH: int = 4  # Batches awaiting delivery while the next is read
+    BULK_SUBMIT_MAX_RECORD_BYTES: int = 65536
+    
+    # Kafka consumer batching
+    KAFKA_CONSUMER_BATCH_MODE: bool = True
+    KAFKA_CONSUMER_BATCH_SIZE: int = 500  # Max records handed to the service per batch
+    KAFKA_CONSUMER_LINGER_MS: int = 50  # How long to wait for a batch to fill up
+    KAFKA_CONSUMER_POLL_TIMEOUT_MS: int = 1000  # How long to block when the topic is idle
+    KAFKA_CONSUMER_MAX_IN_FLIGHT: int = 64  # Records processed concurrently within a batch
+    KAFKA_CONSUMER_RETRY_BACKOFF_MS: int = 1000  # Pause before re-reading a failed batch
+    
+    # Kafka retry topics and dead-letter topic for failed messages
+    KAFKA_RETRY_ENABLED: bool = True
+    # One retry topic per delay; keep each below the consumer's max poll interval (300s)
+    KAFKA_RETRY_DELAYS_MS: List[int] = [1000, 10000, 60000]
+    KAFKA_DEAD_LETTER_SUFFIX: str = ".dlq"
+    KAFKA_DLQ_REPLAY_GROUP_ID: str = "loan_processor_dlq_replay"
+    
+    # Kafka consumer deduplication of redelivered applications
+    CONSUMER_DEDUP_ENABLED: bool = True
+    CONSUMER_DEDUP_RECENT_IDS: int = 100000  # Decided application ids remembered in memory
+    CONSUMER_DEDUP_TTL_SECONDS: float = 3600.0
+    
+    # Consumer supervisor (scripts/consumer_supervisor.py)
+    CONSUMER_WORKERS: Optional[int] = None  # Default: min(cores, topic partitions)
+    CONSUMER_RESTART_BACKOFF_MS: int = 1000  # Doubles with each consecutive crash
+    CONSUMER_RESTART_BACKOFF_MAX_MS: int = 30000
+    CONSUMER_SHUTDOWN_TIMEOUT_SECONDS: float = 60.0  # Time to finish in-flight batches before SIGKILL
+    CONSUMER_REPORT_INTERVAL_SECONDS: float = 10.0
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -0,0 +1,259 @@
+"""
+Prometheus metrics for the API and the Kafka consumer.
+
+Metrics are module-level, and label values used on hot paths are resolved
+once, so instrumented code only pays for an ``observe()`` or ``inc()``.
+The API serves them on ``/metrics``; the consumer, a separate process,
+serves its own on METRICS_CONSUMER_PORT.
+
+Useful derived values:
+
+- cache hit ratio: ``sum(rate(cache_requests_total{result="hit"}[5m])) /
+  sum(rate(cache_requests_total[5m]))``, per tier if grouped by ``tier``
+- messages processed per second: ``rate(kafka_messages_processed_total[1m])``
+- L1 entries pushed out by the size limits:
+  ``rate(local_cache_events_total{cache="l1", event="evictions"}[5m])``
+"""
+import time
+from typing import Any, Dict, Iterator, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Seconds; finer than the client default at the low end, where Redis and
+# buffered Kafka sends live
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# API
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template; for streamed responses, the time until the response starts",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+SUBMISSIONS_IN_FLIGHT = Gauge(
+    "submissions_in_flight",
+    "Submissions currently admitted and being handled",
+)
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejections_total",
+    "Submissions turned away, by reason (in_flight, producer_backlog, rate_limited)",
+    ["reason"],
+)
+IDEMPOTENT_REQUESTS = Counter(
+    "idempotent_requests_total",
+    "Submissions carrying an Idempotency-Key, by outcome (new, replayed, in_progress, mismatch)",
+    ["outcome"],
+)
+STATUS_STREAM_CONNECTIONS = Gauge(
+    "status_stream_connections",
+    "Open status event streams",
+)
+
+# Kafka producer
+KAFKA_SEND_DURATION = Histogram(
+    "kafka_producer_send_duration_seconds",
+    "Time spent in send_message: until acknowledged, or until buffered without wait",
+    ["topic", "wait"],
+    buckets=LATENCY_BUCKETS,
+)
+KAFKA_PRODUCER_PENDING = Gauge(
+    "kafka_producer_pending_deliveries",
+    "Records buffered by the producer and not yet acknowledged by the broker",
+)
+KAFKA_DELIVERY_FAILURES = Counter(
+    "kafka_producer_delivery_failures_total",
+    "Buffered records the broker never acknowledged",
+    ["topic"],
+)
+
+# Kafka consumer
+KAFKA_CONSUMER_LAG = Gauge(
+    "kafka_consumer_lag",
+    "Records between the consumer's position and the partition's high watermark",
+    ["topic", "partition"],
+)
+KAFKA_MESSAGES_PROCESSED = Counter(
+    "kafka_messages_processed_total",
+    "Messages handed to the service, by outcome",
+    ["topic", "outcome"],
+)
+KAFKA_MESSAGES_RETRIED = Counter(
+    "kafka_messages_retried_total",
+    "Failed messages sent to a retry topic, by retry topic",
+    ["topic"],
+)
+KAFKA_MESSAGES_DEAD_LETTERED = Counter(
+    "kafka_messages_dead_lettered_total",
+    "Messages sent to the dead-letter topic after their last retry failed",
+    ["topic"],
+)
+KAFKA_DUPLICATES_SKIPPED = Counter(
+    "kafka_consumer_duplicates_skipped_total",
+    "Redelivered applications skipped as already decided, by the check that caught them",
+    ["check"],
+)
+KAFKA_BATCH_DURATION = Histogram(
+    "kafka_consumer_batch_duration_seconds",
+    "Time to process one consumed batch",
+    ["topic"],
+    buckets=LATENCY_BUCKETS,
+)
+
+# Cache
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Cache lookups by tier (l1, redis) and result (hit, miss)",
+    ["tier", "result"],
+)
+L1_HITS = CACHE_REQUESTS.labels("l1", "hit")
+L1_MISSES = CACHE_REQUESTS.labels("l1", "miss")
+REDIS_HITS = CACHE_REQUESTS.labels("redis", "hit")
+REDIS_MISSES = CACHE_REQUESTS.labels("redis", "miss")
+REDIS_COMMAND_DURATION = Histogram(
+    "redis_command_duration_seconds",
+    "Redis round trips made by RedisCache, by operation",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+class LocalCacheCollector:
+    """Exports the counters of in-process caches when scraped.
+
+    LocalCache keeps plain integer counters, so lookups pay nothing extra;
+    they are read from ``stats()`` only when /metrics is requested.
+    """
+
+    EVENTS = ("hits", "misses", "evictions", "expirations", "invalidations")
+
+    def __init__(self):
+        self.caches: Dict[str, Any] = {}
+
+    def track(self, name: str, cache: Any) -> None:
+        """Export a LocalCache under ``name``, replacing any earlier one"""
+        self.caches[name] = cache
+
+    def collect(self) -> Iterator[Metric]:
+        events = CounterMetricFamily(
+            "local_cache_events",
+            "In-process cache lookups and removals, by cache and event "
+            "(hits, misses, evictions, expirations, invalidations)",
+            labels=["cache", "event"],
+        )
+        entries = GaugeMetricFamily("local_cache_entries", "Entries held by an in-process cache", labels=["cache"])
+        size = GaugeMetricFamily("local_cache_bytes", "Approximate size of an in-process cache", labels=["cache"])
+        for name, cache in self.caches.items():
+            stats = cache.stats()
+            for event in self.EVENTS:
+                events.add_metric([name, event], stats[event])
+            entries.add_metric([name], stats["entries"])
+            size.add_metric([name], stats["bytes"])
+        yield events
+        yield entries
+        yield size
+
+
+LOCAL_CACHES = LocalCacheCollector()
+REGISTRY.register(LOCAL_CACHES)
+
+# Database
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time to get a connection from the pool, including opening a new one",
+    ["pool"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Connections currently checked out of the pool",
+    ["pool"],
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Connections currently open in the pool, idle or checked out",
+    ["pool"],
+)
+DB_REPLICA_FALLBACKS = Counter(
+    "db_replica_fallbacks_total",
+    "Read sessions that skipped an unreachable replica",
+    ["replica"],
+)
+DB_SESSION_DURATION = Histogram(
+    "db_session_duration_seconds",
+    "Lifetime of request-scoped sessions from get_db",
+    buckets=LATENCY_BUCKETS,
+)
+
+# Decisions
+DECISION_EVALUATION_DURATION = Histogram(
+    "decision_evaluation_duration_seconds",
+    "Time to evaluate the decision rules, for one application or a batch",
+    ["mode"],
+    buckets=LATENCY_BUCKETS,
+)
+DECISION_ONE_DURATION = DECISION_EVALUATION_DURATION.labels("one")
+DECISION_BATCH_DURATION = DECISION_EVALUATION_DURATION.labels("batch")
+
+
+def _route_template(scope: Scope) -> str:
+    """The matched route's path template, including any router prefix"""
+    # Routes of included routers are matched as declared, without their
+    # prefix, on newer FastAPI versions; the full template is kept alongside
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    for candidate in (context, scope.get("route")):
+        template = getattr(candidate, "path_format", None)
+        if template:
+            return template
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Records request latency, labelled by route template rather than raw path.
+
+    A streamed response (SSE, exports, bulk uploads, schedules) lasts as
+    long as its client keeps reading, so for those only the time until
+    the response starts is recorded.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+        response_started: Optional[float] = None
+        streaming = False
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code, response_started, streaming
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                response_started = time.perf_counter()
+            elif message["type"] == "http.response.body" and message.get("more_body"):
+                streaming = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            finished = response_started if streaming else time.perf_counter()
+            HTTP_REQUEST_DURATION.labels(scope["method"], _route_template(scope), str(status_code)).observe(
+                finished - started
+            )
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    """Serve all metrics in the Prometheus text format"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,166 @@
+"""
+Opt-in cProfile hooks for API requests and consumer batches.
+
+Profiles are written to PROFILING_OUTPUT_DIR as ``.prof`` files, readable
+with ``python -m pstats`` or snakeviz. Only one profile runs at a time per
+process. cProfile sees the whole thread, so a profile also contains work
+other tasks did on the event loop while it was recording.
+"""
+import cProfile
+import os
+import random
+import re
+import signal
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+# Set while a profile is being recorded in this process
+_profiling = False
+
+
+def _profile_name(label: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_")[:80]
+    return f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{slug}.prof"
+
+
+def _write_profile(profile: cProfile.Profile, name: str) -> None:
+    try:
+        os.makedirs(settings.PROFILING_OUTPUT_DIR, exist_ok=True)
+        profile.dump_stats(os.path.join(settings.PROFILING_OUTPUT_DIR, name))
+        print(f"Wrote profile {name}")
+    except OSError as e:
+        print(f"Error writing profile {name}: {e}")
+
+
+class ProfilingMiddleware:
+    """Profiles requests that send PROFILING_HEADER, plus a random sample.
+
+    If PROFILING_TOKEN is set the header must carry it; otherwise any value
+    triggers a profile. The profile's file name is returned in the
+    ``X-Profile-Id`` response header.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.header = settings.PROFILING_HEADER.lower().encode("latin-1")
+        self.token = settings.PROFILING_TOKEN
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+
+    def _requested(self, scope: Scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == self.header:
+                return self.token is None or value.decode("latin-1") == self.token
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        global _profiling
+        if scope["type"] != "http" or _profiling or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        name = _profile_name(f"{scope['method']} {scope['path']}")
+
+        async def send_with_profile_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Profile-Id", name)
+            await send(message)
+
+        _profiling = True
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profile.disable()
+            _profiling = False
+            _write_profile(profile, name)
+
+
+class BatchProfiler:
+    """Profiles the consumer's next N batches, or its batches for a while.
+
+    One profile accumulates over all the batches in a run and is written
+    when the run ends. ``install_signal_handlers`` maps SIGUSR1 to
+    PROFILING_CONSUMER_BATCHES batches and SIGUSR2 to
+    PROFILING_CONSUMER_WINDOW_SECONDS.
+    """
+
+    def __init__(self):
+        self.remaining_batches = 0
+        self.deadline: Optional[float] = None
+        self.batches = 0
+        self.profile: Optional[cProfile.Profile] = None
+
+    def profile_batches(self, count: int) -> None:
+        """Profile the next ``count`` batches"""
+        self.remaining_batches = count
+        self.deadline = None
+        print(f"Profiling the next {count} batches")
+
+    def profile_for(self, seconds: float) -> None:
+        """Profile every batch that starts within the next ``seconds``"""
+        self.remaining_batches = 0
+        self.deadline = time.monotonic() + seconds
+        print(f"Profiling batches for {seconds}s")
+
+    def install_signal_handlers(self, loop) -> None:
+        try:
+            loop.add_signal_handler(
+                signal.SIGUSR1, self.profile_batches, settings.PROFILING_CONSUMER_BATCHES
+            )
+            loop.add_signal_handler(
+                signal.SIGUSR2, self.profile_for, settings.PROFILING_CONSUMER_WINDOW_SECONDS
+            )
+        except (AttributeError, NotImplementedError):
+            print("Profiling signals are not supported on this platform")
+
+    def _active(self) -> bool:
+        if self.deadline is not None:
+            return time.monotonic() < self.deadline
+        return self.remaining_batches > 0
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """Wrap the processing of one batch"""
+        global _profiling
+        if not self._active():
+            self.finish()
+            yield
+            return
+        if self.profile is None:
+            if _profiling:
+                yield
+                return
+            self.profile = cProfile.Profile()
+            _profiling = True
+
+        self.profile.enable()
+        try:
+            yield
+        finally:
+            self.profile.disable()
+            self.batches += 1
+            if self.deadline is None:
+                self.remaining_batches -= 1
+            if not self._active():
+                self.finish()
+
+    def finish(self) -> None:
+        """Write out the current run's profile, if there is one"""
+        global _profiling
+        if self.profile is None:
+            return
+        profile, self.profile = self.profile, None
+        batches, self.batches = self.batches, 0
+        self.deadline = None
+        _profiling = False
+        _write_profile(profile, _profile_name(f"consumer {batches} batches"))
+
+
+batch_profiler = BatchProfiler()
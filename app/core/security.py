@@ -1,19 +1,48 @@
 from passlib.context import CryptContext
 from jose import JWTError, jwt
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, Optional
+import asyncio
+import hashlib
+import time
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 
+from app.core.config import settings
+from app.core.metrics import LOCAL_CACHES
+from app.infrastructure.cache.local_cache import LocalCache, MISSING
+
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt releases the GIL, so hashing on threads keeps the event loop free
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_THREADS,
+    thread_name_prefix="password-hash"
+)
+# Excess callers wait here, where they can still be cancelled, rather than
+# in the executor's queue
+_hash_slots = asyncio.Semaphore(settings.PASSWORD_HASH_MAX_CONCURRENCY)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+async def _run_hashing(fn, *args):
+    async with _hash_slots:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, fn, *args)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the hashing thread pool, without blocking the event loop"""
+    return await _run_hashing(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the hashing thread pool, without blocking the event loop"""
+    return await _run_hashing(get_password_hash, password)
+
 # JWT Token handling
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -32,6 +61,39 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# Verified claims by token digest. Entries never outlive the token's exp
+# claim; TOKEN_CACHE_TTL_SECONDS bounds how long a cached token is trusted.
+_token_cache: Optional[LocalCache] = None
+if settings.TOKEN_CACHE_ENABLED:
+    _token_cache = LocalCache(
+        max_entries=settings.TOKEN_CACHE_MAX_ENTRIES,
+        max_bytes=settings.TOKEN_CACHE_MAX_ENTRIES * 1024,
+        ttl=settings.TOKEN_CACHE_TTL_SECONDS
+    )
+    LOCAL_CACHES.track("tokens", _token_cache)
+
+def decode_access_token(token: str) -> Dict[str, Any]:
+    """Verify a token and return its claims, reusing earlier verifications
+    
+    Raises JWTError if the token is invalid or expired. The returned dict
+    is shared with the cache and must not be modified.
+    """
+    if _token_cache is None:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    claims = _token_cache.get(key)
+    if claims is not MISSING:
+        return claims
+    
+    claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    ttl = settings.TOKEN_CACHE_TTL_SECONDS
+    if "exp" in claims:
+        ttl = min(ttl, float(claims["exp"]) - time.time())
+    if ttl > 0:
+        _token_cache.set(key, claims, size=len(token), ttl=ttl)
+    return claims
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -39,7 +101,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
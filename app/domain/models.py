@@ -1,6 +1,6 @@
 from datetime import datetime
 from enum import Enum
-from typing import Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel, Field, validator
 from uuid import UUID, uuid4
 
@@ -23,6 +23,8 @@ class LoanApplicationInDB(LoanApplicationBase):
     status: ApplicationStatus = ApplicationStatus.PENDING
     created_at: datetime = Field(default_factory=datetime.utcnow)
     processed_at: Optional[datetime] = None
+    reason_codes: List[str] = Field(default_factory=list, description="Codes of the decision rules that matched")
+    interest_rate: Optional[float] = Field(None, description="Annual interest rate from the rate table, if any")
 
     class Config:
         from_attributes = True
@@ -34,3 +36,75 @@ class LoanApplicationInDB(LoanApplicationBase):
 class LoanApplicationResponse(LoanApplicationInDB):
     class Config:
         from_attributes = True
+
+class ApplicationStatusBatchRequest(BaseModel):
+    applicant_ids: List[str] = Field(..., min_length=1, description="Applicant IDs to look up")
+
+class ApplicationHistoryPage(BaseModel):
+    applications: List[LoanApplicationInDB] = Field(..., description="Applications, newest first")
+    next_cursor: Optional[str] = Field(
+        None, description="Pass as cursor to get the next page; null on the last page"
+    )
+
+class ApplicationExportFilter(BaseModel):
+    status: Optional[ApplicationStatus] = None
+    created_from: Optional[datetime] = Field(None, description="Inclusive lower bound on created_at")
+    created_to: Optional[datetime] = Field(None, description="Exclusive upper bound on created_at")
+    processed_from: Optional[datetime] = Field(None, description="Inclusive lower bound on processed_at")
+    processed_to: Optional[datetime] = Field(None, description="Exclusive upper bound on processed_at")
+
+class ApplicationStatusBatchResponse(BaseModel):
+    applications: Dict[str, Optional[LoanApplicationInDB]] = Field(
+        ..., description="Most recent application per applicant ID, or null if there is none"
+    )
+
+class AnalyticsGranularity(str, Enum):
+    HOUR = "hour"
+    DAY = "day"
+
+class DecisionAggregate(BaseModel):
+    decisions: int = Field(..., description="Applications decided")
+    by_status: Dict[str, int] = Field(..., description="Decisions per status")
+    approval_rate: Optional[float] = Field(None, description="Share of decisions that approved; null without decisions")
+    average_amount: Optional[float] = Field(None, description="Mean amount applied for; null without decisions")
+    amount_histogram: Dict[str, int] = Field(
+        ..., description="Decisions per amount bucket, keyed by its inclusive upper bound ('inf' for the last)"
+    )
+    term_histogram: Dict[str, int] = Field(
+        ..., description="Decisions per term bucket, keyed by its inclusive upper bound in months"
+    )
+    unique_applicants: Optional[int] = Field(
+        None, description="Distinct applicants, estimated within about 1%; null if it could not be estimated"
+    )
+
+class DecisionRollup(DecisionAggregate):
+    window_start: datetime
+
+class DecisionAnalytics(BaseModel):
+    granularity: AnalyticsGranularity
+    start: datetime = Field(..., description="Start of the first window")
+    end: datetime = Field(..., description="End of the last window")
+    windows: List[DecisionRollup] = Field(..., description="Windows with decisions, oldest first")
+    summary: DecisionAggregate = Field(..., description="All windows combined")
+
+class QuoteRequest(BaseModel):
+    amount: float = Field(..., gt=0, description="Loan amount")
+    term_months: int = Field(..., ge=1, description="Loan term in months")
+    annual_rate: Optional[float] = Field(
+        None, ge=0, le=1, description="Annual interest rate; defaults to the rate band for the amount and term"
+    )
+
+class QuoteBatchRequest(BaseModel):
+    quotes: List[QuoteRequest] = Field(..., min_length=1, description="Combinations to quote")
+
+class Quote(BaseModel):
+    amount: float
+    term_months: int
+    annual_rate: float
+    monthly_payment: float = Field(..., description="Payment due every month but the last")
+    final_payment: float = Field(..., description="Last payment, which absorbs rounding to cents")
+    total_payment: float
+    total_interest: float
+
+class QuoteBatchResponse(BaseModel):
+    quotes: List[Quote] = Field(..., description="One quote per requested combination, in request order")
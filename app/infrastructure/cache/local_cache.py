@@ -0,0 +1,128 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# Returned by LocalCache.get on a miss, since None is a valid cached value
+MISSING = object()
+
+
+class LocalCache:
+    """Bounded in-process LRU cache with per-entry expiry.
+
+    Capped both by entry count and by an approximate byte size supplied by
+    the caller (typically the encoded length of the value). Cached values
+    are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (expires_at, size, value), least recently used first
+        self._entries: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Any:
+        """Get a value, or MISSING if absent or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return MISSING
+        expires_at, size, value = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return MISSING
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, size: int, ttl: Optional[float] = None) -> None:
+        """Cache a value for ``ttl`` seconds (at most the cache's own TTL)"""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or size > self.max_bytes:
+            self.delete(key)
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + ttl, size, value)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        """Drop a key if present"""
+        if key in self._entries:
+            self._remove(key)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Size and hit/miss/eviction counters"""
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+class RecentSet:
+    """Bounded in-process set of recently seen keys, each kept for ``ttl`` seconds.
+
+    Holds at most ``max_entries`` keys, dropping the least recently added
+    first. Lighter than a LocalCache when only membership matters.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # key -> expires_at, oldest first
+        self._expiry: "OrderedDict[str, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    def __contains__(self, key: str) -> bool:
+        expires_at = self._expiry.get(key)
+        if expires_at is None:
+            return False
+        if expires_at <= time.monotonic():
+            del self._expiry[key]
+            return False
+        return True
+
+    def add_many(self, keys: Iterable[str]) -> None:
+        """Add keys, or restart their expiry if already present"""
+        expires_at = time.monotonic() + self.ttl
+        for key in keys:
+            self._expiry.pop(key, None)
+            self._expiry[key] = expires_at
+        while len(self._expiry) > self.max_entries:
+            self._expiry.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every key"""
+        self._expiry.clear()
@@ -1,47 +1,481 @@
 import redis.asyncio as redis
-from typing import Optional, Any, Dict
-import json
+from typing import Optional, Any, Callable, Dict, List, Sequence, Tuple
+import asyncio
+import uuid
 from datetime import timedelta
 from app.core.config import settings
+from app.core.metrics import L1_HITS, L1_MISSES, LOCAL_CACHES, REDIS_COMMAND_DURATION, REDIS_HITS, REDIS_MISSES
+from app.infrastructure.serialization.codecs import get_codec
+from .local_cache import LocalCache, MISSING
+
+# Deletes the lock only if it is still held by the caller's token
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# Token bucket: refills at ARGV[1] tokens per second up to ARGV[2], then
+# takes one token if available. Returns {allowed, milliseconds until a
+# token is available}. Uses the server clock, so API workers can't skew it.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local time = redis.call("time")
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local state = redis.call("hmget", KEYS[1], "tokens", "ts")
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil then
+    tokens = burst
+    ts = now
+end
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+local allowed = 0
+local wait_ms = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait_ms = math.ceil((1 - tokens) * 1000 / rate)
+end
+redis.call("hset", KEYS[1], "tokens", tostring(tokens), "ts", now)
+redis.call("pexpire", KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+return {allowed, wait_ms}
+"""
+
+# Writes KEYS[2..] with the values ARGV[3..], and ARGV[1] to the version
+# key KEYS[1], unless KEYS[1] already holds a larger version. Everything
+# expires after ARGV[2] seconds. Returns whether anything was written.
+SET_IF_NEWER_SCRIPT = """
+local current = tonumber(redis.call("get", KEYS[1]))
+if current ~= nil and current > tonumber(ARGV[1]) then
+    return 0
+end
+local expire = tonumber(ARGV[2])
+redis.call("set", KEYS[1], ARGV[1], "EX", expire)
+for i = 2, #KEYS do
+    redis.call("set", KEYS[i], ARGV[i + 1], "EX", expire)
+end
+return 1
+"""
+
+# Latency of each kind of Redis round trip, resolved once
+_round_trip = {
+    operation: REDIS_COMMAND_DURATION.labels(operation)
+    for operation in (
+        "get", "set", "mget", "set_many", "set_if_newer", "delete",
+        "acquire_lock", "release_lock", "index_add", "index_range", "take_token", "publish",
+        "add_rollups", "get_rollups", "count_unique"
+    )
+}
 
 class RedisCache:
+    """Two-tier cache: a per-process LRU (L1) in front of Redis (L2).
+    
+    Writes through this class are broadcast on CACHE_INVALIDATION_CHANNEL so
+    other processes drop their L1 copy; L1 entries also expire after
+    CACHE_L1_TTL_SECONDS, which bounds staleness if a broadcast is missed.
+    """
     def __init__(self):
         self.redis = redis.Redis(
             host=settings.REDIS_HOST,
             port=settings.REDIS_PORT,
-            db=settings.REDIS_DB,
-            decode_responses=True
+            db=settings.REDIS_DB
         )
+        # Values are encoded once, by the codec, and stored as raw bytes
+        self.codec = get_codec(settings.CACHE_CODEC)
+        self._release_lock = self.redis.register_script(RELEASE_LOCK_SCRIPT)
+        self._token_bucket = self.redis.register_script(TOKEN_BUCKET_SCRIPT)
+        self._set_if_newer = self.redis.register_script(SET_IF_NEWER_SCRIPT)
+        self.local: Optional[LocalCache] = None
+        if settings.CACHE_L1_ENABLED:
+            self.local = LocalCache(
+                max_entries=settings.CACHE_L1_MAX_ENTRIES,
+                max_bytes=settings.CACHE_L1_MAX_BYTES,
+                ttl=settings.CACHE_L1_TTL_SECONDS
+            )
+            LOCAL_CACHES.track("l1", self.local)
+        # Identifies this process's own invalidation broadcasts
+        self.instance_id = uuid.uuid4().hex
+        self._listener: Optional[asyncio.Task] = None
     
     async def get(self, key: str) -> Optional[Dict[str, Any]]:
-        """Get a value from Redis cache"""
-        value = await self.redis.get(key)
+        """Get a value from the local cache, falling back to Redis"""
+        return await self._get(key, self.codec.decode)
+    
+    async def get_bytes(self, key: str) -> Optional[bytes]:
+        """Get a value stored with set_bytes, as is"""
+        return await self._get(key, None)
+    
+    async def _get(self, key: str, decode: Optional[Callable[[bytes], Any]]) -> Any:
+        if self.local is not None:
+            value = self.local.get(key)
+            if value is not MISSING:
+                L1_HITS.inc()
+                return value
+            L1_MISSES.inc()
+        
+        with _round_trip["get"].time():
+            value = await self.redis.get(key)
         if value is None:
+            REDIS_MISSES.inc()
             return None
-        return json.loads(value)
+        REDIS_HITS.inc()
+        decoded = decode(value) if decode is not None else value
+        if self.local is not None:
+            self.local.set(key, decoded, size=len(value))
+        return decoded
     
     async def set(
         self, 
         key: str, 
         value: Dict[str, Any], 
+        expire: Optional[int] = None,
+        nx: bool = False
+    ) -> bool:
+        """Set a value in Redis cache with optional expiration
+        
+        With ``nx`` the value is only set if the key does not exist yet.
+        Returns whether the value was set.
+        """
+        return await self._set(key, value, self.codec.encode(value), expire, nx)
+    
+    async def set_bytes(
+        self,
+        key: str,
+        value: bytes,
+        expire: Optional[int] = None,
+        nx: bool = False
+    ) -> bool:
+        """Set a value that is already encoded, to be read back with get_bytes"""
+        return await self._set(key, value, value, expire, nx)
+    
+    async def _set(self, key: str, value: Any, encoded: bytes, expire: Optional[int], nx: bool) -> bool:
+        if expire is None:
+            expire = settings.REDIS_TTL
+        
+        with _round_trip["set"].time():
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.set(key, encoded, ex=expire, nx=nx)
+                self._publish_invalidation(pipe, key)
+                was_set, _ = await pipe.execute()
+        
+        if self.local is not None:
+            if was_set:
+                self.local.set(key, value, size=len(encoded), ttl=expire)
+            else:
+                self.local.delete(key)
+        return bool(was_set)
+    
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[Dict[str, Any]]]:
+        """Get several values with a single MGET, in the order of ``keys``"""
+        values: List[Optional[Dict[str, Any]]] = [None] * len(keys)
+        missing: List[int] = []
+        for index, key in enumerate(keys):
+            value = self.local.get(key) if self.local is not None else MISSING
+            if value is MISSING:
+                missing.append(index)
+            else:
+                values[index] = value
+        if self.local is not None:
+            L1_HITS.inc(len(keys) - len(missing))
+            L1_MISSES.inc(len(missing))
+        if not missing:
+            return values
+        
+        with _round_trip["mget"].time():
+            fetched = await self.redis.mget([keys[index] for index in missing])
+        hits = 0
+        for index, value in zip(missing, fetched):
+            if value is None:
+                continue
+            hits += 1
+            decoded = self.codec.decode(value)
+            if self.local is not None:
+                self.local.set(keys[index], decoded, size=len(value))
+            values[index] = decoded
+        REDIS_HITS.inc(hits)
+        REDIS_MISSES.inc(len(missing) - hits)
+        return values
+    
+    async def set_many(
+        self,
+        items: Dict[str, Dict[str, Any]],
+        expire: Optional[int] = None,
+        nx: bool = False
+    ) -> List[bool]:
+        """Set several values in one pipelined round trip
+        
+        Returns whether each value was set, in the order of ``items``.
+        """
+        if not items:
+            return []
+        if expire is None:
+            expire = settings.REDIS_TTL
+        
+        encoded = {key: self.codec.encode(value) for key, value in items.items()}
+        with _round_trip["set_many"].time():
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, data in encoded.items():
+                    pipe.set(key, data, ex=expire, nx=nx)
+                    self._publish_invalidation(pipe, key)
+                # Every other reply belongs to a PUBLISH
+                step = 2 if self.local is not None else 1
+                results = (await pipe.execute())[::step]
+        
+        if self.local is not None:
+            for (key, value), was_set in zip(items.items(), results):
+                if was_set:
+                    self.local.set(key, value, size=len(encoded[key]), ttl=expire)
+                else:
+                    self.local.delete(key)
+        return [bool(was_set) for was_set in results]
+    
+    async def set_many_if_newer(
+        self,
+        entries: Sequence[Tuple[str, float, Dict[str, Any]]],
         expire: Optional[int] = None
-    ) -> None:
-        """Set a value in Redis cache with optional expiration"""
+    ) -> List[bool]:
+        """Write groups of keys unless a newer version of each group is stored.
+        
+        Each entry is a version key, the version being written and the keys
+        to write. A group is written atomically, together with its version,
+        only if the version key doesn't hold a larger one, so a late write
+        of older data can't replace newer data. Bytes values are stored as
+        is, to be read back with get_bytes; others are encoded. Returns
+        whether each group was written, in the order of ``entries``.
+        """
+        if not entries:
+            return []
         if expire is None:
             expire = settings.REDIS_TTL
         
-        await self.redis.set(
-            key,
-            json.dumps(value, default=str),
-            ex=expire
-        )
+        encoded = [
+            {key: value if isinstance(value, bytes) else self.codec.encode(value) for key, value in items.items()}
+            for _, _, items in entries
+        ]
+        with _round_trip["set_if_newer"].time():
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for (version_key, version, _), data in zip(entries, encoded):
+                    await self._set_if_newer(
+                        keys=[version_key, *data],
+                        args=[repr(version), expire, *data.values()],
+                        client=pipe
+                    )
+                    for key in data:
+                        self._publish_invalidation(pipe, key)
+                replies = await pipe.execute()
+        # Each script reply is followed by one PUBLISH per key written
+        results = []
+        position = 0
+        for data in encoded:
+            results.append(bool(replies[position]))
+            position += 1 + (len(data) if self.local is not None else 0)
+        
+        if self.local is not None:
+            for (_, _, items), data, was_set in zip(entries, encoded, results):
+                for key, value in items.items():
+                    if was_set:
+                        self.local.set(key, value, size=len(data[key]), ttl=expire)
+                    else:
+                        self.local.delete(key)
+        return results
     
     async def delete(self, key: str) -> None:
         """Delete a key from Redis cache"""
-        await self.redis.delete(key)
+        if self.local is not None:
+            self.local.delete(key)
+        with _round_trip["delete"].time():
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.delete(key)
+                self._publish_invalidation(pipe, key)
+                await pipe.execute()
+    
+    async def index_add(
+        self,
+        key: str,
+        member: str,
+        score: float,
+        max_entries: int,
+        expire: Optional[int] = None
+    ) -> None:
+        """Add a member to a sorted-set index, keeping only the ``max_entries`` highest scores"""
+        if expire is None:
+            expire = settings.REDIS_TTL
+        with _round_trip["index_add"].time():
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.zadd(key, {member: score})
+                pipe.zremrangebyrank(key, 0, -max_entries - 1)
+                pipe.expire(key, expire)
+                await pipe.execute()
+    
+    async def index_range(
+        self,
+        key: str,
+        max_score: Optional[float],
+        count: int
+    ) -> List[Tuple[str, float]]:
+        """Get up to ``count`` members of a sorted-set index, highest score first.
+        
+        Members scoring above ``max_score`` (inclusive bound) are skipped;
+        members with equal scores come in descending order.
+        """
+        with _round_trip["index_range"].time():
+            entries = await self.redis.zrevrangebyscore(
+                key,
+                "+inf" if max_score is None else repr(max_score),
+                "-inf",
+                start=0,
+                num=count,
+                withscores=True
+            )
+        return [(member.decode("utf-8"), score) for member, score in entries]
+    
+    async def publish(self, channels: Sequence[str], value: Dict[str, Any]) -> None:
+        """Publish a value on several pub/sub channels in one round trip"""
+        encoded = self.codec.encode(value)
+        with _round_trip["publish"].time():
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for channel in channels:
+                    pipe.publish(channel, encoded)
+                await pipe.execute()
+    
+    async def add_rollups(
+        self,
+        counters: Dict[str, Dict[str, float]],
+        uniques: Dict[str, Sequence[str]],
+        expire: int
+    ) -> None:
+        """Add to hash counters and to HyperLogLogs in one pipelined round trip"""
+        with _round_trip["add_rollups"].time():
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, increments in counters.items():
+                    for field, amount in increments.items():
+                        if isinstance(amount, int):
+                            pipe.hincrby(key, field, amount)
+                        else:
+                            pipe.hincrbyfloat(key, field, amount)
+                    pipe.expire(key, expire)
+                for key, members in uniques.items():
+                    pipe.pfadd(key, *members)
+                    pipe.expire(key, expire)
+                await pipe.execute()
+    
+    async def get_rollups(
+        self,
+        keys: Sequence[Tuple[str, str]]
+    ) -> List[Tuple[Dict[str, float], Optional[bytes], int]]:
+        """Get rollups written by add_rollups, for (counters key, HyperLogLog key) pairs.
+        
+        Each comes back as the counters (empty if missing), the raw
+        HyperLogLog and its estimated count.
+        """
+        if not keys:
+            return []
+        with _round_trip["get_rollups"].time():
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for counters_key, uniques_key in keys:
+                    pipe.hgetall(counters_key)
+                    pipe.get(uniques_key)
+                    pipe.pfcount(uniques_key)
+                results = await pipe.execute()
+        return [
+            (
+                {field.decode("utf-8"): float(value) for field, value in results[index].items()},
+                results[index + 1],
+                results[index + 2]
+            )
+            for index in range(0, len(results), 3)
+        ]
+    
+    async def count_unique(self, keys: Sequence[str], raw: Sequence[bytes] = ()) -> int:
+        """Estimate the members of the union of HyperLogLogs.
+        
+        ``keys`` are HyperLogLogs in Redis, ``raw`` ones obtained from
+        get_rollups, loaded into short-lived keys for the count.
+        """
+        loaded = [f"hll_tmp:{uuid.uuid4().hex}" for _ in raw]
+        if not keys and not loaded:
+            return 0
+        with _round_trip["count_unique"].time():
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, value in zip(loaded, raw):
+                    pipe.set(key, value, ex=60)
+                pipe.pfcount(*keys, *loaded)
+                if loaded:
+                    pipe.delete(*loaded)
+                results = await pipe.execute()
+        return results[len(loaded)]
+    
+    def _publish_invalidation(self, pipe: Any, key: str) -> None:
+        if self.local is not None:
+            pipe.publish(settings.CACHE_INVALIDATION_CHANNEL, f"{self.instance_id} {key}")
+    
+    async def start_invalidation_listener(self) -> None:
+        """Start evicting L1 entries that other processes write to"""
+        if self.local is not None and self._listener is None:
+            self._listener = asyncio.create_task(self._listen_for_invalidations())
+    
+    async def _listen_for_invalidations(self) -> None:
+        backoff = 0.1
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(settings.CACHE_INVALIDATION_CHANNEL)
+                # Entries cached before (re)subscribing may have missed an invalidation
+                self.local.clear()
+                backoff = 0.1
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    origin, _, key = message["data"].decode("utf-8").partition(" ")
+                    if origin != self.instance_id:
+                        self.local.delete(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error in cache invalidation listener: {e}")
+                self.local.clear()
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 5.0)
+            finally:
+                await pubsub.close()
+    
+    async def acquire_lock(self, key: str, ttl_ms: int) -> Optional[str]:
+        """Try to take a short-lived lock. Returns a token to release it with, or None if held elsewhere"""
+        token = uuid.uuid4().hex
+        with _round_trip["acquire_lock"].time():
+            acquired = await self.redis.set(key, token, px=ttl_ms, nx=True)
+        if acquired:
+            return token
+        return None
+    
+    async def release_lock(self, key: str, token: str) -> None:
+        """Release a lock taken with acquire_lock, unless it has expired and been re-taken"""
+        with _round_trip["release_lock"].time():
+            await self._release_lock(keys=[key], args=[token])
+    
+    async def take_token(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        """Take a token from a rate-limiting bucket, atomically.
+        
+        Returns whether a token was taken and, if not, the seconds until one
+        will be available.
+        """
+        with _round_trip["take_token"].time():
+            allowed, wait_ms = await self._token_bucket(keys=[key], args=[rate, burst])
+        return bool(allowed), wait_ms / 1000
     
     async def close(self) -> None:
         """Close the Redis connection"""
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
         await self.redis.close()
 
 redis_cache = RedisCache()
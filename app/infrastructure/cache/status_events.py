@@ -0,0 +1,123 @@
+"""
+Fan-out of decision events from Redis pub/sub to local subscribers.
+
+Decisions are published on ``{STATUS_EVENTS_CHANNEL_PREFIX}applicant:{id}``
+and ``{STATUS_EVENTS_CHANNEL_PREFIX}application:{id}``. Each process holds a
+single pub/sub connection, subscribed to the channels its local subscribers
+are interested in, and copies every message it receives to their queues.
+"""
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+from app.core.config import settings
+from .redis_client import redis_cache
+
+# Put on every subscriber's queue once the pub/sub connection is back after
+# being lost, since events published meanwhile were missed
+RESYNC = object()
+
+
+def applicant_channel(applicant_id: str) -> str:
+    return f"{settings.STATUS_EVENTS_CHANNEL_PREFIX}applicant:{applicant_id}"
+
+
+def application_channel(application_id: Any) -> str:
+    return f"{settings.STATUS_EVENTS_CHANNEL_PREFIX}application:{application_id}"
+
+
+class StatusEventHub:
+    def __init__(self):
+        # channel -> queues of the local subscribers
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self.pubsub: Optional[Any] = None
+        # Keeps the connection subscribed while no client is, so listen() keeps running
+        self._own_channel = f"{settings.STATUS_EVENTS_CHANNEL_PREFIX}worker:{uuid.uuid4().hex}"
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Start the shared subscription"""
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str) -> AsyncIterator[asyncio.Queue]:
+        """Queue receiving the decoded events published on ``channel``"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.STATUS_STREAM_QUEUE_SIZE)
+        queues = self.subscribers.setdefault(channel, set())
+        queues.add(queue)
+        if len(queues) == 1 and self.pubsub is not None:
+            await self.pubsub.subscribe(channel)
+        try:
+            yield queue
+        finally:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[channel]
+                if self.pubsub is not None:
+                    try:
+                        await self.pubsub.unsubscribe(channel)
+                    except Exception as e:
+                        print(f"Error unsubscribing from {channel}: {e}")
+
+    def _dispatch(self, channel: str, event: Any) -> None:
+        for queue in self.subscribers.get(channel, ()):
+            if queue.full():
+                # A slow client only needs the latest state
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    def _resync(self) -> None:
+        for queues in self.subscribers.values():
+            for queue in queues:
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+
+    async def _listen(self) -> None:
+        backoff = 0.1
+        reconnecting = False
+        while True:
+            pubsub = redis_cache.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self._own_channel, *self.subscribers)
+                self.pubsub = pubsub
+                # Catch channels subscribed to while the first call was in flight
+                if self.subscribers:
+                    await pubsub.subscribe(*self.subscribers)
+                if reconnecting:
+                    self._resync()
+                backoff = 0.1
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    channel = message["channel"].decode("utf-8")
+                    try:
+                        event = redis_cache.codec.decode(message["data"])
+                    except Exception as e:
+                        print(f"Error decoding status event on {channel}: {e}")
+                        continue
+                    self._dispatch(channel, event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error in status event listener: {e}")
+                reconnecting = True
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 5.0)
+            finally:
+                self.pubsub = None
+                await pubsub.close()
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+
+status_events = StatusEventHub()
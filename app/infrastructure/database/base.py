@@ -1,7 +1,22 @@
+import asyncio
+import itertools
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import settings
+from app.core.metrics import (
+    DB_POOL_CHECKED_OUT,
+    DB_POOL_CHECKOUT_WAIT,
+    DB_POOL_CONNECTIONS,
+    DB_REPLICA_FALLBACKS,
+    DB_SESSION_DURATION
+)
 
 SQLALCHEMY_DATABASE_URL = (
     f"postgresql+asyncpg://{settings.POSTGRES_USER}:"
@@ -9,15 +24,77 @@ SQLALCHEMY_DATABASE_URL = (
     f"{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}"
 )
 
-engine = create_async_engine(SQLALCHEMY_DATABASE_URL, echo=settings.DEBUG)
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waits"""
+    checkout_wait = DB_POOL_CHECKOUT_WAIT.labels("primary")
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.checkout_wait.observe(time.perf_counter() - started)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.checkout_wait = self.checkout_wait
+        return pool
+
+def _connect_args(connect_timeout: float) -> Dict[str, Any]:
+    """asyncpg connection arguments for the statement cache settings"""
+    args: Dict[str, Any] = {"timeout": connect_timeout}
+    if settings.DB_PGBOUNCER_MODE:
+        # PgBouncer in transaction mode may hand each transaction a different
+        # server connection, so prepared statements can't be reused and
+        # their names must not collide
+        args["statement_cache_size"] = 0
+        args["prepared_statement_cache_size"] = 0
+        args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+    else:
+        # asyncpg's own cache, and SQLAlchemy's cache of prepared statements
+        args["statement_cache_size"] = settings.DB_STATEMENT_CACHE_SIZE
+        args["prepared_statement_cache_size"] = settings.DB_STATEMENT_CACHE_SIZE
+    return args
+
+def create_pooled_engine(url: str, name: str, connect_timeout: float = 60.0) -> AsyncEngine:
+    """Create an engine with the configured pool, reporting pool metrics under ``name``"""
+    engine = create_async_engine(
+        url,
+        echo=settings.DB_ECHO,
+        poolclass=TimedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        connect_args=_connect_args(connect_timeout)
+    )
+    engine.pool.checkout_wait = DB_POOL_CHECKOUT_WAIT.labels(name)
+    # engine.pool is looked up each time, since dispose() replaces it
+    DB_POOL_CHECKED_OUT.labels(name).set_function(lambda: engine.pool.checkedout())
+    DB_POOL_CONNECTIONS.labels(name).set_function(
+        lambda: engine.pool.checkedin() + engine.pool.checkedout()
+    )
+    return engine
+
+engine = create_pooled_engine(SQLALCHEMY_DATABASE_URL, "primary")
 AsyncSessionLocal = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
 
+replica_engines: List[AsyncEngine] = [
+    create_pooled_engine(url, f"replica-{index}", connect_timeout=settings.DB_REPLICA_CONNECT_TIMEOUT)
+    for index, url in enumerate(settings.DB_READ_REPLICA_URLS)
+]
+_next_replica = itertools.count()
+# Replica index -> monotonic time until which it is skipped after a failure
+_replica_down_until: Dict[int, float] = {}
+
 Base = declarative_base()
 
 async def get_db() -> AsyncSession:
     """Dependency for getting async database session"""
+    started = time.perf_counter()
     async with AsyncSessionLocal() as session:
         try:
             yield session
@@ -27,9 +104,47 @@ async def get_db() -> AsyncSession:
             raise
         finally:
             await session.close()
+            DB_SESSION_DURATION.observe(time.perf_counter() - started)
+
+async def _replica_session() -> Optional[AsyncSession]:
+    """Open a session on a reachable replica, or return None"""
+    if not replica_engines:
+        return None
+    start = next(_next_replica)
+    for offset in range(len(replica_engines)):
+        index = (start + offset) % len(replica_engines)
+        if _replica_down_until.get(index, 0.0) > time.monotonic():
+            continue
+        session = AsyncSession(replica_engines[index], expire_on_commit=False)
+        try:
+            # Check out a connection now, so an unreachable replica is
+            # skipped before any query runs on it
+            await session.connection()
+            return session
+        except (DBAPIError, PoolTimeoutError, OSError, asyncio.TimeoutError) as e:
+            await session.close()
+            print(f"Read replica {index} unavailable, skipping it for {settings.DB_REPLICA_RETRY_SECONDS}s: {e}")
+            _replica_down_until[index] = time.monotonic() + settings.DB_REPLICA_RETRY_SECONDS
+            DB_REPLICA_FALLBACKS.labels(f"replica-{index}").inc()
+    return None
+
+@asynccontextmanager
+async def read_session() -> AsyncIterator[AsyncSession]:
+    """Session for read-only queries.
+
+    Uses the read replicas in DB_READ_REPLICA_URLS round-robin, falling
+    back to the primary when none is configured or reachable. Replicas may
+    lag the primary, so only use this where slightly stale reads are fine.
+    """
+    session = await _replica_session() or AsyncSessionLocal()
+    async with session:
+        yield session
 
 async def init_db():
-    """Initialize database tables"""
+    """Initialize database tables and the partitions for the coming months"""
     async with engine.begin() as conn:
         from .models import Base
+        from .partitions import add_months, current_month, ensure_partitions
         await conn.run_sync(Base.metadata.create_all)
+        first = current_month()
+        await ensure_partitions(conn, first, add_months(first, settings.DB_PARTITION_PREMAKE_MONTHS))
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, Float, Integer, DateTime, Enum as SQLEnum, func
-from sqlalchemy.dialects.postgresql import UUID as PGUUID
+from sqlalchemy import Column, String, Float, Integer, DateTime, Index, LargeBinary, Enum as SQLEnum, func
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, UUID as PGUUID
 import uuid
 from datetime import datetime
 
@@ -7,15 +7,37 @@ from app.domain.models import ApplicationStatus
 from .base import Base
 
 class LoanApplicationDB(Base):
+    """Applications, range partitioned by month of created_at (see partitions.py)"""
     __tablename__ = "loan_applications"
     
-    id = Column(PGUUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
-    applicant_id = Column(String, nullable=False, index=True)
+    # The primary key of a partitioned table has to include the partition key
+    id = Column(PGUUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    applicant_id = Column(String, nullable=False)
     amount = Column(Float, nullable=False)
     term_months = Column(Integer, nullable=False)
     status = Column(SQLEnum(ApplicationStatus), nullable=False, default=ApplicationStatus.PENDING)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
     processed_at = Column(DateTime(timezone=True), nullable=True)
+    reason_codes = Column(ARRAY(String), nullable=False, default=list, server_default="{}")
+    interest_rate = Column(Float, nullable=True)
+    
+    __table_args__ = (
+        # Serves latest-application lookups and keyset-paginated history
+        Index("ix_loan_applications_applicant_created", "applicant_id", created_at.desc()),
+        # Covers the exposure sums, so they are read from the index alone
+        Index(
+            "ix_loan_applications_applicant_status_created",
+            "applicant_id", "status", "created_at",
+            postgresql_include=["amount"]
+        ),
+        # Serves exports filtered by status and creation window
+        Index("ix_loan_applications_status_created", "status", "created_at"),
+        # Rows arrive roughly in time order, so block ranges summarize them in
+        # a tiny fraction of a B-tree's size
+        Index("ix_loan_applications_created_brin", "created_at", postgresql_using="brin"),
+        Index("ix_loan_applications_processed_brin", "processed_at", postgresql_using="brin"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
     
     def to_domain(self):
         from app.domain.models import LoanApplicationInDB
@@ -26,5 +48,19 @@ class LoanApplicationDB(Base):
             term_months=self.term_months,
             status=self.status,
             created_at=self.created_at,
-            processed_at=self.processed_at
+            processed_at=self.processed_at,
+            reason_codes=self.reason_codes or [],
+            interest_rate=self.interest_rate
         )
+
+class DecisionRollupDB(Base):
+    """Decision analytics per window, compacted from the rollups kept in Redis"""
+    __tablename__ = "decision_rollups"
+    
+    granularity = Column(String, primary_key=True)
+    window_start = Column(DateTime(timezone=True), primary_key=True)
+    counters = Column(JSONB, nullable=False)
+    unique_applicants = Column(Integer, nullable=False)
+    # Raw Redis HyperLogLog, so distinct applicants can be counted across windows
+    applicants_hll = Column(LargeBinary, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,152 @@
+"""
+Monthly range partitions of loan_applications.
+
+Each month of created_at gets its own partition, ``loan_applications_pYYYY_MM``,
+created DB_PARTITION_PREMAKE_MONTHS ahead of time. Rows outside every
+partition land in ``loan_applications_default`` rather than fail. That
+partition should stay empty: a month can't be created while the default
+partition holds rows belonging to it. Partitions older than
+DB_PARTITION_RETENTION_MONTHS are detached and archived by
+scripts/manage_partitions.py.
+"""
+import asyncio
+import re
+from datetime import date, datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.config import settings
+from .base import engine
+from .models import LoanApplicationDB
+
+TABLE = LoanApplicationDB.__tablename__
+DEFAULT_PARTITION = f"{TABLE}_default"
+_PARTITION_NAME = re.compile(rf"^{TABLE}_p(\d{{4}})_(\d{{2}})$")
+# Serializes partition DDL between the processes running it
+_PARTITION_LOCK_ID = 7_203_411_265
+
+
+def current_month() -> date:
+    return datetime.now(timezone.utc).date().replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{TABLE}_p{month.year:04d}_{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    """Month held by a monthly partition, or None if ``name`` isn't one"""
+    match = _PARTITION_NAME.match(name)
+    if match is None:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+async def attached_partitions(conn: AsyncConnection) -> List[str]:
+    """Names of the partitions currently attached, default included"""
+    result = await conn.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits"
+            " JOIN pg_class child ON child.oid = pg_inherits.inhrelid"
+            " JOIN pg_class parent ON parent.oid = pg_inherits.inhparent"
+            " WHERE parent.relname = :table ORDER BY child.relname"
+        ),
+        {"table": TABLE}
+    )
+    return list(result.scalars())
+
+
+async def detached_partitions(conn: AsyncConnection) -> List[str]:
+    """Monthly partition tables that are no longer attached, oldest first"""
+    result = await conn.execute(
+        text("SELECT tablename FROM pg_tables WHERE schemaname = current_schema()")
+    )
+    attached = set(await attached_partitions(conn))
+    return sorted(
+        name for name in result.scalars()
+        if partition_month(name) is not None and name not in attached
+    )
+
+
+async def ensure_partitions(conn: AsyncConnection, first: date, last: date) -> List[str]:
+    """Create the default partition and any missing month from ``first`` to ``last``, inclusive.
+
+    Runs in the caller's transaction. A month that can't be created, e.g.
+    because the default partition holds rows belonging to it, is reported
+    and skipped. Returns the names of the partitions created.
+    """
+    await conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": _PARTITION_LOCK_ID})
+    attached = set(await attached_partitions(conn))
+    created: List[str] = []
+    if DEFAULT_PARTITION not in attached:
+        await conn.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT"))
+        created.append(DEFAULT_PARTITION)
+
+    month = first
+    while month <= last:
+        name = partition_name(month)
+        if name not in attached:
+            try:
+                async with conn.begin_nested():
+                    await conn.execute(text(
+                        f"CREATE TABLE {name} PARTITION OF {TABLE}"
+                        f" FOR VALUES FROM ('{month.isoformat()} 00:00:00+00')"
+                        f" TO ('{add_months(month, 1).isoformat()} 00:00:00+00')"
+                    ))
+                created.append(name)
+            except DBAPIError as e:
+                print(f"Error creating partition {name}: {e}")
+        month = add_months(month, 1)
+    return created
+
+
+async def detach_partition(conn: AsyncConnection, name: str) -> None:
+    """Detach a partition, leaving it as a standalone table"""
+    await conn.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name}"))
+
+
+class PartitionMaintainer:
+    """Creates upcoming monthly partitions from a background task"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    async def ensure_ahead(self) -> List[str]:
+        """Create the partitions for this month and the next DB_PARTITION_PREMAKE_MONTHS"""
+        first = current_month()
+        async with engine.begin() as conn:
+            return await ensure_partitions(conn, first, add_months(first, settings.DB_PARTITION_PREMAKE_MONTHS))
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.DB_PARTITION_CHECK_INTERVAL_SECONDS)
+            try:
+                created = await self.ensure_ahead()
+                if created:
+                    print(f"Created partitions: {', '.join(created)}")
+            except Exception as e:
+                print(f"Error creating partitions: {e}")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+partition_maintainer = PartitionMaintainer()
@@ -0,0 +1,282 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy import String, all_, any_, bindparam, func, select, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PGUUID, insert
+from sqlalchemy.orm import aliased
+
+from app.core.config import settings
+from app.domain.models import ApplicationExportFilter, ApplicationStatus, LoanApplicationInDB
+from .base import AsyncSessionLocal, read_session
+from .models import DecisionRollupDB, LoanApplicationDB
+
+# asyncpg caps a statement at 32767 bind parameters
+MAX_ROWS_PER_STATEMENT = 2000
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Naive datetimes in the domain models are UTC"""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _recent_since() -> datetime:
+    """Lower bound of created_at that limits a query to the newest partitions"""
+    return datetime.now(timezone.utc) - timedelta(days=settings.DB_RECENT_WINDOW_DAYS)
+
+
+class LoanApplicationRepository:
+    """Data access for the loan_applications table"""
+    
+    async def upsert_many(self, applications: Sequence[LoanApplicationInDB]) -> None:
+        """Insert or update applications by (id, created_at) using multi-row INSERT ... ON CONFLICT"""
+        rows: List[Dict[str, Any]] = [
+            {
+                "id": application.id,
+                "applicant_id": application.applicant_id,
+                "amount": application.amount,
+                "term_months": application.term_months,
+                "status": application.status,
+                "created_at": _as_utc(application.created_at),
+                "processed_at": _as_utc(application.processed_at),
+                "reason_codes": application.reason_codes,
+                "interest_rate": application.interest_rate,
+            }
+            for application in applications
+        ]
+        if not rows:
+            return
+        
+        async with AsyncSessionLocal() as session:
+            for start in range(0, len(rows), MAX_ROWS_PER_STATEMENT):
+                stmt = insert(LoanApplicationDB).values(rows[start:start + MAX_ROWS_PER_STATEMENT])
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[LoanApplicationDB.id, LoanApplicationDB.created_at],
+                    set_={
+                        "status": stmt.excluded.status,
+                        "processed_at": stmt.excluded.processed_at,
+                        "reason_codes": stmt.excluded.reason_codes,
+                        "interest_rate": stmt.excluded.interest_rate,
+                    }
+                )
+                await session.execute(stmt)
+            await session.commit()
+    
+    async def get(self, application_id: UUID) -> Optional[LoanApplicationInDB]:
+        """Get an application by id, probing the primary key of every partition"""
+        async with read_session() as session:
+            result = await session.execute(
+                select(LoanApplicationDB).where(LoanApplicationDB.id == application_id)
+            )
+            application = result.scalar_one_or_none()
+            return application.to_domain() if application is not None else None
+    
+    async def list_history(
+        self,
+        applicant_id: str,
+        limit: int,
+        before: Optional[Tuple[datetime, UUID]] = None
+    ) -> List[LoanApplicationInDB]:
+        """List an applicant's applications, newest first.
+        
+        ``before`` is the (created_at, id) of the last application on the
+        previous page. Paging by key rather than OFFSET lets every page use
+        the (applicant_id, created_at) index, however deep it is.
+        """
+        query = select(LoanApplicationDB).where(LoanApplicationDB.applicant_id == applicant_id)
+        if before is not None:
+            created_at, application_id = before
+            query = query.where(
+                tuple_(LoanApplicationDB.created_at, LoanApplicationDB.id)
+                < tuple_(_as_utc(created_at), application_id),
+                # Implied by the above, but lets newer partitions be pruned
+                LoanApplicationDB.created_at <= _as_utc(created_at)
+            )
+        query = query.order_by(
+            LoanApplicationDB.created_at.desc(), LoanApplicationDB.id.desc()
+        ).limit(limit)
+        async with read_session() as session:
+            result = await session.execute(query)
+            return [application.to_domain() for application in result.scalars()]
+    
+    async def get_latest(self, applicant_id: str) -> Optional[LoanApplicationInDB]:
+        """Get the most recent application for an applicant.
+        
+        Looks in the partitions within DB_RECENT_WINDOW_DAYS first, and only
+        searches every partition for applicants with nothing recent.
+        """
+        query = (
+            select(LoanApplicationDB)
+            .where(LoanApplicationDB.applicant_id == applicant_id)
+            .order_by(LoanApplicationDB.created_at.desc())
+            .limit(1)
+        )
+        async with read_session() as session:
+            for bounded in (query.where(LoanApplicationDB.created_at >= _recent_since()), query):
+                result = await session.execute(bounded)
+                application = result.scalar_one_or_none()
+                if application is not None:
+                    return application.to_domain()
+            return None
+    
+    async def get_latest_many(self, applicant_ids: Sequence[str]) -> Dict[str, LoanApplicationInDB]:
+        """Get the most recent application for each of several applicants.
+        
+        Applicants without an application are left out of the result. As
+        with get_latest, recent partitions are searched first, and the rest
+        only for applicants not found there.
+        """
+        latest = await self._get_latest_many(applicant_ids, _recent_since())
+        missing = [applicant_id for applicant_id in applicant_ids if applicant_id not in latest]
+        if missing:
+            latest.update(await self._get_latest_many(missing, None))
+        return latest
+    
+    async def _get_latest_many(
+        self,
+        applicant_ids: Sequence[str],
+        since: Optional[datetime]
+    ) -> Dict[str, LoanApplicationInDB]:
+        if not applicant_ids:
+            return {}
+        
+        # The ids go in as a single array parameter, so every batch size
+        # shares one prepared statement
+        ranked = (
+            select(
+                LoanApplicationDB,
+                func.row_number().over(
+                    partition_by=LoanApplicationDB.applicant_id,
+                    order_by=LoanApplicationDB.created_at.desc()
+                ).label("rank")
+            )
+            .where(LoanApplicationDB.applicant_id == any_(
+                bindparam("applicant_ids", list(applicant_ids), type_=ARRAY(String))
+            ))
+        )
+        if since is not None:
+            ranked = ranked.where(LoanApplicationDB.created_at >= since)
+        ranked = ranked.subquery()
+        latest = aliased(LoanApplicationDB, ranked)
+        async with read_session() as session:
+            result = await session.execute(select(latest).where(ranked.c.rank == 1))
+            return {
+                application.applicant_id: application.to_domain()
+                for application in result.scalars()
+            }
+
+    async def approved_exposure_many(
+        self,
+        applicant_ids: Sequence[str],
+        since: datetime,
+        exclude_ids: Sequence[UUID] = ()
+    ) -> Dict[str, float]:
+        """Total amount approved for each of several applicants, for
+        applications created since ``since``.
+        
+        Applicants with nothing approved are left out of the result.
+        ``exclude_ids`` leaves out applications whose latest decision has
+        not been written yet. The window keeps the cost from growing with
+        an applicant's history: older partitions are pruned and the sum is
+        an index-only scan. Reads the primary, since a replica may not
+        have the latest decisions.
+        """
+        if not applicant_ids:
+            return {}
+        
+        query = (
+            select(LoanApplicationDB.applicant_id, func.sum(LoanApplicationDB.amount))
+            .where(
+                LoanApplicationDB.applicant_id == any_(
+                    bindparam("applicant_ids", list(applicant_ids), type_=ARRAY(String))
+                ),
+                LoanApplicationDB.status == ApplicationStatus.APPROVED,
+                LoanApplicationDB.created_at >= since
+            )
+            .group_by(LoanApplicationDB.applicant_id)
+        )
+        if exclude_ids:
+            query = query.where(LoanApplicationDB.id != all_(
+                bindparam("exclude_ids", list(exclude_ids), type_=ARRAY(PGUUID(as_uuid=True)))
+            ))
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(query)
+            return {applicant_id: float(total) for applicant_id, total in result}
+
+    async def stream_rows(
+        self,
+        export_filter: ApplicationExportFilter,
+        chunk_size: int
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Stream matching rows as column dicts, ``chunk_size`` rows at a time.
+        
+        Rows are read through a server-side cursor, so only one chunk is held
+        in memory however many rows match. Rows come in created_at order and
+        skip the ORM, which would otherwise track every row it loaded.
+        """
+        table = LoanApplicationDB.__table__
+        query = select(table).order_by(table.c.created_at, table.c.id)
+        if export_filter.status is not None:
+            query = query.where(table.c.status == export_filter.status)
+        bounds = (
+            (table.c.created_at, export_filter.created_from, export_filter.created_to),
+            (table.c.processed_at, export_filter.processed_from, export_filter.processed_to),
+        )
+        for column, lower, upper in bounds:
+            if lower is not None:
+                query = query.where(column >= _as_utc(lower))
+            if upper is not None:
+                query = query.where(column < _as_utc(upper))
+        
+        async with read_session() as session:
+            result = await session.stream(query.execution_options(yield_per=chunk_size))
+            async for rows in result.mappings().partitions(chunk_size):
+                yield [dict(row) for row in rows]
+
+
+class DecisionRollupRepository:
+    """Data access for the decision_rollups table"""
+    
+    async def upsert_many(self, rollups: Sequence[Dict[str, Any]]) -> None:
+        """Insert or replace rollups, given as column dicts, by (granularity, window_start)"""
+        if not rollups:
+            return
+        async with AsyncSessionLocal() as session:
+            stmt = insert(DecisionRollupDB).values(list(rollups))
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[DecisionRollupDB.granularity, DecisionRollupDB.window_start],
+                set_={
+                    "counters": stmt.excluded.counters,
+                    "unique_applicants": stmt.excluded.unique_applicants,
+                    "applicants_hll": stmt.excluded.applicants_hll,
+                    "updated_at": func.now(),
+                }
+            )
+            await session.execute(stmt)
+            await session.commit()
+    
+    async def list_windows(
+        self,
+        granularity: str,
+        start: datetime,
+        end: datetime
+    ) -> List[Dict[str, Any]]:
+        """Rollups of the windows starting in [start, end), as column dicts"""
+        table = DecisionRollupDB.__table__
+        query = (
+            select(table)
+            .where(
+                table.c.granularity == granularity,
+                table.c.window_start >= start,
+                table.c.window_start < end
+            )
+            .order_by(table.c.window_start)
+        )
+        async with read_session() as session:
+            result = await session.execute(query)
+            return [dict(row) for row in result.mappings()]
+
+loan_application_repository = LoanApplicationRepository()
+decision_rollup_repository = DecisionRollupRepository()
@@ -0,0 +1,100 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+from uuid import UUID
+
+from app.core.config import settings
+from app.domain.models import LoanApplicationInDB
+from .repository import LoanApplicationRepository, loan_application_repository
+
+
+class WriteBehindBuffer:
+    """Buffers processed applications and writes them to Postgres in bulk.
+    
+    The Kafka commit gate, ``flush_if_due``, flushes once
+    DB_WRITE_BEHIND_MAX_ROWS applications are buffered or the oldest one
+    has waited DB_WRITE_BEHIND_FLUSH_INTERVAL_MS; adding never flushes, so a
+    failing database holds back offset commits rather than failing the
+    record that happened to fill the buffer. Only the latest version of
+    each application id is kept, so redelivered messages collapse into one
+    row. Every callback in ``flush_callbacks`` is awaited with the
+    applications of each successful flush.
+    """
+    
+    def __init__(self, repository: LoanApplicationRepository = loan_application_repository):
+        self.repository = repository
+        self._pending: Dict[UUID, LoanApplicationInDB] = {}
+        # Applications being written by the flush in progress
+        self._flushing: Dict[UUID, LoanApplicationInDB] = {}
+        self._oldest_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self.flush_callbacks: List[Callable[[List[LoanApplicationInDB]], Awaitable[None]]] = []
+    
+    def __len__(self) -> int:
+        return len(self._pending)
+    
+    def buffered(self) -> List[LoanApplicationInDB]:
+        """Applications not known to be written yet, latest version of each"""
+        return list({**self._flushing, **self._pending}.values())
+    
+    def add(self, application: LoanApplicationInDB) -> None:
+        """Buffer an application until the next flush"""
+        self._pending[application.id] = application
+        if self._oldest_at is None:
+            self._oldest_at = time.monotonic()
+    
+    def is_due(self) -> bool:
+        """Whether the buffer has reached its size or age limit"""
+        if not self._pending:
+            return False
+        if len(self._pending) >= settings.DB_WRITE_BEHIND_MAX_ROWS:
+            return True
+        age_ms = (time.monotonic() - self._oldest_at) * 1000
+        return age_ms >= settings.DB_WRITE_BEHIND_FLUSH_INTERVAL_MS
+    
+    async def flush(self) -> None:
+        """Write every buffered application to Postgres.
+        
+        On failure the applications are put back (unless a newer version
+        arrived in the meantime) and the error is re-raised.
+        """
+        async with self._lock:
+            if not self._pending:
+                return
+            rows, oldest_at = self._pending, self._oldest_at
+            self._pending, self._oldest_at = {}, None
+            self._flushing = rows
+            flushed = list(rows.values())
+            try:
+                await self.repository.upsert_many(flushed)
+            except Exception:
+                for application_id, application in rows.items():
+                    self._pending.setdefault(application_id, application)
+                self._oldest_at = oldest_at
+                raise
+            finally:
+                self._flushing = {}
+        
+        for callback in self.flush_callbacks:
+            try:
+                await callback(flushed)
+            except Exception as e:
+                # The rows are written; only what the callback maintains is lost
+                print(f"Error in write-behind flush callback: {e}")
+    
+    async def flush_if_due(self, force: bool = False) -> bool:
+        """Flush if due (or if ``force``), then report whether everything
+        buffered so far has been written.
+        
+        Used as the Kafka commit gate: offsets are only committed once the
+        decisions for the records they cover are durable.
+        """
+        if force or self.is_due():
+            await self.flush()
+        return not self._pending and not self._lock.locked()
+    
+    async def stop(self) -> None:
+        """Flush whatever is left"""
+        await self.flush()
+
+write_behind_buffer = WriteBehindBuffer()
@@ -1,19 +1,65 @@
-from aiokafka import AIOKafkaProducer, AIOKafkaConsumer
-import json
+from aiokafka import AIOKafkaProducer, AIOKafkaConsumer, ConsumerRecord, TopicPartition
 import asyncio
-from typing import Dict, Any, Optional, Callable, Awaitable
+import time
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Tuple
 from app.core.config import settings
+from app.core.metrics import (
+    KAFKA_BATCH_DURATION,
+    KAFKA_CONSUMER_LAG,
+    KAFKA_DELIVERY_FAILURES,
+    KAFKA_MESSAGES_DEAD_LETTERED,
+    KAFKA_MESSAGES_PROCESSED,
+    KAFKA_MESSAGES_RETRIED,
+    KAFKA_PRODUCER_PENDING,
+    KAFKA_SEND_DURATION
+)
+from app.infrastructure.serialization.codecs import get_codec
+
+# Headers of retried and dead-lettered records
+RETRY_ATTEMPT_HEADER = "x-retry-attempt"
+RETRY_NOT_BEFORE_HEADER = "x-retry-not-before"  # Epoch milliseconds
+ORIGINAL_TOPIC_HEADER = "x-original-topic"
+ORIGINAL_PARTITION_HEADER = "x-original-partition"
+ORIGINAL_OFFSET_HEADER = "x-original-offset"
+ERROR_HEADER = "x-error"
+FAILED_AT_HEADER = "x-failed-at"  # Epoch milliseconds
+MAX_ERROR_LENGTH = 1000
+
+def retry_topic(topic: str, attempt: int) -> str:
+    return f"{topic}.retry.{attempt}"
+
+def dead_letter_topic(topic: str) -> str:
+    return f"{topic}{settings.KAFKA_DEAD_LETTER_SUFFIX}"
+
+def record_header(msg: ConsumerRecord, name: str) -> Optional[str]:
+    for key, value in msg.headers or ():
+        if key == name:
+            return value.decode("utf-8")
+    return None
 
 class KafkaClient:
     def __init__(self):
         self.producer: Optional[AIOKafkaProducer] = None
         self.consumer: Optional[AIOKafkaConsumer] = None
+        # Every running consumer: the main topic's and those of the retry topics
+        self.consumers: List[AIOKafkaConsumer] = []
+        # Consumers decode every codec's format, whichever one producers use
+        self.codec = get_codec(settings.KAFKA_CODEC)
+        # Records buffered by send_message(wait=False) still awaiting a broker ack
+        self.pending_deliveries = 0
+        self.delivery_failures = 0
+        self.delivery_error_callbacks: List[Callable[[str, BaseException], None]] = []
     
     async def start(self):
         """Start the Kafka producer"""
+        acks = settings.KAFKA_PRODUCER_ACKS
         self.producer = AIOKafkaProducer(
             bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS,
-            value_serializer=lambda v: json.dumps(v).encode('utf-8'),
+            value_serializer=self.codec.encode,
+            acks=acks if acks == "all" else int(acks),
+            linger_ms=settings.KAFKA_PRODUCER_LINGER_MS,
+            max_batch_size=settings.KAFKA_PRODUCER_MAX_BATCH_SIZE,
+            compression_type=settings.KAFKA_PRODUCER_COMPRESSION_TYPE,
             security_protocol="PLAINTEXT"
         )
         await self.producer.start()
@@ -22,44 +68,390 @@ class KafkaClient:
         """Stop the Kafka producer and consumer"""
         if self.producer:
             await self.producer.stop()
-        if self.consumer:
-            await self.consumer.stop()
+        for consumer in list(self.consumers):
+            await consumer.stop()
+        self.consumers.clear()
     
-    async def send_message(self, topic: str, value: Dict[str, Any], key: Optional[bytes] = None):
-        """Send a message to a Kafka topic"""
+    async def send_message(
+        self,
+        topic: str,
+        value: Dict[str, Any],
+        key: Optional[bytes] = None,
+        wait: Optional[bool] = None,
+        headers: Optional[List[Tuple[str, bytes]]] = None
+    ) -> Optional[asyncio.Future]:
+        """Send a message to a Kafka topic
+        
+        With ``wait`` (defaults to KAFKA_PRODUCER_WAIT_FOR_DELIVERY) this
+        returns once the broker has acknowledged the record. Otherwise it
+        returns as soon as the record is buffered, together with the delivery
+        future; delivery failures are counted in ``delivery_failures`` and
+        reported to every callback in ``delivery_error_callbacks``.
+        """
         if not self.producer:
             raise RuntimeError("Producer not started. Call start() first.")
+        if wait is None:
+            wait = settings.KAFKA_PRODUCER_WAIT_FOR_DELIVERY
         
+        started = time.perf_counter()
         try:
-            await self.producer.send_and_wait(topic=topic, value=value, key=key)
+            if wait:
+                await self.producer.send_and_wait(topic=topic, value=value, key=key, headers=headers)
+                return None
+            future = await self.producer.send(topic=topic, value=value, key=key, headers=headers)
         except Exception as e:
             print(f"Error sending message to Kafka: {e}")
             raise
+        finally:
+            KAFKA_SEND_DURATION.labels(topic, str(wait).lower()).observe(time.perf_counter() - started)
+        
+        self.pending_deliveries += 1
+        KAFKA_PRODUCER_PENDING.inc()
+        future.add_done_callback(lambda f: self._on_delivery(topic, f))
+        return future
+    
+    def _on_delivery(self, topic: str, future: asyncio.Future) -> None:
+        """Record the outcome of a buffered send"""
+        self.pending_deliveries -= 1
+        KAFKA_PRODUCER_PENDING.dec()
+        if future.cancelled():
+            error: Optional[BaseException] = asyncio.CancelledError()
+        else:
+            error = future.exception()
+        if error is None:
+            return
+        
+        self.delivery_failures += 1
+        KAFKA_DELIVERY_FAILURES.labels(topic).inc()
+        print(f"Error delivering message to Kafka topic {topic}: {error}")
+        for callback in self.delivery_error_callbacks:
+            try:
+                callback(topic, error)
+            except Exception as e:
+                print(f"Error in Kafka delivery callback: {e}")
     
     async def consume_messages(
         self,
         topic: str,
         group_id: str,
-        process_message: Callable[[Dict[str, Any]], Awaitable[None]]
+        process_message: Callable[[Dict[str, Any]], Awaitable[None]],
+        commit_gate: Optional[Callable[[bool], Awaitable[bool]]] = None,
+        stop: Optional[asyncio.Event] = None
     ) -> None:
-        """Consume messages from a Kafka topic"""
-        self.consumer = AIOKafkaConsumer(
+        """Consume messages from a Kafka topic one at a time
+        
+        Offsets are committed as in ``consume_batches``: after the messages
+        they cover are processed, and only once ``commit_gate`` allows it.
+        With KAFKA_RETRY_ENABLED, messages that fail are sent to the retry
+        topics, which are consumed alongside as in ``consume_batches``.
+        Setting ``stop`` ends consumption after the message in flight.
+        """
+        consumer = self._create_consumer(topic, group_id)
+        self.consumer = consumer
+        
+        async def process_batch(values: List[Dict[str, Any]]) -> List[Optional[Exception]]:
+            results: List[Optional[Exception]] = []
+            for value in values:
+                try:
+                    await process_message(value)
+                    results.append(None)
+                except Exception as e:
+                    results.append(e)
+            return results
+        
+        retry_loops = [
+            asyncio.ensure_future(self._consume_tier(topic, attempt, group_id, process_batch, commit_gate, stop))
+            for attempt in self._retry_attempts()
+        ]
+        await consumer.start()
+        # First uncommitted and next-to-commit offset per partition
+        uncommitted: Dict[TopicPartition, List[int]] = {}
+        processed = KAFKA_MESSAGES_PROCESSED.labels(topic, "ok")
+        failed = KAFKA_MESSAGES_PROCESSED.labels(topic, "error")
+        try:
+            while stop is None or not stop.is_set():
+                batch = await consumer.getmany(timeout_ms=settings.KAFKA_CONSUMER_POLL_TIMEOUT_MS)
+                for tp, msgs in batch.items():
+                    for msg in msgs:
+                        if stop is not None and stop.is_set():
+                            # Not started, so it will be fetched again from the committed offset
+                            break
+                        try:
+                            await process_message(msg.value)
+                            processed.inc()
+                        except Exception as e:
+                            failed.inc()
+                            print(f"Error processing message: {e}")
+                            if settings.KAFKA_RETRY_ENABLED:
+                                try:
+                                    await self._route_failures(topic, [(msg, e)])
+                                except Exception as route_error:
+                                    print(f"Error sending message to the retry topic, dropping it: {route_error}")
+                        uncommitted.setdefault(tp, [msg.offset, 0])[1] = msg.offset + 1
+                        self._record_lag(consumer, msg.topic, msg.partition, msg.offset + 1)
+                await self._commit_processed(consumer, uncommitted, commit_gate)
+        finally:
+            if uncommitted:
+                try:
+                    await self._commit_processed(consumer, uncommitted, commit_gate, force=True)
+                except Exception as e:
+                    print(f"Error committing offsets on shutdown: {e}")
+            await self._cancel(retry_loops)
+            await self.stop()
+    
+    async def consume_batches(
+        self,
+        topic: str,
+        group_id: str,
+        process_batch: Callable[[List[Dict[str, Any]]], Awaitable[List[Optional[Exception]]]],
+        commit_gate: Optional[Callable[[bool], Awaitable[bool]]] = None,
+        stop: Optional[asyncio.Event] = None
+    ) -> None:
+        """Consume messages from a Kafka topic in micro-batches.
+        
+        ``process_batch`` receives the decoded values of a whole batch and
+        returns one entry per record: ``None`` on success or the exception
+        that record failed with. Offsets are committed once per batch, after
+        ``process_batch`` has returned. If it raises, nothing is committed
+        and the batch is read again after a short backoff.
+        
+        With KAFKA_RETRY_ENABLED, records that fail are sent to the retry
+        topic of their next attempt, ``{topic}.retry.{n}``, and to the
+        dead-letter topic once KAFKA_RETRY_DELAYS_MS is used up, so they
+        never hold up their partition. Each retry topic is consumed here too,
+        by its own consumer, which waits until a record's delay has passed
+        before handing it to ``process_batch``.
+        
+        ``commit_gate``, if given, is awaited after every poll and must
+        return True before offsets are committed; offsets of processed
+        batches accumulate until it does. It is called with ``force=True``
+        on shutdown. If it raises, consumption rewinds to the last committed
+        offsets.
+        
+        Setting ``stop`` ends consumption gracefully: the batch in flight is
+        finished and committed, and no further batch is started. The next
+        poll returns within KAFKA_CONSUMER_POLL_TIMEOUT_MS.
+        """
+        loops = [
+            asyncio.ensure_future(self._consume_tier(topic, attempt, group_id, process_batch, commit_gate, stop))
+            for attempt in [0, *self._retry_attempts()]
+        ]
+        try:
+            await asyncio.gather(*loops)
+        finally:
+            await self._cancel(loops)
+            await self.stop()
+    
+    def _create_consumer(self, topic: str, group_id: str, enable_auto_commit: bool = False) -> AIOKafkaConsumer:
+        consumer = AIOKafkaConsumer(
             topic,
             bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS,
             group_id=group_id,
             auto_offset_reset=settings.KAFKA_AUTO_OFFSET_RESET,
-            value_deserializer=lambda m: json.loads(m.decode('utf-8')),
+            enable_auto_commit=enable_auto_commit,
+            max_poll_records=settings.KAFKA_CONSUMER_BATCH_SIZE,
+            value_deserializer=self.codec.decode,
             security_protocol="PLAINTEXT"
         )
+        self.consumers.append(consumer)
+        return consumer
+    
+    def _retry_attempts(self) -> List[int]:
+        if not settings.KAFKA_RETRY_ENABLED:
+            return []
+        return list(range(1, len(settings.KAFKA_RETRY_DELAYS_MS) + 1))
+    
+    @staticmethod
+    async def _cancel(tasks: List[asyncio.Future]) -> None:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _consume_tier(
+        self,
+        topic: str,
+        attempt: int,
+        group_id: str,
+        process_batch: Callable[[List[Dict[str, Any]]], Awaitable[List[Optional[Exception]]]],
+        commit_gate: Optional[Callable[[bool], Awaitable[bool]]],
+        stop: Optional[asyncio.Event]
+    ) -> None:
+        """Batch loop over the main topic (attempt 0) or the retry topic of an attempt"""
+        if attempt:
+            source = retry_topic(topic, attempt)
+            consumer = self._create_consumer(source, f"{group_id}.retry.{attempt}")
+        else:
+            source = topic
+            consumer = self._create_consumer(source, group_id)
+            self.consumer = consumer
         
-        await self.consumer.start()
+        await consumer.start()
+        # First uncommitted and next-to-commit offset per partition
+        uncommitted: Dict[TopicPartition, List[int]] = {}
+        processed = KAFKA_MESSAGES_PROCESSED.labels(source, "ok")
+        failed = KAFKA_MESSAGES_PROCESSED.labels(source, "error")
+        batch_duration = KAFKA_BATCH_DURATION.labels(source)
         try:
-            async for msg in self.consumer:
+            while stop is None or not stop.is_set():
+                batch = await self._poll_batch(consumer)
+                if not batch:
+                    await self._commit_processed(consumer, uncommitted, commit_gate)
+                    continue
+                if stop is not None and stop.is_set():
+                    # Not started, so it will be fetched again from the committed offsets
+                    break
+                
+                records = [msg for msgs in batch.values() for msg in msgs]
+                if attempt and not await self._wait_until_due(records, stop):
+                    break
+                started = time.perf_counter()
                 try:
-                    await process_message(msg.value)
+                    results = await process_batch([msg.value for msg in records])
+                    failures = [(msg, error) for msg, error in zip(records, results) if error is not None]
+                    if failures and settings.KAFKA_RETRY_ENABLED:
+                        await self._route_failures(topic, failures)
                 except Exception as e:
-                    print(f"Error processing message: {e}")
+                    # Records that succeeded are skipped as duplicates when re-read
+                    print(f"Error processing batch of {len(records)} messages: {e}")
+                    for tp, msgs in batch.items():
+                        consumer.seek(tp, msgs[0].offset)
+                    await asyncio.sleep(settings.KAFKA_CONSUMER_RETRY_BACKOFF_MS / 1000)
+                    continue
+                batch_duration.observe(time.perf_counter() - started)
+                
+                for msg, error in failures:
+                    print(f"Error processing message at {msg.topic}[{msg.partition}]@{msg.offset}: {error}")
+                processed.inc(len(records) - len(failures))
+                failed.inc(len(failures))
+                
+                for tp, msgs in batch.items():
+                    uncommitted.setdefault(tp, [msgs[0].offset, 0])[1] = msgs[-1].offset + 1
+                    self._record_lag(consumer, tp.topic, tp.partition, msgs[-1].offset + 1)
+                await self._commit_processed(consumer, uncommitted, commit_gate)
         finally:
-            await self.stop()
+            if uncommitted:
+                try:
+                    await self._commit_processed(consumer, uncommitted, commit_gate, force=True)
+                except Exception as e:
+                    print(f"Error committing offsets on shutdown: {e}")
+            await consumer.stop()
+            if consumer in self.consumers:
+                self.consumers.remove(consumer)
+    
+    async def _wait_until_due(self, records: List[ConsumerRecord], stop: Optional[asyncio.Event]) -> bool:
+        """Sleep until every retried record's delay has passed. Returns False if stopped first"""
+        due = max(int(record_header(msg, RETRY_NOT_BEFORE_HEADER) or 0) for msg in records) / 1000
+        delay = due - time.time()
+        if delay <= 0:
+            return True
+        if stop is None:
+            await asyncio.sleep(delay)
+            return True
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=delay)
+            return False
+        except asyncio.TimeoutError:
+            return True
+    
+    async def _route_failures(self, topic: str, failures: List[Tuple[ConsumerRecord, BaseException]]) -> None:
+        """Send failed records to the retry topic of their next attempt.
+        
+        Records out of attempts go to the dead-letter topic instead. Headers
+        carry the attempt number, when the record is due, where it was first
+        read from and the latest error. Raises if any record can't be sent.
+        """
+        delays = settings.KAFKA_RETRY_DELAYS_MS
+        now_ms = int(time.time() * 1000)
+        sends = []
+        for msg, error in failures:
+            attempt = int(record_header(msg, RETRY_ATTEMPT_HEADER) or 0) + 1
+            origin = [
+                (name, value.encode("utf-8"))
+                for name, value in (
+                    (ORIGINAL_TOPIC_HEADER, record_header(msg, ORIGINAL_TOPIC_HEADER) or msg.topic),
+                    (ORIGINAL_PARTITION_HEADER, record_header(msg, ORIGINAL_PARTITION_HEADER) or str(msg.partition)),
+                    (ORIGINAL_OFFSET_HEADER, record_header(msg, ORIGINAL_OFFSET_HEADER) or str(msg.offset)),
+                )
+            ]
+            headers = [
+                *origin,
+                (RETRY_ATTEMPT_HEADER, str(attempt).encode("utf-8")),
+                (ERROR_HEADER, f"{type(error).__name__}: {error}"[:MAX_ERROR_LENGTH].encode("utf-8")),
+                (FAILED_AT_HEADER, str(now_ms).encode("utf-8")),
+            ]
+            if attempt <= len(delays):
+                destination = retry_topic(topic, attempt)
+                headers.append((RETRY_NOT_BEFORE_HEADER, str(now_ms + delays[attempt - 1]).encode("utf-8")))
+                KAFKA_MESSAGES_RETRIED.labels(destination).inc()
+            else:
+                destination = dead_letter_topic(topic)
+                KAFKA_MESSAGES_DEAD_LETTERED.labels(destination).inc()
+            sends.append(self.send_message(destination, msg.value, key=msg.key, wait=True, headers=headers))
+        await asyncio.gather(*sends)
+    
+    def _record_lag(self, consumer: AIOKafkaConsumer, topic: str, partition: int, position: int) -> None:
+        """Update the lag gauge from the fetcher's latest high watermark"""
+        highwater = consumer.highwater(TopicPartition(topic, partition))
+        if highwater is not None:
+            KAFKA_CONSUMER_LAG.labels(topic, str(partition)).set(max(highwater - position, 0))
+    
+    async def _commit_processed(
+        self,
+        consumer: AIOKafkaConsumer,
+        uncommitted: Dict[TopicPartition, List[int]],
+        commit_gate: Optional[Callable[[bool], Awaitable[bool]]],
+        force: bool = False
+    ) -> None:
+        """Commit processed offsets once ``commit_gate`` allows it"""
+        if commit_gate is not None:
+            try:
+                ready = await commit_gate(force)
+            except Exception as e:
+                print(f"Error before committing offsets, rewinding: {e}")
+                for tp, (first, _) in uncommitted.items():
+                    consumer.seek(tp, first)
+                uncommitted.clear()
+                await asyncio.sleep(settings.KAFKA_CONSUMER_RETRY_BACKOFF_MS / 1000)
+                return
+            if not ready:
+                return
+        if uncommitted:
+            offsets = {tp: end for tp, (_, end) in uncommitted.items()}
+            uncommitted.clear()
+            try:
+                await consumer.commit(offsets)
+            except Exception as e:
+                # Typically a rebalance; the new owner re-reads from the last
+                # committed offset, and re-processing is idempotent
+                print(f"Error committing offsets: {e}")
+    
+    async def _poll_batch(self, consumer: AIOKafkaConsumer) -> Dict[TopicPartition, List[ConsumerRecord]]:
+        """Fetch up to KAFKA_CONSUMER_BATCH_SIZE records.
+        
+        Blocks until at least one record is available (or the poll times
+        out), then keeps fetching for up to KAFKA_CONSUMER_LINGER_MS so that
+        a trickle of messages still ends up in one batch.
+        """
+        max_records = settings.KAFKA_CONSUMER_BATCH_SIZE
+        batch = await consumer.getmany(
+            timeout_ms=settings.KAFKA_CONSUMER_POLL_TIMEOUT_MS,
+            max_records=max_records
+        )
+        count = sum(len(msgs) for msgs in batch.values())
+        deadline = time.monotonic() + settings.KAFKA_CONSUMER_LINGER_MS / 1000
+        
+        while count and count < max_records:
+            remaining_ms = int((deadline - time.monotonic()) * 1000)
+            if remaining_ms <= 0:
+                break
+            more = await consumer.getmany(
+                timeout_ms=remaining_ms,
+                max_records=max_records - count
+            )
+            for tp, msgs in more.items():
+                batch.setdefault(tp, []).extend(msgs)
+                count += len(msgs)
+        
+        return batch
 
 kafka_client = KafkaClient()
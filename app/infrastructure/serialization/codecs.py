@@ -0,0 +1,128 @@
+"""
+Payload codecs shared by the Redis cache and the Kafka client.
+
+Every codec encodes to bytes, and every codec can decode every format, so
+writers can be switched to a new format once all readers are deployed:
+
+- ``json``: plain JSON via the standard library, the original wire format
+- ``orjson``: the same JSON, produced and parsed by orjson
+- ``msgpack``: MessagePack behind a 3 byte header (marker, format, schema version)
+
+A payload without the header is JSON. Cache values written before codecs
+existed were JSON-encoded twice, so a JSON payload that decodes to a JSON
+object literal is unwrapped once more.
+"""
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Callable, Dict
+from uuid import UUID
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional binary format
+    msgpack = None
+
+# 0xC1 never occurs in UTF-8 text (so never starts a JSON payload) and is
+# unused by MessagePack
+HEADER_MARKER = 0xC1
+SCHEMA_VERSION = 1
+
+FORMAT_MSGPACK = 1
+
+
+def _default(value: Any) -> Any:
+    """Encode the types that appear in domain models"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.value
+    return str(value)
+
+
+def _loads_json(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def decode(data: bytes) -> Any:
+    """Decode a payload written by any codec"""
+    if data and data[0] == HEADER_MARKER:
+        if len(data) < 3:
+            raise ValueError("Truncated payload header")
+        fmt, version = data[1], data[2]
+        if version > SCHEMA_VERSION:
+            raise ValueError(f"Unsupported payload schema version {version}")
+        if fmt == FORMAT_MSGPACK:
+            if msgpack is None:
+                raise RuntimeError("msgpack is required to decode this payload")
+            return msgpack.unpackb(data[3:], raw=False)
+        raise ValueError(f"Unknown payload format {fmt}")
+
+    value = _loads_json(data)
+    if isinstance(value, str) and value.startswith("{"):
+        value = _loads_json(value)
+    return value
+
+
+class Codec:
+    name = ""
+
+    def encode(self, value: Any) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, data: bytes) -> Any:
+        return decode(data)
+
+
+class JsonCodec(Codec):
+    name = "json"
+
+    def encode(self, value: Any) -> bytes:
+        return json.dumps(value, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+class OrjsonCodec(Codec):
+    name = "orjson"
+
+    def __init__(self):
+        if orjson is None:
+            raise RuntimeError("The orjson codec requires the orjson package")
+
+    def encode(self, value: Any) -> bytes:
+        return orjson.dumps(value, default=_default)
+
+
+class MsgpackCodec(Codec):
+    name = "msgpack"
+
+    def __init__(self):
+        if msgpack is None:
+            raise RuntimeError("The msgpack codec requires the msgpack package")
+        self._header = bytes([HEADER_MARKER, FORMAT_MSGPACK, SCHEMA_VERSION])
+
+    def encode(self, value: Any) -> bytes:
+        return self._header + msgpack.packb(value, default=_default, use_bin_type=True)
+
+
+CODECS: Dict[str, Callable[[], Codec]] = {
+    JsonCodec.name: JsonCodec,
+    OrjsonCodec.name: OrjsonCodec,
+    MsgpackCodec.name: MsgpackCodec,
+}
+
+
+def get_codec(name: str) -> Codec:
+    """Get a codec by name"""
+    try:
+        return CODECS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown codec {name!r}; expected one of {', '.join(CODECS)}")
@@ -0,0 +1,259 @@
+"""
+Decision analytics, rolled up per hour and per day as decisions are flushed
+to the database.
+
+Each window has a Redis hash of counters and a HyperLogLog of applicant ids.
+The counters hold decisions per status, amount and term histogram buckets,
+and the total amount. Each write-behind flush adds its decisions to them in
+one round trip. Every ANALYTICS_COMPACT_INTERVAL_SECONDS a compactor copies
+them into decision_rollups, where they outlive their
+ANALYTICS_REDIS_TTL_SECONDS in Redis. Reads combine one rollup per window
+and never touch loan_applications.
+"""
+import asyncio
+import bisect
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from app.domain.models import AnalyticsGranularity, ApplicationStatus, LoanApplicationInDB
+from app.infrastructure.cache.redis_client import redis_cache
+from app.infrastructure.database.repository import decision_rollup_repository
+from app.core.config import settings
+
+WINDOW_LENGTHS = {
+    AnalyticsGranularity.HOUR: timedelta(hours=1),
+    AnalyticsGranularity.DAY: timedelta(days=1),
+}
+# Windows covered when no start is given
+DEFAULT_WINDOWS = 24
+
+_COMPACTION_LOCK = "lock:rollup_compaction"
+
+
+def window_start(moment: datetime, granularity: AnalyticsGranularity) -> datetime:
+    """Start of the window holding ``moment``; naive datetimes are UTC"""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    moment = moment.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if granularity is AnalyticsGranularity.DAY:
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def _windows(first: datetime, end: datetime, granularity: AnalyticsGranularity) -> List[datetime]:
+    """Starts of the windows from the one at ``first`` up to ``end``, exclusive"""
+    windows = []
+    start = first
+    while start < end:
+        windows.append(start)
+        start += WINDOW_LENGTHS[granularity]
+    return windows
+
+
+def _keys(granularity: AnalyticsGranularity, start: datetime) -> Tuple[str, str]:
+    suffix = f"{granularity.value}:{int(start.timestamp())}"
+    return f"rollup:{suffix}", f"rollup_applicants:{suffix}"
+
+
+def _compacted_key(granularity: AnalyticsGranularity) -> str:
+    return f"rollup_compacted:{granularity.value}"
+
+
+def _labels(edges: Sequence[float]) -> List[str]:
+    """Histogram bucket names: each inclusive upper bound, then 'inf'"""
+    return [str(int(edge)) if float(edge).is_integer() else str(edge) for edge in edges] + ["inf"]
+
+
+async def record_decisions(applications: Sequence[LoanApplicationInDB]) -> None:
+    """Add decided applications to the rollups of their windows.
+
+    The analytics are best effort: if Redis is unavailable the decisions
+    go uncounted rather than fail.
+    """
+    if not settings.ANALYTICS_ENABLED or not applications:
+        return
+    amount_edges, term_edges = settings.ANALYTICS_AMOUNT_BUCKETS, settings.ANALYTICS_TERM_BUCKETS
+    amount_fields = [f"amount:{label}" for label in _labels(amount_edges)]
+    term_fields = [f"term:{label}" for label in _labels(term_edges)]
+    counters: Dict[str, Counter] = {}
+    uniques: Dict[str, Set[str]] = {}
+    for application in applications:
+        amount_field = amount_fields[bisect.bisect_left(amount_edges, application.amount)]
+        term_field = term_fields[bisect.bisect_left(term_edges, application.term_months)]
+        for granularity in AnalyticsGranularity:
+            counters_key, uniques_key = _keys(granularity, window_start(application.processed_at, granularity))
+            fields = counters.setdefault(counters_key, Counter())
+            fields["decisions"] += 1
+            fields[f"status:{application.status.value}"] += 1
+            fields["amount_sum"] += float(application.amount)
+            fields[amount_field] += 1
+            fields[term_field] += 1
+            uniques.setdefault(uniques_key, set()).add(application.applicant_id)
+    try:
+        await redis_cache.add_rollups(
+            counters,
+            {key: sorted(members) for key, members in uniques.items()},
+            expire=settings.ANALYTICS_REDIS_TTL_SECONDS
+        )
+    except Exception as e:
+        print(f"Error recording decision analytics: {e}")
+
+
+def _aggregate(counters: Dict[str, float], unique_applicants: Optional[int]) -> Dict[str, Any]:
+    decisions = int(counters.get("decisions", 0))
+    by_status = {
+        field.split(":", 1)[1]: int(count)
+        for field, count in counters.items() if field.startswith("status:")
+    }
+    return {
+        "decisions": decisions,
+        "by_status": by_status,
+        "approval_rate": by_status.get(ApplicationStatus.APPROVED.value, 0) / decisions if decisions else None,
+        "average_amount": counters.get("amount_sum", 0.0) / decisions if decisions else None,
+        "amount_histogram": {
+            label: int(counters.get(f"amount:{label}", 0)) for label in _labels(settings.ANALYTICS_AMOUNT_BUCKETS)
+        },
+        "term_histogram": {
+            label: int(counters.get(f"term:{label}", 0)) for label in _labels(settings.ANALYTICS_TERM_BUCKETS)
+        },
+        "unique_applicants": unique_applicants,
+    }
+
+
+class AnalyticsService:
+    @staticmethod
+    async def get(
+        granularity: AnalyticsGranularity,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """Decision analytics per window from ``start`` to ``end``, and for all of them combined.
+
+        Windows still in Redis are read from there, the rest from
+        decision_rollups. Raises ValueError for an empty or too long range.
+        """
+        length = WINDOW_LENGTHS[granularity]
+        end = end or datetime.now(timezone.utc)
+        if end.tzinfo is None:
+            end = end.replace(tzinfo=timezone.utc)
+        first = window_start(start or end - DEFAULT_WINDOWS * length, granularity)
+        if first >= end:
+            raise ValueError("start must be before end")
+        if (end - first) / length > settings.ANALYTICS_MAX_WINDOWS:
+            raise ValueError(f"At most {settings.ANALYTICS_MAX_WINDOWS} {granularity.value} windows can be requested")
+        windows = _windows(first, end, granularity)
+
+        try:
+            live = await redis_cache.get_rollups([_keys(granularity, window) for window in windows])
+        except Exception as e:
+            print(f"Error reading live analytics, using the compacted ones: {e}")
+            live = [({}, None, 0)] * len(windows)
+        rollups = {window: rollup for window, rollup in zip(windows, live) if rollup[0]}
+        from_redis = set(rollups)
+        if len(rollups) < len(windows):
+            for row in await decision_rollup_repository.list_windows(granularity.value, first, end):
+                rollups.setdefault(row["window_start"], (row["counters"], row["applicants_hll"], row["unique_applicants"]))
+
+        total: Counter = Counter()
+        live_keys: List[str] = []
+        stored_hlls: List[bytes] = []
+        results = []
+        for window in windows:
+            if window not in rollups:
+                continue
+            counters, raw_hll, unique_applicants = rollups[window]
+            total.update(counters)
+            if window in from_redis:
+                live_keys.append(_keys(granularity, window)[1])
+            elif raw_hll is not None:
+                stored_hlls.append(raw_hll)
+            results.append({"window_start": window, **_aggregate(counters, unique_applicants)})
+
+        try:
+            unique_total: Optional[int] = await redis_cache.count_unique(live_keys, stored_hlls)
+        except Exception as e:
+            print(f"Error counting unique applicants: {e}")
+            unique_total = None
+        return {
+            "granularity": granularity,
+            "start": first,
+            "end": first + len(windows) * length,
+            "windows": results,
+            "summary": _aggregate(total, unique_total),
+        }
+
+
+class RollupCompactor:
+    """Copies the rollups in Redis into decision_rollups, from a background task"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    async def compact(self) -> int:
+        """Copy the windows that may have changed since the last run. Returns how many were copied.
+
+        Only one consumer compacts at a time; the others skip their turn.
+        """
+        token = await redis_cache.acquire_lock(
+            _COMPACTION_LOCK, int(settings.ANALYTICS_COMPACT_INTERVAL_SECONDS * 1000)
+        )
+        if token is None:
+            return 0
+        try:
+            now = datetime.now(timezone.utc)
+            copied = 0
+            for granularity in AnalyticsGranularity:
+                current = window_start(now, granularity)
+                # Windows before the one open at the last run are final in Postgres
+                first = window_start(now - timedelta(seconds=settings.ANALYTICS_REDIS_TTL_SECONDS), granularity)
+                marker = await redis_cache.get(_compacted_key(granularity))
+                if marker:
+                    first = max(first, datetime.fromisoformat(marker["through"]))
+                windows = _windows(first, current + WINDOW_LENGTHS[granularity], granularity)
+                live = await redis_cache.get_rollups([_keys(granularity, window) for window in windows])
+                rows = [
+                    {
+                        "granularity": granularity.value,
+                        "window_start": window,
+                        "counters": counters,
+                        "unique_applicants": unique_applicants,
+                        "applicants_hll": raw_hll,
+                    }
+                    for window, (counters, raw_hll, unique_applicants) in zip(windows, live)
+                    if counters
+                ]
+                await decision_rollup_repository.upsert_many(rows)
+                await redis_cache.set(
+                    _compacted_key(granularity),
+                    {"through": current.isoformat()},
+                    expire=settings.ANALYTICS_REDIS_TTL_SECONDS
+                )
+                copied += len(rows)
+            return copied
+        finally:
+            await redis_cache.release_lock(_COMPACTION_LOCK, token)
+
+    async def start(self) -> None:
+        if settings.ANALYTICS_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.ANALYTICS_COMPACT_INTERVAL_SECONDS)
+            try:
+                await self.compact()
+            except Exception as e:
+                print(f"Error compacting decision analytics: {e}")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+rollup_compactor = RollupCompactor()
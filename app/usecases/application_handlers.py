@@ -1,7 +1,10 @@
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from uuid import UUID
-from typing import Optional, Dict, Any
-import json
+from typing import Optional, Dict, Any, List, Tuple, Union
+import asyncio
+import base64
+import hashlib
+import time
 
 from app.domain.models import (
     LoanApplicationCreate, 
@@ -10,7 +13,181 @@ from app.domain.models import (
 )
 from app.infrastructure.database.models import LoanApplicationDB
 from app.infrastructure.database.base import get_db
+from app.infrastructure.database.write_behind import write_behind_buffer
+from app.infrastructure.database.repository import loan_application_repository
+from app.infrastructure.cache.local_cache import RecentSet
 from app.infrastructure.cache.redis_client import redis_cache
+from app.infrastructure.cache.single_flight import SingleFlight
+from app.infrastructure.cache.status_events import applicant_channel, application_channel
+from app.usecases.analytics import record_decisions
+from app.usecases.decision_engine import Decision, decision_engine
+from app.core.config import settings
+from app.core.metrics import DECISION_BATCH_DURATION, DECISION_ONE_DURATION, KAFKA_DUPLICATES_SKIPPED
+
+# Cached in place of a status when the applicant has no application
+NOT_FOUND_MARKER = {"not_found": True}
+
+# Coalesces concurrent status cache misses within this worker
+_status_loads = SingleFlight()
+
+# Ids of applications this consumer decided recently, to drop redeliveries
+# without a Redis round trip
+_recent_ids = RecentSet(max_entries=settings.CONSUMER_DEDUP_RECENT_IDS, ttl=settings.CONSUMER_DEDUP_TTL_SECONDS)
+_SKIPPED_IN_BATCH = KAFKA_DUPLICATES_SKIPPED.labels("batch")
+_SKIPPED_IN_MEMORY = KAFKA_DUPLICATES_SKIPPED.labels("memory")
+_SKIPPED_IN_REDIS = KAFKA_DUPLICATES_SKIPPED.labels("redis")
+
+def _status_key(applicant_id: str) -> str:
+    return f"app_status:{applicant_id}"
+
+def _status_response_key(applicant_id: str) -> str:
+    return f"app_status_response:{applicant_id}"
+
+def _status_version_key(applicant_id: str) -> str:
+    """created_at of the application behind the applicant's cached status"""
+    return f"app_status_version:{applicant_id}"
+
+def _application_key(application_id: Union[UUID, str]) -> str:
+    return f"app:{application_id}"
+
+def _decided_key(application_id: Union[UUID, str]) -> str:
+    return f"app_decided:{application_id}"
+
+def _history_key(applicant_id: str) -> str:
+    return f"app_history:{applicant_id}"
+
+def _history_score(created_at: datetime) -> float:
+    """Sort score of an application in the history index; naive datetimes are UTC"""
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return created_at.timestamp()
+
+def encode_history_cursor(created_at: datetime, application_id: Union[UUID, str]) -> str:
+    """Opaque cursor pointing just past the given application"""
+    raw = f"{created_at.isoformat()}|{application_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_history_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """Inverse of encode_history_cursor; raises ValueError on malformed cursors"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, application_id = raw.split("|")
+        return datetime.fromisoformat(created_at), UUID(application_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+async def _already_decided(applications: List[LoanApplicationInDB]) -> List[bool]:
+    """Flag applications that were decided before, e.g. redelivered after a rebalance.
+    
+    Repeats within the list are flagged too. Ids missing from the recent-ids
+    set are looked up with one MGET of their ``app_decided:{id}`` markers.
+    Both are only written once a decision is in the database (see
+    _mark_decided), so a decision lost before its flush is made again.
+    """
+    decided = [False] * len(applications)
+    if not settings.CONSUMER_DEDUP_ENABLED:
+        return decided
+    seen = set()
+    unknown: List[int] = []
+    for index, application in enumerate(applications):
+        application_id = str(application.id)
+        if application_id in seen:
+            decided[index] = True
+            _SKIPPED_IN_BATCH.inc()
+        elif application_id in _recent_ids:
+            decided[index] = True
+            _SKIPPED_IN_MEMORY.inc()
+        else:
+            unknown.append(index)
+        seen.add(application_id)
+    if not unknown:
+        return decided
+    
+    try:
+        cached = await redis_cache.get_many([_decided_key(applications[index].id) for index in unknown])
+    except Exception as e:
+        # Only an optimization: decide them again rather than fail the batch
+        print(f"Error checking for redelivered applications: {e}")
+        return decided
+    found = [index for index, value in zip(unknown, cached) if value is not None]
+    for index in found:
+        decided[index] = True
+        _SKIPPED_IN_REDIS.inc()
+    _recent_ids.add_many(str(applications[index].id) for index in found)
+    return decided
+
+async def _mark_decided(applications: List[LoanApplicationInDB]) -> None:
+    """Remember applications whose decisions were flushed to the database"""
+    if not settings.CONSUMER_DEDUP_ENABLED:
+        return
+    _recent_ids.add_many(str(application.id) for application in applications)
+    await redis_cache.set_many(
+        {_decided_key(application.id): {"decided": True} for application in applications},
+        expire=int(settings.CONSUMER_DEDUP_TTL_SECONDS)
+    )
+
+write_behind_buffer.flush_callbacks.append(_mark_decided)
+# Counted once written, so a decision lost before its flush isn't counted twice
+write_behind_buffer.flush_callbacks.append(record_decisions)
+
+async def _prior_exposure(applications: List[LoanApplicationInDB]) -> List[float]:
+    """Amount approved for the applicant of each application in the last
+    DECISION_EXPOSURE_WINDOW_DAYS.
+    
+    Adds the approvals still in the write-behind buffer to those in the
+    database. Applications are keyed by applicant in Kafka, so every
+    decision for an applicant is made by the consumer holding its
+    partition. Skipped when no rule looks at exposure.
+    """
+    if not decision_engine.uses_exposure or not applications:
+        return [0.0] * len(applications)
+    since = datetime.now(timezone.utc) - timedelta(days=settings.DECISION_EXPOSURE_WINDOW_DAYS)
+    applicant_ids = {application.applicant_id for application in applications}
+    buffered = [
+        application for application in write_behind_buffer.buffered()
+        if application.applicant_id in applicant_ids
+        and _history_score(application.created_at) >= since.timestamp()
+    ]
+    exposure = await loan_application_repository.approved_exposure_many(
+        list(applicant_ids), since, [application.id for application in buffered]
+    )
+    for application in buffered:
+        if application.status == ApplicationStatus.APPROVED:
+            exposure[application.applicant_id] = exposure.get(application.applicant_id, 0.0) + application.amount
+    return [exposure.get(application.applicant_id, 0.0) for application in applications]
+
+def _to_cache_dict(application: LoanApplicationInDB) -> Dict[str, Any]:
+    """Convert an application to a JSON-safe dict for the status cache"""
+    app_dict = application.dict()
+    app_dict['processed_at'] = app_dict['processed_at'].isoformat() if app_dict['processed_at'] else None
+    app_dict['created_at'] = app_dict['created_at'].isoformat()
+    app_dict['id'] = str(app_dict['id'])  # Convert UUID to string
+    return app_dict
+
+def _status_response(application: LoanApplicationInDB) -> bytes:
+    """Response body of the status endpoint, preceded by its ETag and a newline"""
+    body = application.json().encode("utf-8")
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    return etag.encode("ascii") + b"\n" + body
+
+async def _cache_status(
+    applicant_id: str,
+    value: Dict[str, Any],
+    expire: Optional[int] = None,
+    nx: bool = False
+) -> bool:
+    return await redis_cache.set(_status_key(applicant_id), value, expire=expire, nx=nx)
+
+def _status_entry(
+    application: LoanApplicationInDB,
+    app_dict: Dict[str, Any]
+) -> Tuple[str, float, Dict[str, Any]]:
+    """A set_many_if_newer entry caching an application as its applicant's status"""
+    return (
+        _status_version_key(application.applicant_id),
+        _history_score(application.created_at),
+        {_status_key(application.applicant_id): app_dict}
+    )
 
 class LoanApplicationService:
     @staticmethod
@@ -29,53 +206,322 @@ class LoanApplicationService:
     async def process_application(application_data: Dict[str, Any]) -> None:
         """Process a loan application from Kafka"""
         try:
-            # Validate the application
-            application = LoanApplicationCreate(**application_data)
-            
-            # Simple validation logic
-            if application.amount <= 0:
-                status = ApplicationStatus.REJECTED
-            elif application.amount > 50000:  # Example threshold
-                status = ApplicationStatus.REJECTED
-            else:
-                status = ApplicationStatus.APPROVED
-            
-            # Create the processed application
-            processed_app = LoanApplicationInDB(
-                **application.dict(),
-                status=status,
-                processed_at=datetime.utcnow()
-            )
-            
-            # Convert to dict and ensure datetime and UUID are properly serialized
-            app_dict = processed_app.dict()
-            app_dict['processed_at'] = app_dict['processed_at'].isoformat() if app_dict['processed_at'] else None
-            app_dict['created_at'] = app_dict['created_at'].isoformat()
-            app_dict['id'] = str(app_dict['id'])  # Convert UUID to string
-            
-            # Store in Redis with proper JSON serialization
-            await redis_cache.set(
-                f"app_status:{processed_app.applicant_id}",
-                json.dumps(app_dict)
-            )
-            
-            print(f"Processed application: {processed_app}")
-            
+            # Validate the application. Messages from the API carry the id and
+            # created_at it handed out; older messages get fresh ones.
+            application = LoanApplicationInDB(**application_data)
+            if (await _already_decided([application]))[0]:
+                return
+            exposure = (await _prior_exposure([application]))[0]
+            with DECISION_ONE_DURATION.time():
+                decision = decision_engine.evaluate_one(application.amount, application.term_months, exposure)
+            await LoanApplicationService._store_decision(application, decision)
         except Exception as e:
             print(f"Error processing application: {e}")
             raise
     
+    @staticmethod
+    async def process_applications(
+        batch: List[Dict[str, Any]]
+    ) -> List[Optional[Exception]]:
+        """Process a batch of loan applications from Kafka.
+        
+        The decision rules are evaluated for the whole batch in one
+        vectorized pass, with each applicant's approved exposure. Decisions are then stored concurrently, with at
+        most KAFKA_CONSUMER_MAX_IN_FLIGHT in flight at once; records for the
+        same applicant are stored one after another, in batch order.
+        Returns one entry per record: None on success, otherwise the
+        exception that record failed with.
+        """
+        results: List[Optional[Exception]] = [None] * len(batch)
+        applications: List[LoanApplicationInDB] = []
+        indexes: List[int] = []
+        for index, application_data in enumerate(batch):
+            try:
+                applications.append(LoanApplicationInDB(**application_data))
+                indexes.append(index)
+            except Exception as e:
+                print(f"Error processing application: {e}")
+                results[index] = e
+        
+        # Redelivered applications count as processed, without a new decision
+        decided = await _already_decided(applications)
+        if any(decided):
+            applications = [a for a, skip in zip(applications, decided) if not skip]
+            indexes = [i for i, skip in zip(indexes, decided) if not skip]
+        
+        prior_exposure = await _prior_exposure(applications)
+        with DECISION_BATCH_DURATION.time():
+            decisions = decision_engine.evaluate_batch(
+                amounts=[application.amount for application in applications],
+                term_months=[application.term_months for application in applications],
+                applicant_ids=[application.applicant_id for application in applications],
+                prior_exposure=prior_exposure
+            )
+        
+        # Group positions by applicant, preserving batch order
+        by_applicant: Dict[str, List[int]] = {}
+        for position, application in enumerate(applications):
+            by_applicant.setdefault(application.applicant_id, []).append(position)
+        
+        semaphore = asyncio.Semaphore(settings.KAFKA_CONSUMER_MAX_IN_FLIGHT)
+        
+        async def store_in_order(positions: List[int]) -> None:
+            for position in positions:
+                async with semaphore:
+                    try:
+                        await LoanApplicationService._store_decision(
+                            applications[position], decisions[position]
+                        )
+                    except Exception as e:
+                        print(f"Error processing application: {e}")
+                        results[indexes[position]] = e
+        
+        await asyncio.gather(*(store_in_order(positions) for positions in by_applicant.values()))
+        return results
+    
+    @staticmethod
+    async def _store_decision(application: LoanApplicationInDB, decision: Decision) -> LoanApplicationInDB:
+        """Record a decision in the status cache and the database, returning the decided application"""
+        processed_app = application.copy(
+            update={
+                "status": decision.status,
+                "reason_codes": decision.reason_codes,
+                "interest_rate": decision.interest_rate,
+                "processed_at": datetime.utcnow()
+            }
+        )
+        
+        # Store in Redis, replacing any cached status or "not found" marker
+        # unless a newer application is cached (e.g. this one came back from
+        # a retry topic), index the application in the applicant's recent
+        # history and notify clients streaming its status
+        app_dict = _to_cache_dict(processed_app)
+        [latest], _, _ = await asyncio.gather(
+            redis_cache.set_many_if_newer([(
+                _status_version_key(processed_app.applicant_id),
+                _history_score(processed_app.created_at),
+                {
+                    _status_key(processed_app.applicant_id): app_dict,
+                    _status_response_key(processed_app.applicant_id): _status_response(processed_app)
+                }
+            )]),
+            redis_cache.set(_application_key(processed_app.id), app_dict),
+            redis_cache.index_add(
+                _history_key(processed_app.applicant_id),
+                str(processed_app.id),
+                _history_score(processed_app.created_at),
+                max_entries=settings.HISTORY_CACHE_MAX_ENTRIES
+            )
+        )
+        if settings.STATUS_STREAM_ENABLED:
+            channels = [application_channel(processed_app.id)]
+            if latest:
+                channels.append(applicant_channel(processed_app.applicant_id))
+            await redis_cache.publish(channels, app_dict)
+        
+        # Persist durably; the write is batched with other decisions by the
+        # commit gate, and the application only counts as decided once it is
+        # flushed
+        write_behind_buffer.add(processed_app)
+        
+        print(f"Processed application: {processed_app}")
+        return processed_app
+    
     @staticmethod
     async def get_application_status(
         applicant_id: str
     ) -> Optional[Dict[str, Any]]:
-        """Get the status of an application"""
-        # Try to get from cache first
-        cached_status = await redis_cache.get(f"app_status:{applicant_id}")
+        """Get the status of an applicant's most recent application.
+        
+        Reads through the Redis cache to the database. Concurrent misses for
+        the same applicant share one database query.
+        """
+        cached_status = await redis_cache.get(_status_key(applicant_id))
         if cached_status:
-            return json.loads(cached_status)
+            return None if cached_status == NOT_FOUND_MARKER else cached_status
         
-        # If not in cache, get from database
-        # In a real app, we would query the database here
-        # For now, return None if not in cache
-        return None
+        return await _status_loads.do(
+            applicant_id,
+            lambda: LoanApplicationService._load_application_status(applicant_id)
+        )
+    
+    @staticmethod
+    async def get_application_status_response(
+        applicant_id: str
+    ) -> Optional[Tuple[str, bytes]]:
+        """Get the status endpoint's response body for an applicant, with its ETag.
+        
+        Decisions cache the serialized body next to the status, so it is
+        served without being decoded, validated or encoded again. On a miss
+        it is built from get_application_status and cached, unless a
+        decision was stored meanwhile.
+        """
+        cache_key = _status_response_key(applicant_id)
+        cached = await redis_cache.get_bytes(cache_key)
+        if cached is None:
+            app_status = await LoanApplicationService.get_application_status(applicant_id)
+            if app_status is None:
+                return None
+            cached = _status_response(LoanApplicationInDB(**app_status))
+            await redis_cache.set_bytes(cache_key, cached, nx=True)
+        etag, _, body = cached.partition(b"\n")
+        return etag.decode("ascii"), body
+    
+    @staticmethod
+    async def get_application(
+        application_id: UUID
+    ) -> Optional[Dict[str, Any]]:
+        """Get an application by id, reading through the Redis cache"""
+        cached = await redis_cache.get(_application_key(application_id))
+        if cached:
+            return cached
+        
+        application = await loan_application_repository.get(application_id)
+        if application is None:
+            return None
+        app_dict = _to_cache_dict(application)
+        await redis_cache.set(_application_key(application_id), app_dict, nx=True)
+        return app_dict
+    
+    @staticmethod
+    async def get_application_history(
+        applicant_id: str,
+        limit: int,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Get a page of an applicant's applications, newest first.
+        
+        Pages are keyed on (created_at, id) of the last application returned,
+        so every page is an index range scan rather than an OFFSET. Pages that
+        fall within the HISTORY_CACHE_MAX_ENTRIES most recent applications are
+        served from the Redis history index; the rest come from the database.
+        Returns the page and the cursor of the next one, or None on the last
+        page. Raises ValueError for a malformed cursor.
+        """
+        before = decode_history_cursor(cursor) if cursor else None
+        
+        page = await LoanApplicationService._cached_history_page(applicant_id, limit, before)
+        if page is None:
+            applications = await loan_application_repository.list_history(applicant_id, limit + 1, before)
+            page = [_to_cache_dict(application) for application in applications]
+        
+        if len(page) <= limit:
+            return page, None
+        page = page[:limit]
+        last = page[-1]
+        return page, encode_history_cursor(datetime.fromisoformat(last["created_at"]), last["id"])
+    
+    @staticmethod
+    async def _cached_history_page(
+        applicant_id: str,
+        limit: int,
+        before: Optional[Tuple[datetime, UUID]]
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Up to limit + 1 applications from the Redis history index.
+        
+        Returns None unless the index holds a full page plus the first entry
+        of the next one, since a shorter result can't tell the end of the
+        history from the end of the index.
+        """
+        max_score = None
+        count = limit + 1
+        if before is not None:
+            max_score = _history_score(before[0])
+            # Entries tied on the cursor's score are filtered out below
+            count += 1
+        entries = await redis_cache.index_range(_history_key(applicant_id), max_score, count)
+        if before is not None:
+            cursor_id = str(before[1])
+            entries = [
+                (member, score) for member, score in entries
+                if score < max_score or member < cursor_id
+            ]
+        if len(entries) < limit + 1:
+            return None
+        
+        entries = entries[:limit + 1]
+        applications = await redis_cache.get_many([_application_key(member) for member, _ in entries])
+        if not all(applications):
+            return None
+        return applications
+    
+    @staticmethod
+    async def get_application_statuses(
+        applicant_ids: List[str]
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Get the status of the most recent application for several applicants.
+        
+        Cached statuses come from one MGET; all misses are resolved with a
+        single database query and written back to the cache in one pipeline.
+        """
+        applicant_ids = list(dict.fromkeys(applicant_ids))
+        cached = await redis_cache.get_many([_status_key(applicant_id) for applicant_id in applicant_ids])
+        
+        statuses: Dict[str, Optional[Dict[str, Any]]] = {}
+        missing: List[str] = []
+        for applicant_id, cached_status in zip(applicant_ids, cached):
+            if cached_status:
+                statuses[applicant_id] = None if cached_status == NOT_FOUND_MARKER else cached_status
+            else:
+                missing.append(applicant_id)
+        if not missing:
+            return statuses
+        
+        loaded = await loan_application_repository.get_latest_many(missing)
+        found: List[Tuple[str, float, Dict[str, Any]]] = []
+        not_found: Dict[str, Any] = {}
+        for applicant_id in missing:
+            application = loaded.get(applicant_id)
+            if application is None:
+                statuses[applicant_id] = None
+                not_found[_status_key(applicant_id)] = NOT_FOUND_MARKER
+            else:
+                statuses[applicant_id] = _to_cache_dict(application)
+                found.append(_status_entry(application, statuses[applicant_id]))
+        
+        # As with single lookups, never overwrite a decision stored meanwhile
+        await redis_cache.set_many_if_newer(found)
+        await redis_cache.set_many(not_found, expire=settings.STATUS_CACHE_NOT_FOUND_TTL, nx=True)
+        return statuses
+    
+    @staticmethod
+    async def _load_application_status(
+        applicant_id: str
+    ) -> Optional[Dict[str, Any]]:
+        """Load a status from the database into the cache.
+        
+        With STATUS_CACHE_LOCK_ENABLED, only the worker holding the Redis lock
+        queries the database; others wait for it to fill the cache and only
+        fall back to the database if that takes too long.
+        """
+        cache_key = _status_key(applicant_id)
+        lock_key = f"lock:{cache_key}"
+        lock_token = None
+        if settings.STATUS_CACHE_LOCK_ENABLED:
+            lock_token = await redis_cache.acquire_lock(lock_key, settings.STATUS_CACHE_LOCK_TTL_MS)
+            if lock_token is None:
+                deadline = time.monotonic() + settings.STATUS_CACHE_LOCK_WAIT_MS / 1000
+                while time.monotonic() < deadline:
+                    await asyncio.sleep(settings.STATUS_CACHE_LOCK_POLL_MS / 1000)
+                    cached_status = await redis_cache.get(cache_key)
+                    if cached_status:
+                        return None if cached_status == NOT_FOUND_MARKER else cached_status
+        
+        try:
+            application = await loan_application_repository.get_latest(applicant_id)
+            # Never replace a newer decision stored by the consumer while we
+            # were querying
+            if application is None:
+                await _cache_status(
+                    applicant_id,
+                    NOT_FOUND_MARKER,
+                    expire=settings.STATUS_CACHE_NOT_FOUND_TTL,
+                    nx=True
+                )
+                return None
+            app_dict = _to_cache_dict(application)
+            await redis_cache.set_many_if_newer([_status_entry(application, app_dict)])
+            return app_dict
+        finally:
+            if lock_token is not None:
+                await redis_cache.release_lock(lock_key, lock_token)
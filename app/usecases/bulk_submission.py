@@ -0,0 +1,227 @@
+import codecs
+import json
+import re
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Tuple, Union
+
+from pydantic import ValidationError
+
+from app.domain.models import LoanApplicationCreate, LoanApplicationInDB
+from app.infrastructure.messaging.kafka_client import kafka_client
+from app.core.config import settings
+
+# A parsed record is either the decoded JSON value or the error that
+# prevented decoding it
+ParsedRecord = Union[Any, Exception]
+
+# Characters that may continue a number
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*")
+
+
+class RecordTooLarge(ValueError):
+    pass
+
+
+async def _iter_text(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream as UTF-8, tolerating characters split across chunks"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    async for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+async def _iter_ndjson(first: str, texts: AsyncIterator[str]) -> AsyncIterator[ParsedRecord]:
+    """Yield one record per non-blank line"""
+    max_bytes = settings.BULK_SUBMIT_MAX_RECORD_BYTES
+    buffer = first
+    skipping = False  # Inside an oversized line, discarding until its newline
+
+    while True:
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            if skipping:
+                skipping = False
+            elif line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    yield e
+        if len(buffer) > max_bytes and not skipping:
+            yield RecordTooLarge(f"Record exceeds {max_bytes} bytes")
+            skipping = True
+        if skipping:
+            buffer = ""
+        try:
+            buffer += await anext(texts)
+        except StopAsyncIteration:
+            break
+
+    if buffer.strip() and not skipping:
+        try:
+            yield json.loads(buffer)
+        except ValueError as e:
+            yield e
+
+
+async def _iter_json_array(first: str, texts: AsyncIterator[str]) -> AsyncIterator[ParsedRecord]:
+    """Yield the elements of a top-level JSON array as they become complete.
+
+    Unlike NDJSON there is no way to resynchronise after a malformed
+    element, so the first syntax error ends the stream.
+    """
+    max_bytes = settings.BULK_SUBMIT_MAX_RECORD_BYTES
+    decoder = json.JSONDecoder()
+    buffer = first.lstrip()[1:]  # Drop the opening bracket
+    exhausted = False
+    expect_value = True  # False while waiting for a "," or "]"
+
+    while True:
+        buffer = buffer.lstrip()
+        if buffer and not expect_value:
+            if buffer[0] == "]":
+                return
+            if buffer[0] != ",":
+                yield ValueError(f"Expected ',' or ']' but found {buffer[0]!r}")
+                return
+            buffer = buffer[1:].lstrip()
+            expect_value = True
+        if buffer and expect_value:
+            if buffer[0] == "]":
+                return
+            try:
+                value, end = decoder.raw_decode(buffer)
+            except ValueError as e:
+                # Most likely an element split across chunks; wait for more
+                if exhausted:
+                    yield e
+                    return
+                if len(buffer) > max_bytes:
+                    yield RecordTooLarge(f"Record exceeds {max_bytes} bytes")
+                    return
+            else:
+                # A number may continue in the next chunk, so hold scalars
+                # back until something that can't be part of one follows
+                if (
+                    isinstance(value, (dict, list, str))
+                    or exhausted
+                    or _NUMBER_TAIL.match(buffer, end).end() < len(buffer)
+                ):
+                    yield value
+                    buffer = buffer[end:]
+                    expect_value = False
+                    continue
+                if len(buffer) > max_bytes:
+                    yield RecordTooLarge(f"Record exceeds {max_bytes} bytes")
+                    return
+        if exhausted:
+            yield ValueError("Unterminated JSON array")
+            return
+        try:
+            buffer += await anext(texts)
+        except StopAsyncIteration:
+            exhausted = True
+
+
+async def iter_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[ParsedRecord]:
+    """Parse a streamed NDJSON or JSON array body into records.
+
+    The format is picked from the first non-whitespace character. Only one
+    record (plus one network chunk) is held in memory at a time.
+    """
+    texts = _iter_text(chunks).__aiter__()
+    first = ""
+    async for text in texts:
+        first += text
+        if first.strip():
+            break
+    if not first.strip():
+        return
+
+    if first.lstrip().startswith("["):
+        records = _iter_json_array(first, texts)
+    else:
+        records = _iter_ndjson(first, texts)
+    async for record in records:
+        yield record
+
+
+def _describe(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors()
+        )
+    return str(error)
+
+
+class BulkSubmissionService:
+    @staticmethod
+    async def submit(chunks: AsyncIterator[bytes]) -> AsyncIterator[Dict[str, Any]]:
+        """Validate and publish a streamed upload, yielding one result per record.
+
+        Records are validated as they arrive and published to Kafka in
+        batches of BULK_SUBMIT_BATCH_SIZE without waiting for delivery, so
+        up to BULK_SUBMIT_PIPELINE_DEPTH batches are in flight while the
+        next one is read. Results are yielded in upload order once a
+        batch's deliveries have completed.
+        """
+        batch_size = settings.BULK_SUBMIT_BATCH_SIZE
+        in_flight: Deque[List[Tuple[Dict[str, Any], Any]]] = deque()
+        batch: List[Tuple[Dict[str, Any], Any]] = []
+
+        async def settle(entries: List[Tuple[Dict[str, Any], Any]]) -> AsyncIterator[Dict[str, Any]]:
+            for result, delivery in entries:
+                if delivery is not None:
+                    try:
+                        await delivery
+                    except Exception as e:
+                        result = {**result, "status": "failed", "error": f"Failed to submit application: {e}"}
+                yield result
+
+        index = 0
+        async for record in iter_records(chunks):
+            delivery = None
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                if not isinstance(record, dict):
+                    raise ValueError("Record must be a JSON object")
+                application = LoanApplicationCreate(**record)
+            except Exception as e:
+                result = {"index": index, "status": "rejected", "error": _describe(e)}
+            else:
+                db_application = LoanApplicationInDB(**application.dict())
+                result = {
+                    "index": index,
+                    "status": "accepted",
+                    "id": str(db_application.id),
+                    "applicant_id": db_application.applicant_id
+                }
+                try:
+                    delivery = await kafka_client.send_message(
+                        topic=settings.KAFKA_APPLICATION_TOPIC,
+                        value=db_application.dict(),
+                        key=application.applicant_id.encode('utf-8'),
+                        wait=False
+                    )
+                except Exception as e:
+                    result = {**result, "status": "failed", "error": f"Failed to submit application: {e}"}
+
+            batch.append((result, delivery))
+            index += 1
+
+            if len(batch) >= batch_size:
+                in_flight.append(batch)
+                batch = []
+                if len(in_flight) >= settings.BULK_SUBMIT_PIPELINE_DEPTH:
+                    async for result in settle(in_flight.popleft()):
+                        yield result
+
+        if batch:
+            in_flight.append(batch)
+        while in_flight:
+            async for result in settle(in_flight.popleft()):
+                yield result
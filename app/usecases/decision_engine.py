@@ -0,0 +1,250 @@
+import json
+import operator
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.domain.models import ApplicationStatus
+
+# A rule table is a JSON document:
+#
+#   {
+#     "rules": [
+#       {"code": "AMOUNT_ABOVE_LIMIT", "action": "reject",
+#        "when": {"amount": {"gt": 50000}}},
+#       {"code": "SHORT_TERM_AMOUNT", "action": "reject",
+#        "when": {"term_months": {"lte": 6}, "amount": {"gt": 10000}}},
+#       {"code": "EXPOSURE_LIMIT", "action": "reject",
+#        "when": {"exposure": {"gt": 100000}}}
+#     ],
+#     "rates": [
+#       {"when": {"term_months": {"lte": 12}}, "rate": 0.09},
+#       {"when": {}, "rate": 0.12}
+#     ]
+#   }
+#
+# Conditions within a "when" are ANDed. A "reject" rule rejects the
+# application; a "flag" rule only adds its code to the reasons. The first
+# matching rate band sets the annual interest rate. Fields are "amount",
+# "term_months" and "exposure": the amount plus everything already approved
+# for the applicant, both before the batch (within
+# DECISION_EXPOSURE_WINDOW_DAYS) and earlier in it.
+
+DEFAULT_RULE_TABLE: Dict[str, Any] = {
+    "rules": [
+        {"code": "AMOUNT_NOT_POSITIVE", "action": "reject", "when": {"amount": {"lte": 0}}},
+        {"code": "AMOUNT_ABOVE_LIMIT", "action": "reject", "when": {"amount": {"gt": 50000}}},
+    ],
+    "rates": [],
+}
+
+FIELDS = ("amount", "term_months", "exposure")
+ACTIONS = ("reject", "flag")
+
+# Comparison name -> (vectorized, scalar)
+OPERATORS: Dict[str, Tuple[Callable, Callable]] = {
+    "lt": (np.less, operator.lt),
+    "lte": (np.less_equal, operator.le),
+    "gt": (np.greater, operator.gt),
+    "gte": (np.greater_equal, operator.ge),
+    "eq": (np.equal, operator.eq),
+    "ne": (np.not_equal, operator.ne),
+}
+
+Condition = Tuple[str, str, float]
+
+
+class Decision(NamedTuple):
+    status: ApplicationStatus
+    reason_codes: List[str]
+    interest_rate: Optional[float]
+
+
+class BatchDecisions(NamedTuple):
+    approved: np.ndarray  # bool, one per application
+    reason_codes: List[Tuple[str, ...]]
+    interest_rates: np.ndarray  # float, NaN where no rate band matched
+
+    def __len__(self) -> int:
+        return len(self.approved)
+
+    def __getitem__(self, index: int) -> Decision:
+        rate = self.interest_rates[index]
+        return Decision(
+            status=ApplicationStatus.APPROVED if self.approved[index] else ApplicationStatus.REJECTED,
+            reason_codes=list(self.reason_codes[index]),
+            interest_rate=None if np.isnan(rate) else float(rate),
+        )
+
+
+def _compile_when(when: Dict[str, Dict[str, float]], where: str) -> List[Condition]:
+    conditions: List[Condition] = []
+    for field, comparisons in when.items():
+        if field not in FIELDS:
+            raise ValueError(f"{where}: unknown field {field!r}; expected one of {', '.join(FIELDS)}")
+        for op, value in comparisons.items():
+            if op not in OPERATORS:
+                raise ValueError(f"{where}: unknown comparison {op!r}; expected one of {', '.join(OPERATORS)}")
+            conditions.append((field, op, float(value)))
+    return conditions
+
+
+def _match_batch(conditions: List[Condition], columns: Dict[str, np.ndarray], size: int) -> np.ndarray:
+    mask = np.ones(size, dtype=bool)
+    for field, op, value in conditions:
+        mask &= OPERATORS[op][0](columns[field], value)
+    return mask
+
+
+def _match_one(conditions: List[Condition], values: Dict[str, float]) -> bool:
+    return all(OPERATORS[op][1](values[field], value) for field, op, value in conditions)
+
+
+class DecisionEngine:
+    """Evaluates a rule table over single applications or columnar batches"""
+
+    def __init__(self, table: Dict[str, Any]):
+        self.rules: List[Tuple[str, str, List[Condition]]] = []
+        for index, rule in enumerate(table.get("rules", [])):
+            where = f"rule {index} ({rule.get('code', '?')})"
+            if rule.get("action") not in ACTIONS:
+                raise ValueError(f"{where}: action must be one of {', '.join(ACTIONS)}")
+            self.rules.append((rule["code"], rule["action"], _compile_when(rule.get("when", {}), where)))
+
+        self.rates: List[Tuple[float, List[Condition]]] = [
+            (float(band["rate"]), _compile_when(band.get("when", {}), f"rate band {index}"))
+            for index, band in enumerate(table.get("rates", []))
+        ]
+        self.codes = np.array([code for code, _, _ in self.rules], dtype=object)
+        self.rejects = np.array([action == "reject" for _, action, _ in self.rules], dtype=bool)
+        whens = [conditions for _, _, conditions in self.rules] + [conditions for _, conditions in self.rates]
+        self.uses_exposure = any(field == "exposure" for when in whens for field, _, _ in when)
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> "DecisionEngine":
+        """Build an engine from a JSON rule table file, or the default table"""
+        if path is None:
+            return cls(DEFAULT_RULE_TABLE)
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def evaluate_one(self, amount: float, term_months: int, exposure: float = 0.0) -> Decision:
+        """Evaluate a single application without going through NumPy.
+
+        ``exposure`` is the amount already approved for the applicant.
+        """
+        values = {"amount": amount, "term_months": term_months, "exposure": exposure + amount}
+        reason_codes: List[str] = []
+        rejected = False
+        for code, action, conditions in self.rules:
+            if _match_one(conditions, values):
+                reason_codes.append(code)
+                rejected = rejected or action == "reject"
+
+        interest_rate = None
+        for rate, conditions in self.rates:
+            if _match_one(conditions, values):
+                interest_rate = rate
+                break
+
+        return Decision(
+            status=ApplicationStatus.REJECTED if rejected else ApplicationStatus.APPROVED,
+            reason_codes=reason_codes,
+            interest_rate=interest_rate,
+        )
+
+    def evaluate_batch(
+        self,
+        amounts: Sequence[float],
+        term_months: Sequence[int],
+        applicant_ids: Optional[Sequence[str]] = None,
+        prior_exposure: Optional[Sequence[float]] = None,
+    ) -> BatchDecisions:
+        """Evaluate a batch of applications in one pass over columnar arrays.
+
+        ``prior_exposure`` is the amount already approved for each
+        application's applicant. With ``applicant_ids``, amounts approved
+        earlier in the batch add to the exposure of the applicant's later
+        applications. Only applicants with several applications in the batch
+        need that worked out one application at a time.
+        """
+        amount_column = np.asarray(amounts, dtype=np.float64)
+        size = len(amount_column)
+        exposure = amount_column.copy()
+        if prior_exposure is not None:
+            exposure += np.asarray(prior_exposure, dtype=np.float64)
+        columns = {
+            "amount": amount_column,
+            "term_months": np.asarray(term_months, dtype=np.float64),
+            "exposure": exposure,
+        }
+        if applicant_ids is not None and size and self.uses_exposure:
+            self._accumulate_exposure(columns, applicant_ids)
+
+        # matched[rule, application]
+        matched = np.zeros((len(self.rules), size), dtype=bool)
+        for index, (_, _, conditions) in enumerate(self.rules):
+            matched[index] = _match_batch(conditions, columns, size)
+        approved = ~(matched & self.rejects[:, None]).any(axis=0)
+
+        # Most applications match nothing, so they share one empty tuple
+        reason_codes: List[Tuple[str, ...]] = [()] * size
+        if len(self.rules):
+            applications, rules = np.nonzero(matched.T)
+            for application, code in zip(applications.tolist(), self.codes[rules].tolist()):
+                reason_codes[application] += (code,)
+
+        # Apply bands last to first so the first matching band wins
+        interest_rates = np.full(size, np.nan)
+        for rate, conditions in reversed(self.rates):
+            interest_rates[_match_batch(conditions, columns, size)] = rate
+
+        return BatchDecisions(approved=approved, reason_codes=reason_codes, interest_rates=interest_rates)
+
+    def _accumulate_exposure(self, columns: Dict[str, np.ndarray], applicant_ids: Sequence[str]) -> None:
+        """Add the amounts approved earlier in the batch to each exposure, in place.
+
+        Whether an application is approved depends on the applicant's
+        earlier ones, so applications are taken by their rank among the
+        applicant's: every applicant's first application at once, then
+        every second one, and so on.
+        """
+        # Factorize with a dict; sorting an object array is far slower
+        group_of: Dict[str, int] = {}
+        groups = np.fromiter(
+            (group_of.setdefault(applicant_id, len(group_of)) for applicant_id in applicant_ids),
+            dtype=np.int64,
+            count=len(applicant_ids)
+        )
+        order = np.argsort(groups, kind="stable")
+        sorted_groups = groups[order]
+        starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+        if len(starts) == len(groups):
+            return
+        ranks = np.empty_like(groups)
+        ranks[order] = np.arange(len(groups)) - np.repeat(starts, np.diff(np.r_[starts, len(groups)]))
+        by_rank = np.argsort(ranks, kind="stable")
+        rank_ends = np.cumsum(np.bincount(ranks))
+
+        amounts, exposure = columns["amount"], columns["exposure"]
+        approved_before = np.zeros(len(starts))
+        for rank, end in enumerate(rank_ends.tolist()):
+            rows = by_rank[rank_ends[rank - 1] if rank else 0:end]
+            exposure[rows] += approved_before[groups[rows]]
+            if end == len(groups):
+                break
+            rejected = self._rejected_batch({field: column[rows] for field, column in columns.items()}, len(rows))
+            approved_rows = rows[~rejected]
+            # An applicant has at most one application of each rank
+            approved_before[groups[approved_rows]] += amounts[approved_rows]
+
+    def _rejected_batch(self, columns: Dict[str, np.ndarray], size: int) -> np.ndarray:
+        rejected = np.zeros(size, dtype=bool)
+        for _, action, conditions in self.rules:
+            if action == "reject":
+                rejected |= _match_batch(conditions, columns, size)
+        return rejected
+
+
+decision_engine = DecisionEngine.load(settings.DECISION_RULES_PATH)
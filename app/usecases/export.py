@@ -0,0 +1,190 @@
+"""
+Streaming export of loan applications as NDJSON, CSV or Parquet.
+
+Rows come from the repository's server-side cursor one chunk at a time and
+each chunk is encoded in a worker thread, so an export of any size holds a
+single chunk in memory and leaves the event loop free for other requests.
+"""
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, List
+from uuid import UUID
+
+from app.domain.models import ApplicationExportFilter
+from app.infrastructure.database.repository import loan_application_repository
+from app.core.config import settings
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - optional columnar format
+    pyarrow = None
+
+COLUMNS = (
+    "id", "applicant_id", "amount", "term_months", "status",
+    "created_at", "processed_at", "reason_codes", "interest_rate",
+)
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+    PARQUET = "parquet"
+
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+    ExportFormat.PARQUET: "application/vnd.apache.parquet",
+}
+
+Row = Dict[str, Any]
+
+
+def _text(value: Any) -> Any:
+    """Plain JSON/CSV value for the column types of loan_applications"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+class _NdjsonEncoder:
+    def header(self) -> bytes:
+        return b""
+
+    def encode(self, rows: List[Row]) -> bytes:
+        lines = (json.dumps({column: _text(value) for column, value in row.items()}) for row in rows)
+        return "".join(line + "\n" for line in lines).encode("utf-8")
+
+    def finish(self) -> bytes:
+        return b""
+
+
+class _CsvEncoder:
+    def _write(self, rows: List[List[Any]]) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode("utf-8")
+
+    def header(self) -> bytes:
+        return self._write([list(COLUMNS)])
+
+    def encode(self, rows: List[Row]) -> bytes:
+        return self._write([
+            [
+                ";".join(row["reason_codes"] or []) if column == "reason_codes"
+                else _text(row[column])
+                for column in COLUMNS
+            ]
+            for row in rows
+        ])
+
+    def finish(self) -> bytes:
+        return b""
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back what was written since the last drain"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+class _ParquetEncoder:
+    """Writes each chunk as a row group; the footer is written by finish()"""
+
+    def __init__(self):
+        self.schema = pyarrow.schema([
+            ("id", pyarrow.string()),
+            ("applicant_id", pyarrow.string()),
+            ("amount", pyarrow.float64()),
+            ("term_months", pyarrow.int32()),
+            ("status", pyarrow.string()),
+            ("created_at", pyarrow.timestamp("us", tz="UTC")),
+            ("processed_at", pyarrow.timestamp("us", tz="UTC")),
+            ("reason_codes", pyarrow.list_(pyarrow.string())),
+            ("interest_rate", pyarrow.float64()),
+        ])
+        self.sink = _ChunkSink()
+        self.writer = pyarrow.parquet.ParquetWriter(self.sink, self.schema, compression="zstd")
+
+    def header(self) -> bytes:
+        return self.sink.drain()
+
+    def encode(self, rows: List[Row]) -> bytes:
+        columns = {column: [row[column] for row in rows] for column in COLUMNS}
+        columns["id"] = [str(value) for value in columns["id"]]
+        columns["status"] = [_text(value) for value in columns["status"]]
+        self.writer.write_table(pyarrow.Table.from_pydict(columns, schema=self.schema))
+        return self.sink.drain()
+
+    def finish(self) -> bytes:
+        self.writer.close()
+        return self.sink.drain()
+
+
+def _encoder(export_format: ExportFormat):
+    if export_format == ExportFormat.NDJSON:
+        return _NdjsonEncoder()
+    if export_format == ExportFormat.CSV:
+        return _CsvEncoder()
+    if pyarrow is None:
+        raise ValueError("Parquet exports need pyarrow, which is not installed")
+    return _ParquetEncoder()
+
+
+def export_filename(export_format: ExportFormat) -> str:
+    return f"loan_applications-{datetime.utcnow():%Y%m%dT%H%M%SZ}.{export_format.value}"
+
+
+class ExportService:
+    @staticmethod
+    def stream(
+        export_format: ExportFormat,
+        export_filter: ApplicationExportFilter,
+        chunk_size: int = 0
+    ) -> AsyncIterator[bytes]:
+        """Stream the matching applications in the given format.
+
+        Raises ValueError straight away, before any row is read, if the
+        format can't be produced.
+        """
+        encoder = _encoder(export_format)
+        return ExportService._encode(encoder, export_filter, chunk_size or settings.EXPORT_CHUNK_SIZE)
+
+    @staticmethod
+    async def _encode(encoder, export_filter: ApplicationExportFilter, chunk_size: int) -> AsyncIterator[bytes]:
+        header = encoder.header()
+        if header:
+            yield header
+        async for rows in loan_application_repository.stream_rows(export_filter, chunk_size):
+            data = await asyncio.to_thread(encoder.encode, rows)
+            if data:
+                yield data
+        tail = encoder.finish()
+        if tail:
+            yield tail
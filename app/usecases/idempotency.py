@@ -0,0 +1,97 @@
+"""
+Idempotency-Key support for submissions.
+
+The first request with a key claims it with an atomic SET NX, held for
+IDEMPOTENCY_LOCK_TTL_SECONDS while the request runs. On success the claim
+is replaced by the response, which is replayed to repeats of the key for
+IDEMPOTENCY_TTL_SECONDS. Keys are scoped to the applicant, and a repeat
+must carry the same body as the original.
+
+If Redis is unavailable, requests go through without the check rather
+than fail; the consumer still drops redelivered applications.
+"""
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+from app.infrastructure.cache.redis_client import redis_cache
+from app.core.config import settings
+from app.core.metrics import IDEMPOTENT_REQUESTS
+
+
+class IdempotencyKeyInUse(Exception):
+    """Another request with the same key is still in flight"""
+
+
+class IdempotencyKeyMismatch(ValueError):
+    """The key was already used with a different request body"""
+
+
+def _key(scope: str, idempotency_key: str) -> str:
+    return f"idempotency:{scope}:{idempotency_key}"
+
+
+def fingerprint(payload: Dict[str, Any]) -> str:
+    """Digest identifying a request body"""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+async def claim(scope: str, idempotency_key: str, body_fingerprint: str) -> Optional[Dict[str, Any]]:
+    """Claim a key for a new request.
+
+    Returns None if the caller should go ahead with the request, or the
+    stored response if a request with this key already completed.
+    """
+    cache_key = _key(scope, idempotency_key)
+    try:
+        for _ in range(2):
+            claimed = await redis_cache.set(
+                cache_key,
+                {"fingerprint": body_fingerprint},
+                expire=settings.IDEMPOTENCY_LOCK_TTL_SECONDS,
+                nx=True
+            )
+            if claimed:
+                IDEMPOTENT_REQUESTS.labels("new").inc()
+                return None
+            stored = await redis_cache.get(cache_key)
+            # Gone between the two calls: the claim expired, so try again
+            if stored is not None:
+                break
+    except Exception as e:
+        print(f"Error checking idempotency key, accepting the request: {e}")
+        return None
+
+    if stored is None or "response" not in stored:
+        IDEMPOTENT_REQUESTS.labels("in_progress").inc()
+        raise IdempotencyKeyInUse(idempotency_key)
+    if stored["fingerprint"] != body_fingerprint:
+        IDEMPOTENT_REQUESTS.labels("mismatch").inc()
+        raise IdempotencyKeyMismatch("Idempotency-Key was already used with a different request")
+    IDEMPOTENT_REQUESTS.labels("replayed").inc()
+    return stored["response"]
+
+
+async def complete(
+    scope: str,
+    idempotency_key: str,
+    body_fingerprint: str,
+    response: Dict[str, Any]
+) -> None:
+    """Store the response of a claimed request for replay"""
+    try:
+        await redis_cache.set(
+            _key(scope, idempotency_key),
+            {"fingerprint": body_fingerprint, "response": response},
+            expire=settings.IDEMPOTENCY_TTL_SECONDS
+        )
+    except Exception as e:
+        print(f"Error storing idempotent response: {e}")
+
+
+async def release(scope: str, idempotency_key: str) -> None:
+    """Drop the claim of a failed request, so it can be retried with the same key"""
+    try:
+        await redis_cache.delete(_key(scope, idempotency_key))
+    except Exception as e:
+        print(f"Error releasing idempotency key: {e}")
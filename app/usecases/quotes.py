@@ -0,0 +1,181 @@
+"""
+Loan quotes: level monthly payments and amortization schedules.
+
+Balances have a closed form, so any number of quotes, and any range of
+months of a schedule, are computed in one vectorized NumPy pass rather
+than month by month. Amounts are worked in cents. The monthly payment is
+rounded to the cent and the final payment absorbs what rounding leaves
+over, so every schedule pays off exactly the amount borrowed. Quotes are
+memoized on their rounded inputs.
+"""
+import math
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import LOCAL_CACHES
+from app.infrastructure.cache.local_cache import LocalCache, MISSING
+from app.usecases.decision_engine import decision_engine
+
+# Annual rates are quoted to this many decimal places
+RATE_DECIMALS = 6
+
+QuoteInput = Tuple[float, int, Optional[float]]
+
+
+def _balances(principal: np.ndarray, rate: np.ndarray, payment: np.ndarray, months: np.ndarray) -> np.ndarray:
+    """Balance left after ``months`` payments, for a monthly ``rate``; broadcasts"""
+    growth = (1.0 + rate) ** months
+    with np.errstate(divide="ignore", invalid="ignore"):
+        annuity = np.where(rate > 0, (growth - 1.0) / rate, months)
+    return principal * growth - payment * annuity
+
+
+def _level_payments(principal: np.ndarray, rate: np.ndarray, terms: np.ndarray) -> np.ndarray:
+    """Monthly payment in whole cents, such that no balance ever goes negative"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        exact = np.where(rate > 0, principal * rate / (1.0 - (1.0 + rate) ** -terms), principal / terms)
+    payment = np.rint(exact)
+    # Rounding up can repay a tiny loan early; round those down instead
+    overpaid = _balances(principal, rate, payment, terms - 1) < 0
+    return np.where(overpaid, np.floor(exact), payment)
+
+
+def compute_quotes(amounts: Sequence[float], terms: Sequence[int], annual_rates: Sequence[float]) -> Dict[str, np.ndarray]:
+    """Quote every (amount, term, rate) combination in one pass; amounts come back in cents"""
+    principal = np.rint(np.asarray(amounts, dtype=np.float64) * 100)
+    term = np.asarray(terms, dtype=np.float64)
+    rate = np.asarray(annual_rates, dtype=np.float64) / 12
+    payment = _level_payments(principal, rate, term)
+    before_last = np.rint(_balances(principal, rate, payment, term - 1))
+    final = before_last + np.rint(before_last * rate)
+    total = payment * (term - 1) + final
+    return {
+        "principal": principal,
+        "monthly_payment": payment,
+        "final_payment": final,
+        "total_payment": total,
+        "total_interest": total - principal,
+    }
+
+
+class QuoteEngine:
+    """Quotes loans, memoizing the results in a bounded LRU"""
+
+    def __init__(self, max_entries: int):
+        self.cache = LocalCache(max_entries=max_entries, max_bytes=max_entries, ttl=math.inf)
+
+    @staticmethod
+    def _validate(amount: float, term_months: int) -> None:
+        if amount <= 0:
+            raise ValueError("amount must be positive")
+        if not 1 <= term_months <= settings.QUOTE_MAX_TERM_MONTHS:
+            raise ValueError(f"term_months must be between 1 and {settings.QUOTE_MAX_TERM_MONTHS}")
+
+    @staticmethod
+    def resolve_rates(amounts: Sequence[float], terms: Sequence[int], rates: Sequence[Optional[float]]) -> List[float]:
+        """Fill in missing rates from the decision engine's rate bands, then the default"""
+        missing = [index for index, rate in enumerate(rates) if rate is None]
+        resolved = list(rates)
+        if missing:
+            banded = decision_engine.evaluate_batch(
+                [amounts[index] for index in missing],
+                [terms[index] for index in missing]
+            ).interest_rates
+            banded = np.where(np.isnan(banded), settings.QUOTE_DEFAULT_ANNUAL_RATE, banded)
+            for index, rate in zip(missing, banded.tolist()):
+                resolved[index] = rate
+        return [round(rate, RATE_DECIMALS) for rate in resolved]
+
+    def quote_many(self, requests: Sequence[QuoteInput]) -> List[Dict[str, Any]]:
+        """Quote several combinations; only those not cached are computed, together.
+
+        Raises ValueError for invalid inputs or too many of them.
+        """
+        if len(requests) > settings.QUOTE_MAX_BATCH:
+            raise ValueError(f"At most {settings.QUOTE_MAX_BATCH} quotes can be requested at once")
+        for amount, term_months, _ in requests:
+            self._validate(amount, term_months)
+        amounts = [round(amount, 2) for amount, _, _ in requests]
+        terms = [term_months for _, term_months, _ in requests]
+        rates = self.resolve_rates(amounts, terms, [rate for _, _, rate in requests])
+
+        quotes: List[Optional[Dict[str, Any]]] = [None] * len(requests)
+        keys = [f"{amount:.2f}:{term}:{rate}" for amount, term, rate in zip(amounts, terms, rates)]
+        misses: Dict[str, List[int]] = {}
+        for index, key in enumerate(keys):
+            cached = self.cache.get(key)
+            if cached is MISSING:
+                misses.setdefault(key, []).append(index)
+            else:
+                quotes[index] = cached
+        if not misses:
+            return quotes
+
+        first = [indexes[0] for indexes in misses.values()]
+        computed = compute_quotes(
+            [amounts[index] for index in first],
+            [terms[index] for index in first],
+            [rates[index] for index in first]
+        )
+        columns = {name: (values / 100).tolist() for name, values in computed.items() if name != "principal"}
+        for position, (key, indexes) in enumerate(misses.items()):
+            quote = {
+                "amount": amounts[indexes[0]],
+                "term_months": terms[indexes[0]],
+                "annual_rate": rates[indexes[0]],
+                **{name: values[position] for name, values in columns.items()},
+            }
+            self.cache.set(key, quote, size=1)
+            for index in indexes:
+                quotes[index] = quote
+        return quotes
+
+    def schedule(
+        self,
+        amount: float,
+        term_months: int,
+        annual_rate: Optional[float] = None,
+        chunk_months: Optional[int] = None
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """The amortization schedule of one loan, ``chunk_months`` rows at a time.
+
+        Each chunk is computed in one vectorized pass, so long schedules are
+        never held whole. Rows add up to the totals of the loan's quote.
+        Raises ValueError for invalid inputs before the first chunk.
+        """
+        self._validate(amount, term_months)
+        amount = round(amount, 2)
+        rate = self.resolve_rates([amount], [term_months], [annual_rate])[0] / 12
+        chunk_months = chunk_months or settings.QUOTE_SCHEDULE_CHUNK_MONTHS
+        principal = np.float64(round(amount * 100))
+        payment = _level_payments(np.array([principal]), np.array([rate]), np.array([float(term_months)]))[0]
+
+        def chunks() -> Iterator[List[Dict[str, Any]]]:
+            for start in range(1, term_months + 1, chunk_months):
+                months = np.arange(start, min(start + chunk_months, term_months + 1))
+                # Balances before and after each month of the chunk
+                balances = np.rint(_balances(principal, rate, payment, np.arange(start - 1, months[-1] + 1)))
+                if months[-1] == term_months:
+                    balances[-1] = 0.0
+                repaid = balances[:-1] - balances[1:]
+                payments = np.full(len(months), payment)
+                if months[-1] == term_months:
+                    payments[-1] = balances[-2] + np.rint(balances[-2] * rate)
+                yield [
+                    {"month": month, "payment": paid, "principal": principal_part, "interest": interest, "balance": left}
+                    for month, paid, principal_part, interest, left in zip(
+                        months.tolist(),
+                        (payments / 100).tolist(),
+                        (repaid / 100).tolist(),
+                        ((payments - repaid) / 100).tolist(),
+                        (balances[1:] / 100).tolist()
+                    )
+                ]
+
+        return chunks()
+
+
+quote_engine = QuoteEngine(settings.QUOTE_CACHE_MAX_ENTRIES)
+LOCAL_CACHES.track("quotes", quote_engine.cache)
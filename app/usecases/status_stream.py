@@ -0,0 +1,68 @@
+"""
+Server-sent event streams of application decisions.
+
+A stream subscribes to the decisions of one applicant or one application
+before loading the current state, so a decision stored in between is not
+missed. Every event carries the application id as its SSE id; a client
+reconnecting with Last-Event-ID is not sent again the state it already has.
+"""
+import asyncio
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+from uuid import UUID
+
+from app.infrastructure.cache.status_events import RESYNC, applicant_channel, application_channel, status_events
+from app.usecases.application_handlers import LoanApplicationService
+from app.core.config import settings
+from app.core.metrics import STATUS_STREAM_CONNECTIONS
+
+
+def _status_event(application: Dict[str, Any]) -> str:
+    return f"id: {application['id']}\nevent: status\ndata: {json.dumps(application)}\n\n"
+
+
+async def _events(
+    channel: str,
+    load_current: Callable[[], Awaitable[Optional[Dict[str, Any]]]],
+    last_event_id: Optional[str]
+) -> AsyncIterator[str]:
+    STATUS_STREAM_CONNECTIONS.inc()
+    try:
+        async with status_events.subscribe(channel) as queue:
+            yield f"retry: {settings.STATUS_STREAM_RETRY_MS}\n\n"
+            last_sent = last_event_id
+            event: Any = RESYNC
+            while True:
+                # Events may have been missed, so start over from the current state
+                if event is RESYNC:
+                    event = await load_current()
+                if event is not None and event["id"] != last_sent:
+                    last_sent = event["id"]
+                    yield _status_event(event)
+                try:
+                    event = await asyncio.wait_for(queue.get(), settings.STATUS_STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    event = None
+                    yield ": ping\n\n"
+    finally:
+        STATUS_STREAM_CONNECTIONS.dec()
+
+
+class StatusStreamService:
+    @staticmethod
+    def applicant_events(applicant_id: str, last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream the status of an applicant's most recent application, then every new decision"""
+        return _events(
+            applicant_channel(applicant_id),
+            lambda: LoanApplicationService.get_application_status(applicant_id),
+            last_event_id
+        )
+
+    @staticmethod
+    def application_events(application_id: UUID, last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream an application's status, once it is decided"""
+        return _events(
+            application_channel(application_id),
+            lambda: LoanApplicationService.get_application(application_id),
+            last_event_id
+        )
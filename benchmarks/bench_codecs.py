@@ -0,0 +1,46 @@
+"""
+Encode/decode cost and payload size of each codec for LoanApplicationInDB.
+
+Usage:
+    python -m benchmarks.bench_codecs --iterations 100000
+"""
+import argparse
+import timeit
+from datetime import datetime
+
+from app.domain.models import ApplicationStatus, LoanApplicationInDB
+from app.infrastructure.serialization.codecs import CODECS, get_codec
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+
+    value = LoanApplicationInDB(
+        applicant_id="user123",
+        amount=5000,
+        term_months=12,
+        status=ApplicationStatus.APPROVED,
+        processed_at=datetime.utcnow()
+    ).dict()
+
+    print(f"{'codec':<10}{'bytes':>8}{'encode us':>12}{'decode us':>12}")
+    for name in CODECS:
+        try:
+            codec = get_codec(name)
+        except RuntimeError as e:
+            print(f"{name:<10}  skipped: {e}")
+            continue
+        payload = codec.encode(value)
+        encode = timeit.timeit(lambda: codec.encode(value), number=args.iterations)
+        decode = timeit.timeit(lambda: codec.decode(payload), number=args.iterations)
+        print(
+            f"{name:<10}{len(payload):>8}"
+            f"{encode / args.iterations * 1e6:>12.2f}"
+            f"{decode / args.iterations * 1e6:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Decision engine throughput: vectorized batches vs. the scalar path.
+
+Evaluates batches of 1 to 1M random applications against a rule table
+with amount bands, an exposure limit and rate bands.
+
+Usage:
+    python -m benchmarks.bench_decision_engine --max-size 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.usecases.decision_engine import DecisionEngine
+
+RULE_TABLE = {
+    "rules": [
+        {"code": "AMOUNT_NOT_POSITIVE", "action": "reject", "when": {"amount": {"lte": 0}}},
+        {"code": "AMOUNT_ABOVE_LIMIT", "action": "reject", "when": {"amount": {"gt": 50000}}},
+        {"code": "SHORT_TERM_AMOUNT", "action": "reject",
+         "when": {"term_months": {"lte": 6}, "amount": {"gt": 10000}}},
+        {"code": "MEDIUM_TERM_AMOUNT", "action": "reject",
+         "when": {"term_months": {"gt": 6, "lte": 24}, "amount": {"gt": 30000}}},
+        {"code": "EXPOSURE_LIMIT", "action": "reject", "when": {"exposure": {"gt": 100000}}},
+        {"code": "LARGE_AMOUNT", "action": "flag", "when": {"amount": {"gte": 40000}}},
+    ],
+    "rates": [
+        {"when": {"term_months": {"lte": 12}}, "rate": 0.09},
+        {"when": {"term_months": {"lte": 36}}, "rate": 0.11},
+        {"when": {}, "rate": 0.13},
+    ],
+}
+
+# The scalar loop gets slow quickly; stop timing it past this size
+SCALAR_MAX_SIZE = 100000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-size", type=int, default=1000000)
+    args = parser.parse_args()
+
+    engine = DecisionEngine(RULE_TABLE)
+    rng = np.random.default_rng(0)
+
+    print(f"{'records':>10}{'batch ms':>12}{'batch rec/s':>14}{'scalar ms':>12}{'scalar rec/s':>14}")
+    size = 1
+    while size <= args.max_size:
+        amounts = rng.uniform(1, 60000, size=size)
+        terms = rng.integers(1, 61, size=size)
+        applicant_ids = [f"user{n}" for n in rng.integers(0, max(1, size // 4), size=size)]
+
+        started = time.perf_counter()
+        engine.evaluate_batch(amounts, terms, applicant_ids)
+        batch = time.perf_counter() - started
+
+        row = f"{size:>10}{batch * 1000:>12.2f}{size / batch:>14.0f}"
+        if size <= SCALAR_MAX_SIZE:
+            amount_list, term_list = amounts.tolist(), terms.tolist()
+            started = time.perf_counter()
+            for amount, term in zip(amount_list, term_list):
+                engine.evaluate_one(amount, term)
+            scalar = time.perf_counter() - started
+            row += f"{scalar * 1000:>12.2f}{size / scalar:>14.0f}"
+        print(row)
+        size *= 10
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Event-loop latency during concurrent logins: inline bcrypt vs. the thread pool.
+
+A probe task asks to wake up every ``--probe-ms`` while ``--logins`` password
+checks run ``--concurrency`` at a time; how late it wakes up is the delay
+every other request on the worker would see. Also reports JWT verification
+cost with and without the claims cache.
+
+Usage:
+    python -m benchmarks.bench_password_hashing --logins 32 --concurrency 8 --rounds 10
+"""
+import argparse
+import asyncio
+import time
+import timeit
+from datetime import timedelta
+from typing import List
+
+from passlib.context import CryptContext
+
+from app.core import security
+from benchmarks.stats import percentile
+
+
+async def probe(interval: float, lags: List[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(time.perf_counter() - expected, 0.0))
+
+
+async def run(offload: bool, logins: int, concurrency: int, interval: float, hashed: str):
+    lags: List[float] = []
+    stop = asyncio.Event()
+    prober = asyncio.create_task(probe(interval, lags, stop))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login() -> None:
+        async with semaphore:
+            if offload:
+                assert await security.verify_password_async("correct horse", hashed)
+            else:
+                assert security.verify_password("correct horse", hashed)
+            # Let other tasks in between logins, as a real handler would
+            await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await prober
+    return lags, elapsed
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt cost factor")
+    parser.add_argument("--probe-ms", type=float, default=1.0)
+    parser.add_argument("--tokens", type=int, default=20000, help="JWT verifications to time")
+    args = parser.parse_args()
+
+    security.pwd_context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=args.rounds)
+    hashed = security.get_password_hash("correct horse")
+
+    print(f"{'bcrypt':<14}{'logins/s':>10}{'lag p50 ms':>12}{'lag p99 ms':>12}{'lag max ms':>12}")
+    for label, offload in (("inline", False), ("thread pool", True)):
+        lags, elapsed = await run(offload, args.logins, args.concurrency, args.probe_ms / 1000, hashed)
+        print(
+            f"{label:<14}{args.logins / elapsed:>10.1f}"
+            f"{percentile(lags, 50) * 1000:>12.2f}"
+            f"{percentile(lags, 99) * 1000:>12.2f}"
+            f"{max(lags) * 1000:>12.2f}"
+        )
+
+    token = security.create_access_token({"sub": "bench"}, expires_delta=timedelta(minutes=5))
+    cache = security._token_cache
+    security._token_cache = None
+    uncached = timeit.timeit(lambda: security.decode_access_token(token), number=args.tokens)
+    security._token_cache = cache
+    if cache is not None:
+        cached = timeit.timeit(lambda: security.decode_access_token(token), number=args.tokens)
+        print(f"\nJWT verify: {uncached / args.tokens * 1e6:.1f} us uncached, {cached / args.tokens * 1e6:.1f} us cached")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+"""
+Quote engine throughput: vectorized quotes vs. a per-month Python loop.
+
+Quotes batches of 1 to 10k random (amount, term, rate) combinations in
+one raw vectorized pass, through the engine uncached, and again from its
+cache, and compares them with the textbook loop that walks every month of
+every schedule. Then builds one long schedule both ways.
+
+Usage:
+    python -m benchmarks.bench_quotes --max-size 10000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.usecases.quotes import QuoteEngine, compute_quotes
+
+# The loop gets slow quickly; stop timing it past this size
+LOOP_MAX_SIZE = 10000
+SCHEDULE_TERM_MONTHS = 480
+
+
+def naive_schedule(amount: float, term_months: int, annual_rate: float) -> list:
+    """Month by month, rounding each month's interest to the cent"""
+    rate = annual_rate / 12
+    if rate:
+        payment = round(amount * rate / (1 - (1 + rate) ** -term_months), 2)
+    else:
+        payment = round(amount / term_months, 2)
+    balance = amount
+    rows = []
+    for month in range(1, term_months + 1):
+        interest = round(balance * rate, 2)
+        paid = balance + interest if month == term_months else payment
+        principal = paid - interest
+        balance = round(balance - principal, 2)
+        rows.append((month, paid, principal, interest, balance))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-size", type=int, default=10000, help="at most QUOTE_MAX_BATCH")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'quotes':>10}{'batch ms':>12}{'batch q/s':>14}{'engine q/s':>14}{'cached q/s':>14}{'loop ms':>12}{'loop q/s':>14}")
+    size = 1
+    while size <= args.max_size:
+        amounts = np.round(rng.uniform(1000, 500000, size=size), 2).tolist()
+        terms = rng.integers(12, 361, size=size).tolist()
+        rates = np.round(rng.uniform(0.02, 0.2, size=size), 4).tolist()
+        requests = list(zip(amounts, terms, rates))
+        engine = QuoteEngine(max_entries=size)
+
+        started = time.perf_counter()
+        compute_quotes(amounts, terms, rates)
+        batch = time.perf_counter() - started
+
+        started = time.perf_counter()
+        engine.quote_many(requests)
+        uncached = time.perf_counter() - started
+
+        started = time.perf_counter()
+        engine.quote_many(requests)
+        cached = time.perf_counter() - started
+
+        row = f"{size:>10}{batch * 1000:>12.2f}{size / batch:>14.0f}{size / uncached:>14.0f}{size / cached:>14.0f}"
+        if size <= LOOP_MAX_SIZE:
+            started = time.perf_counter()
+            for amount, term, rate in requests:
+                naive_schedule(amount, term, rate)
+            loop = time.perf_counter() - started
+            row += f"{loop * 1000:>12.2f}{size / loop:>14.0f}"
+        print(row)
+        size *= 10
+
+    engine = QuoteEngine(max_entries=1)
+    started = time.perf_counter()
+    rows = sum(len(chunk) for chunk in engine.schedule(350000, SCHEDULE_TERM_MONTHS, 0.065))
+    vectorized = time.perf_counter() - started
+    started = time.perf_counter()
+    naive_schedule(350000, SCHEDULE_TERM_MONTHS, 0.065)
+    loop = time.perf_counter() - started
+    print(f"\n{rows}-month schedule: vectorized {vectorized * 1000:.3f} ms, loop {loop * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
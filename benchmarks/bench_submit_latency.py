@@ -0,0 +1,68 @@
+"""
+POST /api/v1/applications/ latency: wait-for-ack vs. buffered producer mode.
+
+Drives the FastAPI app in-process over ASGI with an in-memory broker that
+takes ``--broker-rtt-ms`` to acknowledge each record, and an in-memory Redis
+for admission control, and reports p50/p99 request latency for both
+KAFKA_PRODUCER_WAIT_FOR_DELIVERY settings.
+
+Usage:
+    python -m benchmarks.bench_submit_latency --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+from typing import List
+
+import httpx
+
+from main import app
+from app.core.config import settings
+from benchmarks.fakes import FakeKafkaClient, FakeRedisCache, install
+from benchmarks.stats import percentile
+
+
+async def run(wait: bool, requests: int, concurrency: int) -> List[float]:
+    settings.KAFKA_PRODUCER_WAIT_FOR_DELIVERY = wait
+    latencies: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def submit(n: int) -> None:
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(
+                    "/api/v1/applications/",
+                    # One applicant per request, so none is rate limited
+                    json={"applicant_id": f"user{n}-{wait}", "amount": 5000, "term_months": 12}
+                )
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 202, response.text
+
+        await asyncio.gather(*(submit(n) for n in range(requests)))
+
+    return latencies
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--broker-rtt-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    install(kafka=FakeKafkaClient(latency=args.broker_rtt_ms / 1000), redis=FakeRedisCache())
+
+    print(f"{'mode':<22}{'p50 ms':>10}{'p99 ms':>10}")
+    for label, wait in (("send_and_wait", True), ("buffered (no wait)", False)):
+        latencies = await run(wait, args.requests, args.concurrency)
+        print(
+            f"{label:<22}"
+            f"{percentile(latencies, 50) * 1000:>10.2f}"
+            f"{percentile(latencies, 99) * 1000:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,66 @@
+"""
+Compare two load test result files.
+
+Usage:
+    python -m benchmarks.compare base.json new.json
+"""
+import argparse
+import json
+from typing import Any, Dict, Optional
+
+# (section, metric, True if higher is better)
+METRICS = (
+    ("post", "p50_ms", False),
+    ("post", "p99_ms", False),
+    ("post", "requests_per_second", True),
+    ("get", "p50_ms", False),
+    ("get", "p99_ms", False),
+    ("get", "requests_per_second", True),
+    ("consumer", "messages_per_second", True),
+    ("submit_to_decision", "p50_ms", False),
+    ("submit_to_decision", "p99_ms", False),
+)
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def change(base: Optional[float], new: Optional[float]) -> str:
+    if not base or new is None:
+        return "n/a"
+    return f"{(new - base) / base * 100:+.1f}%"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("new")
+    args = parser.parse_args()
+
+    base, new = load(args.base), load(args.new)
+    for label, results in (("base", base), ("new", new)):
+        git = results.get("git", {})
+        print(f"{label:<5}{git.get('commit') or '?'}{' (dirty)' if git.get('dirty') else ''}  {results['timestamp']}")
+    if base.get("params") != new.get("params"):
+        print("warning: the runs used different parameters")
+
+    print(f"\n{'metric':<40}{'base':>12}{'new':>12}{'change':>10}")
+    for section, metric, higher_is_better in METRICS:
+        before = base["results"].get(section, {}).get(metric)
+        after = new["results"].get(section, {}).get(metric)
+        marker = ""
+        if before and after is not None:
+            better = after > before if higher_is_better else after < before
+            marker = "  better" if better else "  worse" if after != before else ""
+        print(
+            f"{section + '.' + metric:<40}"
+            f"{before if before is not None else float('nan'):>12.2f}"
+            f"{after if after is not None else float('nan'):>12.2f}"
+            f"{change(before, after):>10}{marker}"
+        )
+
+
+if __name__ == "__main__":
+    main()
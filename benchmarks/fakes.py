@@ -0,0 +1,571 @@
+"""
+In-memory stand-ins for Kafka, Redis and Postgres.
+
+They implement the public interface of ``KafkaClient``, ``RedisCache``,
+``LoanApplicationRepository`` and ``DecisionRollupRepository`` (the only
+paths the service uses to reach the database), with optional simulated round-trip latency, so the service can
+be driven end to end in one process with no external services.
+``install()`` swaps them in for the real module-level singletons.
+"""
+import asyncio
+import sys
+import time
+import uuid
+import zlib
+from collections import defaultdict
+from datetime import datetime, timezone
+from itertools import count
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from app.core.config import settings
+from app.domain.models import ApplicationExportFilter, ApplicationStatus, LoanApplicationInDB
+from app.infrastructure.cache.local_cache import LocalCache, MISSING
+from app.infrastructure.serialization.codecs import get_codec
+
+
+async def _round_trip(latency: float) -> None:
+    if latency:
+        await asyncio.sleep(latency)
+
+
+class FakeKafkaClient:
+    """Partitioned in-memory topics with consumer groups.
+
+    Keyed records go to ``crc32(key) % partitions``, unkeyed records are
+    spread round-robin. Members of a consumer group split the partitions of
+    a topic between them and resume from the group's committed offsets.
+    """
+
+    def __init__(self, partitions: int = 4, latency: float = 0.0):
+        self.partitions = partitions
+        self.latency = latency
+        self.codec = get_codec(settings.KAFKA_CODEC)
+        self.producer = self  # Code checks this to see whether the client was started
+        self.consumer = None
+        self.pending_deliveries = 0
+        self.delivery_failures = 0
+        self.delivery_error_callbacks: List[Callable[[str, BaseException], None]] = []
+        # topic -> partition -> encoded values
+        self.topics: Dict[str, List[List[bytes]]] = {}
+        # (group, topic) -> partition -> committed offset
+        self.committed: Dict[Tuple[str, str], List[int]] = {}
+        # (group, topic) -> member ids, in join order
+        self.members: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        self._member_ids = count()
+        self._round_robin = count()
+        self._new_data = asyncio.Event()
+
+    def _partitions(self, topic: str) -> List[List[bytes]]:
+        if topic not in self.topics:
+            self.topics[topic] = [[] for _ in range(self.partitions)]
+        return self.topics[topic]
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def send_message(
+        self,
+        topic: str,
+        value: Dict[str, Any],
+        key: Optional[bytes] = None,
+        wait: Optional[bool] = None,
+        headers: Optional[List[Tuple[str, bytes]]] = None
+    ) -> Optional[asyncio.Future]:
+        if wait is None:
+            wait = settings.KAFKA_PRODUCER_WAIT_FOR_DELIVERY
+        encoded = self.codec.encode(value)
+        partition = (zlib.crc32(key) if key is not None else next(self._round_robin)) % self.partitions
+
+        def append() -> None:
+            self._partitions(topic)[partition].append(encoded)
+            self._new_data.set()
+
+        if wait:
+            await _round_trip(self.latency)
+            append()
+            return None
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending_deliveries += 1
+
+        def deliver() -> None:
+            append()
+            self.pending_deliveries -= 1
+            future.set_result(None)
+
+        loop.call_later(self.latency, deliver) if self.latency else deliver()
+        return future
+
+    def lag(self, topic: str, group_id: str) -> int:
+        """Records in ``topic`` not yet committed by ``group_id``"""
+        committed = self.committed.get((group_id, topic), [0] * self.partitions)
+        return sum(len(records) - offset for records, offset in zip(self._partitions(topic), committed))
+
+    def _assignment(self, group: Tuple[str, str], member: int) -> List[int]:
+        members = self.members[group]
+        return list(range(self.partitions))[members.index(member)::len(members)]
+
+    async def _wait_for_data(self) -> None:
+        self._new_data.clear()
+        try:
+            await asyncio.wait_for(self._new_data.wait(), settings.KAFKA_CONSUMER_POLL_TIMEOUT_MS / 1000)
+        except asyncio.TimeoutError:
+            pass
+
+    async def consume_batches(
+        self,
+        topic: str,
+        group_id: str,
+        process_batch: Callable[[List[Dict[str, Any]]], Awaitable[List[Optional[Exception]]]],
+        commit_gate: Optional[Callable[[bool], Awaitable[bool]]] = None,
+        stop: Optional[asyncio.Event] = None
+    ) -> None:
+        group = (group_id, topic)
+        partitions = self._partitions(topic)
+        committed = self.committed.setdefault(group, [0] * self.partitions)
+        member = next(self._member_ids)
+        self.members[group].append(member)
+        positions = list(committed)
+        processed_up_to: Dict[int, int] = {}
+
+        async def commit(force: bool = False) -> None:
+            if commit_gate is not None and not await commit_gate(force):
+                return
+            for partition, offset in processed_up_to.items():
+                committed[partition] = max(committed[partition], offset)
+            processed_up_to.clear()
+
+        try:
+            while stop is None or not stop.is_set():
+                batch: List[Tuple[int, bytes]] = []
+                for partition in self._assignment(group, member):
+                    room = settings.KAFKA_CONSUMER_BATCH_SIZE - len(batch)
+                    records = partitions[partition][positions[partition]:positions[partition] + room]
+                    batch.extend((partition, record) for record in records)
+                    positions[partition] += len(records)
+                    processed_up_to[partition] = positions[partition]
+                if not batch:
+                    await commit()
+                    await self._wait_for_data()
+                    continue
+
+                await _round_trip(self.latency)
+                await process_batch([self.codec.decode(record) for _, record in batch])
+                await commit()
+        finally:
+            self.members[group].remove(member)
+            if processed_up_to:
+                await commit(force=True)
+
+    async def consume_messages(
+        self,
+        topic: str,
+        group_id: str,
+        process_message: Callable[[Dict[str, Any]], Awaitable[None]],
+        commit_gate: Optional[Callable[[bool], Awaitable[bool]]] = None,
+        stop: Optional[asyncio.Event] = None
+    ) -> None:
+        async def process_batch(values: List[Dict[str, Any]]) -> List[Optional[Exception]]:
+            for value in values:
+                try:
+                    await process_message(value)
+                except Exception as e:
+                    print(f"Error processing message: {e}")
+            return [None] * len(values)
+
+        await self.consume_batches(topic, group_id, process_batch, commit_gate, stop)
+
+
+class FakeRedisCache:
+    """Dict-backed ``RedisCache`` with the same codec and L1 behaviour"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.codec = get_codec(settings.CACHE_CODEC)
+        self.local: Optional[LocalCache] = None
+        if settings.CACHE_L1_ENABLED:
+            self.local = LocalCache(
+                max_entries=settings.CACHE_L1_MAX_ENTRIES,
+                max_bytes=settings.CACHE_L1_MAX_BYTES,
+                ttl=settings.CACHE_L1_TTL_SECONDS
+            )
+        self.instance_id = uuid.uuid4().hex
+        # key -> (encoded value, expires at)
+        self.store: Dict[str, Tuple[bytes, float]] = {}
+        # key -> (member -> score, expires at)
+        self.indexes: Dict[str, Tuple[Dict[str, float], float]] = {}
+        # key -> (tokens, updated at)
+        self.buckets: Dict[str, Tuple[float, float]] = {}
+        # key -> (field -> count, expires at)
+        self.hashes: Dict[str, Tuple[Dict[str, float], float]] = {}
+        # key -> (members, expires at); an exact stand-in for a HyperLogLog
+        self.hlls: Dict[str, Tuple[Set[str], float]] = {}
+
+    def _read(self, key: str) -> Optional[bytes]:
+        entry = self.store.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del self.store[key]
+            return None
+        return entry[0]
+
+    def _write(self, key: str, value: Any, expire: Optional[int], nx: bool, encoded: Optional[bytes] = None) -> bool:
+        if nx and self._read(key) is not None:
+            if self.local is not None:
+                self.local.delete(key)
+            return False
+        expire = settings.REDIS_TTL if expire is None else expire
+        if encoded is None:
+            encoded = self.codec.encode(value)
+        self.store[key] = (encoded, time.monotonic() + expire)
+        if self.local is not None:
+            self.local.set(key, value, size=len(encoded), ttl=expire)
+        return True
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if self.local is not None:
+            value = self.local.get(key)
+            if value is not MISSING:
+                return value
+        await _round_trip(self.latency)
+        encoded = self._read(key)
+        if encoded is None:
+            return None
+        decoded = self.codec.decode(encoded)
+        if self.local is not None:
+            self.local.set(key, decoded, size=len(encoded))
+        return decoded
+
+    async def set(self, key: str, value: Dict[str, Any], expire: Optional[int] = None, nx: bool = False) -> bool:
+        await _round_trip(self.latency)
+        return self._write(key, value, expire, nx)
+
+    async def get_bytes(self, key: str) -> Optional[bytes]:
+        if self.local is not None:
+            value = self.local.get(key)
+            if value is not MISSING:
+                return value
+        await _round_trip(self.latency)
+        encoded = self._read(key)
+        if encoded is not None and self.local is not None:
+            self.local.set(key, encoded, size=len(encoded))
+        return encoded
+
+    async def set_bytes(self, key: str, value: bytes, expire: Optional[int] = None, nx: bool = False) -> bool:
+        await _round_trip(self.latency)
+        return self._write(key, value, expire, nx, encoded=value)
+
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[Dict[str, Any]]]:
+        values: List[Optional[Dict[str, Any]]] = []
+        fetched = False
+        for key in keys:
+            value = self.local.get(key) if self.local is not None else MISSING
+            if value is MISSING:
+                if not fetched:
+                    await _round_trip(self.latency)
+                    fetched = True
+                encoded = self._read(key)
+                value = self.codec.decode(encoded) if encoded is not None else None
+                if value is not None and self.local is not None:
+                    self.local.set(key, value, size=len(encoded))
+            values.append(value)
+        return values
+
+    async def set_many(
+        self,
+        items: Dict[str, Dict[str, Any]],
+        expire: Optional[int] = None,
+        nx: bool = False
+    ) -> List[bool]:
+        if not items:
+            return []
+        await _round_trip(self.latency)
+        return [self._write(key, value, expire, nx) for key, value in items.items()]
+
+    async def set_many_if_newer(
+        self,
+        entries: Sequence[Tuple[str, float, Dict[str, Any]]],
+        expire: Optional[int] = None
+    ) -> List[bool]:
+        if not entries:
+            return []
+        await _round_trip(self.latency)
+        results = []
+        for version_key, version, items in entries:
+            current = self._read(version_key)
+            if current is not None and float(current) > version:
+                for key in items:
+                    if self.local is not None:
+                        self.local.delete(key)
+                results.append(False)
+                continue
+            ttl = settings.REDIS_TTL if expire is None else expire
+            self.store[version_key] = (repr(version).encode("ascii"), time.monotonic() + ttl)
+            for key, value in items.items():
+                self._write(key, value, expire, False, encoded=value if isinstance(value, bytes) else None)
+            results.append(True)
+        return results
+
+    async def delete(self, key: str) -> None:
+        await _round_trip(self.latency)
+        self.store.pop(key, None)
+        if self.local is not None:
+            self.local.delete(key)
+
+    async def index_add(
+        self,
+        key: str,
+        member: str,
+        score: float,
+        max_entries: int,
+        expire: Optional[int] = None
+    ) -> None:
+        await _round_trip(self.latency)
+        entry = self.indexes.get(key)
+        members = entry[0] if entry is not None and entry[1] > time.monotonic() else {}
+        members[member] = score
+        if len(members) > max_entries:
+            kept = sorted(members.items(), key=lambda item: (item[1], item[0]))[-max_entries:]
+            members = dict(kept)
+        expire = settings.REDIS_TTL if expire is None else expire
+        self.indexes[key] = (members, time.monotonic() + expire)
+
+    async def index_range(self, key: str, max_score: Optional[float], count: int) -> List[Tuple[str, float]]:
+        await _round_trip(self.latency)
+        entry = self.indexes.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            return []
+        entries = sorted(
+            (item for item in entry[0].items() if max_score is None or item[1] <= max_score),
+            key=lambda item: (item[1], item[0]),
+            reverse=True
+        )
+        return entries[:count]
+
+    async def take_token(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        await _round_trip(self.latency)
+        now = time.monotonic()
+        tokens, updated_at = self.buckets.get(key, (float(burst), now))
+        tokens = min(burst, tokens + (now - updated_at) * rate)
+        if tokens >= 1:
+            self.buckets[key] = (tokens - 1, now)
+            return True, 0.0
+        self.buckets[key] = (tokens, now)
+        return False, (1 - tokens) / rate
+
+    async def acquire_lock(self, key: str, ttl_ms: int) -> Optional[str]:
+        await _round_trip(self.latency)
+        if self._read(key) is not None:
+            return None
+        token = uuid.uuid4().hex
+        self.store[key] = (token.encode(), time.monotonic() + ttl_ms / 1000)
+        return token
+
+    async def release_lock(self, key: str, token: str) -> None:
+        await _round_trip(self.latency)
+        if self._read(key) == token.encode():
+            del self.store[key]
+
+    async def publish(self, channels: Sequence[str], value: Dict[str, Any]) -> None:
+        await _round_trip(self.latency)
+
+    async def add_rollups(
+        self,
+        counters: Dict[str, Dict[str, float]],
+        uniques: Dict[str, Sequence[str]],
+        expire: int
+    ) -> None:
+        await _round_trip(self.latency)
+        expires_at = time.monotonic() + expire
+        for key, increments in counters.items():
+            fields = self._live(self.hashes, key, dict)
+            for field, amount in increments.items():
+                fields[field] = fields.get(field, 0) + amount
+            self.hashes[key] = (fields, expires_at)
+        for key, members in uniques.items():
+            self.hlls[key] = (self._live(self.hlls, key, set) | set(members), expires_at)
+
+    async def get_rollups(
+        self,
+        keys: Sequence[Tuple[str, str]]
+    ) -> List[Tuple[Dict[str, float], Optional[bytes], int]]:
+        await _round_trip(self.latency)
+        rollups = []
+        for counters_key, uniques_key in keys:
+            members = self._live(self.hlls, uniques_key, set)
+            raw = "\n".join(sorted(members)).encode() if members else None
+            rollups.append((dict(self._live(self.hashes, counters_key, dict)), raw, len(members)))
+        return rollups
+
+    async def count_unique(self, keys: Sequence[str], raw: Sequence[bytes] = ()) -> int:
+        await _round_trip(self.latency)
+        members: Set[str] = set()
+        for key in keys:
+            members |= self._live(self.hlls, key, set)
+        for value in raw:
+            members |= set(value.decode().split("\n"))
+        return len(members)
+
+    def _live(self, entries: Dict[str, Tuple[Any, float]], key: str, empty: Callable[[], Any]) -> Any:
+        entry = entries.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            return empty()
+        return entry[0]
+
+    async def start_invalidation_listener(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class InMemoryLoanApplicationRepository:
+    """Dict-backed ``LoanApplicationRepository``"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.applications: Dict[uuid.UUID, LoanApplicationInDB] = {}
+        self.by_applicant: Dict[str, List[uuid.UUID]] = defaultdict(list)
+
+    async def upsert_many(self, applications: Sequence[LoanApplicationInDB]) -> None:
+        await _round_trip(self.latency)
+        for application in applications:
+            if application.id not in self.applications:
+                self.by_applicant[application.applicant_id].append(application.id)
+            self.applications[application.id] = application
+
+    def _latest(self, applicant_id: str) -> Optional[LoanApplicationInDB]:
+        ids = self.by_applicant.get(applicant_id)
+        if not ids:
+            return None
+        return max((self.applications[application_id] for application_id in ids), key=lambda a: a.created_at)
+
+    async def get(self, application_id: uuid.UUID) -> Optional[LoanApplicationInDB]:
+        await _round_trip(self.latency)
+        return self.applications.get(application_id)
+
+    async def list_history(
+        self,
+        applicant_id: str,
+        limit: int,
+        before: Optional[Tuple[datetime, uuid.UUID]] = None
+    ) -> List[LoanApplicationInDB]:
+        await _round_trip(self.latency)
+        applications = sorted(
+            (self.applications[application_id] for application_id in self.by_applicant.get(applicant_id, [])),
+            key=lambda a: (a.created_at, a.id),
+            reverse=True
+        )
+        if before is not None:
+            applications = [a for a in applications if (a.created_at, a.id) < before]
+        return applications[:limit]
+
+    async def get_latest(self, applicant_id: str) -> Optional[LoanApplicationInDB]:
+        await _round_trip(self.latency)
+        return self._latest(applicant_id)
+
+    async def stream_rows(self, export_filter: ApplicationExportFilter, chunk_size: int):
+        def matches(application: LoanApplicationInDB) -> bool:
+            bounds = (
+                (application.created_at, export_filter.created_from, export_filter.created_to),
+                (application.processed_at, export_filter.processed_from, export_filter.processed_to),
+            )
+            for value, lower, upper in bounds:
+                if (lower is not None or upper is not None) and value is None:
+                    return False
+                if (lower is not None and value < lower) or (upper is not None and value >= upper):
+                    return False
+            return export_filter.status is None or application.status == export_filter.status
+
+        rows = [
+            application.dict()
+            for application in sorted(self.applications.values(), key=lambda a: (a.created_at, a.id))
+            if matches(application)
+        ]
+        for start in range(0, len(rows), chunk_size):
+            await _round_trip(self.latency)
+            yield rows[start:start + chunk_size]
+
+    async def get_latest_many(self, applicant_ids: Sequence[str]) -> Dict[str, LoanApplicationInDB]:
+        await _round_trip(self.latency)
+        latest = {applicant_id: self._latest(applicant_id) for applicant_id in applicant_ids}
+        return {applicant_id: application for applicant_id, application in latest.items() if application}
+
+    async def approved_exposure_many(
+        self,
+        applicant_ids: Sequence[str],
+        since: datetime,
+        exclude_ids: Sequence[uuid.UUID] = ()
+    ) -> Dict[str, float]:
+        await _round_trip(self.latency)
+        excluded = set(exclude_ids)
+        exposure: Dict[str, float] = {}
+        for applicant_id in applicant_ids:
+            for application_id in self.by_applicant.get(applicant_id, []):
+                application = self.applications[application_id]
+                if (
+                    application_id not in excluded
+                    and application.status == ApplicationStatus.APPROVED
+                    # Naive datetimes are UTC
+                    and application.created_at.replace(tzinfo=application.created_at.tzinfo or timezone.utc) >= since
+                ):
+                    exposure[applicant_id] = exposure.get(applicant_id, 0.0) + application.amount
+        return exposure
+
+
+class InMemoryDecisionRollupRepository:
+    """Dict-backed ``DecisionRollupRepository``"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.rollups: Dict[Tuple[str, datetime], Dict[str, Any]] = {}
+
+    async def upsert_many(self, rollups: Sequence[Dict[str, Any]]) -> None:
+        await _round_trip(self.latency)
+        for rollup in rollups:
+            self.rollups[(rollup["granularity"], rollup["window_start"])] = dict(rollup)
+
+    async def list_windows(self, granularity: str, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        await _round_trip(self.latency)
+        return sorted(
+            (
+                rollup for (rollup_granularity, window_start), rollup in self.rollups.items()
+                if rollup_granularity == granularity and start <= window_start < end
+            ),
+            key=lambda rollup: rollup["window_start"]
+        )
+
+
+def install(
+    kafka: Optional[FakeKafkaClient] = None,
+    redis: Optional[FakeRedisCache] = None,
+    repository: Optional[InMemoryLoanApplicationRepository] = None,
+    rollups: Optional[InMemoryDecisionRollupRepository] = None
+) -> None:
+    """Replace the real singletons with fakes in every loaded app module"""
+    from app.infrastructure.cache.redis_client import redis_cache
+    from app.infrastructure.database.repository import decision_rollup_repository, loan_application_repository
+    from app.infrastructure.database.write_behind import write_behind_buffer
+    from app.infrastructure.messaging.kafka_client import kafka_client
+
+    replacements = {
+        id(kafka_client): kafka,
+        id(redis_cache): redis,
+        id(loan_application_repository): repository,
+        id(decision_rollup_repository): rollups,
+    }
+    for name, module in list(sys.modules.items()):
+        if module is None or not (name == "main" or name.startswith(("app.", "scripts."))):
+            continue
+        for attribute, value in list(vars(module).items()):
+            replacement = replacements.get(id(value))
+            if replacement is not None:
+                setattr(module, attribute, replacement)
+
+    if repository is not None:
+        write_behind_buffer.repository = repository
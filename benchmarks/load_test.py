@@ -0,0 +1,219 @@
+"""
+End-to-end load test against in-memory Kafka, Redis and Postgres.
+
+Submits applications to the FastAPI app over ASGI at a fixed concurrency
+while consumers in the same process decide them, then reads statuses back.
+Reports POST and GET latency, consumer throughput and submit-to-decision
+latency, and writes the results as JSON for comparison between commits
+(see ``benchmarks.compare``). The consumers share the event loop with the
+API, so submit-to-decision latency includes time spent queued behind it.
+
+Usage:
+    python -m benchmarks.load_test --requests 5000 --concurrency 100
+    python -m benchmarks.load_test --redis-latency-ms 0.3 --db-latency-ms 2 --output base.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from main import app
+from app.core.config import settings
+from app.infrastructure.database.write_behind import write_behind_buffer
+from benchmarks.fakes import FakeKafkaClient, FakeRedisCache, InMemoryLoanApplicationRepository, install
+from benchmarks.stats import summarize
+from scripts.kafka_consumer import process_applications
+
+
+def git_revision() -> Dict[str, Any]:
+    def git(*args: str) -> str:
+        return subprocess.run(["git", *args], capture_output=True, text=True).stdout.strip()
+
+    try:
+        return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+    except OSError:
+        return {"commit": None, "dirty": None}
+
+
+async def run_requests(count: int, concurrency: int, send) -> List[float]:
+    """Call ``send(n)`` for n in range(count), at most ``concurrency`` at once"""
+    latencies: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(n: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await send(n)
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one(n) for n in range(count)))
+    return latencies
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    kafka = FakeKafkaClient(partitions=args.partitions, latency=args.kafka_latency_ms / 1000)
+    redis = FakeRedisCache(latency=args.redis_latency_ms / 1000)
+    repository = InMemoryLoanApplicationRepository(latency=args.db_latency_ms / 1000)
+    install(kafka=kafka, redis=redis, repository=repository)
+    settings.KAFKA_PRODUCER_WAIT_FOR_DELIVERY = not args.buffered
+
+    submitted: Dict[str, float] = {}
+    decided: Dict[str, float] = {}
+    rejected: Dict[int, int] = {}
+    consumed = 0
+    first_batch_at: Optional[float] = None
+
+    async def process_batch(messages: List[Dict[str, Any]]) -> List[Optional[Exception]]:
+        nonlocal consumed, first_batch_at
+        if first_batch_at is None:
+            first_batch_at = time.perf_counter()
+        results = await process_applications(messages)
+        now = time.perf_counter()
+        consumed += len(messages)
+        for message, error in zip(messages, results):
+            if error is None:
+                decided[message["id"]] = now
+        return results
+
+    consumers = [
+        asyncio.create_task(kafka.consume_batches(
+            topic=settings.KAFKA_APPLICATION_TOPIC,
+            group_id=settings.KAFKA_CONSUMER_GROUP_ID,
+            process_batch=process_batch,
+            commit_gate=write_behind_buffer.flush_if_due
+        ))
+        for _ in range(args.consumers)
+    ]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def submit(n: int) -> None:
+            started = time.perf_counter()
+            response = await client.post(
+                "/api/v1/applications/",
+                json={
+                    "applicant_id": f"user{n % args.applicants}",
+                    "amount": random.choice((500, 5000, 25000, 60000)),
+                    "term_months": random.choice((6, 12, 24, 36)),
+                }
+            )
+            if response.status_code in (429, 503):
+                # Shed by admission control
+                rejected[response.status_code] = rejected.get(response.status_code, 0) + 1
+                return
+            response.raise_for_status()
+            submitted[response.json()["id"]] = started
+
+        post_started = time.perf_counter()
+        post_latencies = await run_requests(args.requests, args.concurrency, submit)
+        post_elapsed = time.perf_counter() - post_started
+
+        deadline = time.monotonic() + args.drain_timeout
+        while len(decided) < len(submitted) and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        consumer_elapsed = max(decided.values(), default=0.0) - (first_batch_at or 0.0)
+
+        async def read_status(n: int) -> None:
+            response = await client.get(f"/api/v1/applications/user{random.randrange(args.applicants)}")
+            if response.status_code not in (200, 404):
+                response.raise_for_status()
+
+        get_started = time.perf_counter()
+        get_latencies = await run_requests(args.reads, args.concurrency, read_status)
+        get_elapsed = time.perf_counter() - get_started
+
+    for consumer in consumers:
+        consumer.cancel()
+    await asyncio.gather(*consumers, return_exceptions=True)
+    await write_behind_buffer.flush()
+
+    return {
+        "post": {
+            **summarize(post_latencies),
+            "requests_per_second": len(post_latencies) / post_elapsed,
+            "rejected": {str(code): count for code, count in sorted(rejected.items())},
+        },
+        "get": {**summarize(get_latencies), "requests_per_second": len(get_latencies) / get_elapsed},
+        "consumer": {
+            "messages": consumed,
+            "messages_per_second": len(decided) / consumer_elapsed if consumer_elapsed > 0 else None,
+            "undecided": len(submitted) - len(decided),
+            "lag": kafka.lag(settings.KAFKA_APPLICATION_TOPIC, settings.KAFKA_CONSUMER_GROUP_ID),
+        },
+        "submit_to_decision": summarize([
+            decided[application_id] - started
+            for application_id, started in submitted.items()
+            if application_id in decided
+        ]),
+        "persisted": len(repository.applications),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000, help="applications to submit")
+    parser.add_argument("--reads", type=int, default=5000, help="status reads after submitting")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--applicants", type=int, default=1000, help="distinct applicant IDs")
+    parser.add_argument("--consumers", type=int, default=1, help="consumers in the group")
+    parser.add_argument("--partitions", type=int, default=4)
+    parser.add_argument("--buffered", action="store_true", help="don't wait for Kafka acks on submit")
+    parser.add_argument("--kafka-latency-ms", type=float, default=0.0)
+    parser.add_argument("--redis-latency-ms", type=float, default=0.0)
+    parser.add_argument("--db-latency-ms", type=float, default=0.0)
+    parser.add_argument("--drain-timeout", type=float, default=60.0, help="seconds to wait for decisions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<timestamp>.json)")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    # The service logs every application; keep that out of the measurements
+    logging.disable(logging.INFO)
+    started_at = datetime.now(timezone.utc)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        measurements = asyncio.run(run(args))
+
+    results = {
+        "benchmark": "load_test",
+        "timestamp": started_at.isoformat(),
+        "git": git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": {
+            **vars(args),
+            "cache_codec": settings.CACHE_CODEC,
+            "kafka_codec": settings.KAFKA_CODEC,
+            "cache_l1_enabled": settings.CACHE_L1_ENABLED,
+            "consumer_batch_size": settings.KAFKA_CONSUMER_BATCH_SIZE,
+        },
+        "results": measurements,
+    }
+
+    output = args.output or os.path.join("benchmarks", "results", f"{started_at:%Y%m%dT%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    for name in ("post", "get", "submit_to_decision"):
+        summary = measurements[name]
+        print(f"{name:<20}p50 {summary.get('p50_ms', 0):>9.2f} ms   p99 {summary.get('p99_ms', 0):>9.2f} ms")
+    if measurements["post"]["rejected"]:
+        print(f"{'post rejected':<20}{measurements['post']['rejected']}")
+    consumer = measurements["consumer"]
+    print(f"{'consumer':<20}{consumer['messages_per_second'] or 0:>13.0f} msg/s   undecided {consumer['undecided']}")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
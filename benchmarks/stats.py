@@ -0,0 +1,41 @@
+"""Latency summaries shared by the benchmarks."""
+from typing import Dict, List, Sequence
+
+# Upper bounds, in milliseconds, of the latency histogram buckets
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def histogram(samples_ms: Sequence[float]) -> Dict[str, int]:
+    """Count samples per bucket, keyed by the bucket's upper bound"""
+    counts = {str(bound): 0 for bound in BUCKETS_MS}
+    counts["+Inf"] = 0
+    for sample in samples_ms:
+        for bound in BUCKETS_MS:
+            if sample <= bound:
+                counts[str(bound)] += 1
+                break
+        else:
+            counts["+Inf"] += 1
+    return counts
+
+
+def summarize(samples: List[float]) -> Dict[str, object]:
+    """Summarize latencies given in seconds, reporting milliseconds"""
+    if not samples:
+        return {"count": 0}
+    samples_ms = [sample * 1000 for sample in samples]
+    return {
+        "count": len(samples_ms),
+        "mean_ms": sum(samples_ms) / len(samples_ms),
+        "p50_ms": percentile(samples_ms, 50),
+        "p90_ms": percentile(samples_ms, 90),
+        "p99_ms": percentile(samples_ms, 99),
+        "max_ms": max(samples_ms),
+        "histogram_ms": histogram(samples_ms),
+    }
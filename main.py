@@ -3,16 +3,25 @@ from fastapi import FastAPI
 from contextlib import asynccontextmanager
 
 from app.core.config import settings
-from app.api.v1.endpoints import applications
+from app.core.metrics import MetricsMiddleware, metrics_endpoint
+from app.core.profiling import ProfilingMiddleware
+from app.api.v1.endpoints import analytics, applications, quotes
 from app.infrastructure.messaging.kafka_client import kafka_client
+from app.infrastructure.cache.redis_client import redis_cache
+from app.infrastructure.cache.status_events import status_events
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("Starting application...")
     await kafka_client.start()
+    await redis_cache.start_invalidation_listener()
+    if settings.STATUS_STREAM_ENABLED:
+        await status_events.start()
     yield
     print("Shutting down application...")
+    await status_events.close()
     await kafka_client.stop()
+    await redis_cache.close()
 
 app = FastAPI(
     title="Loan Application Service",
@@ -21,12 +30,29 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
 # Include API routers
 app.include_router(
     applications.router,
     prefix="/api/v1/applications",
     tags=["applications"]
 )
+app.include_router(
+    analytics.router,
+    prefix="/api/v1/analytics",
+    tags=["analytics"]
+)
+app.include_router(
+    quotes.router,
+    prefix="/api/v1/quotes",
+    tags=["quotes"]
+)
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,213 @@
+"""
+Run several Kafka consumer processes in one consumer group.
+
+Each worker is a separate process running ``scripts.kafka_consumer``, so
+decisioning scales across cores; Kafka spreads the topic's partitions over
+them. Crashed workers are restarted with exponential backoff, SIGTERM and
+SIGINT are forwarded so every worker finishes and commits its in-flight
+batch, and aggregate throughput is logged periodically.
+
+Usage:
+    python -m scripts.consumer_supervisor [--workers N]
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from multiprocessing.sharedctypes import Synchronized
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# A worker that stays up this long has its restart backoff reset
+STABLE_AFTER_SECONDS = 60
+
+
+def restart_backoff(failures: int, uptime: float) -> Tuple[float, int]:
+    """Seconds to wait before restarting a worker that exited after ``uptime``
+    seconds, and its count of failures in a row including this one.
+
+    ``failures`` is the count before this exit. It starts over once a
+    worker has stayed up for STABLE_AFTER_SECONDS.
+    """
+    if uptime >= STABLE_AFTER_SECONDS:
+        failures = 0
+    backoff = min(
+        settings.CONSUMER_RESTART_BACKOFF_MS * 2 ** failures,
+        settings.CONSUMER_RESTART_BACKOFF_MAX_MS
+    ) / 1000
+    return backoff, failures + 1
+
+
+def run_worker(index: int, processed: Synchronized) -> None:
+    """Entry point of a worker process"""
+    # Leave the terminal's process group: Ctrl-C reaches the supervisor
+    # only, which forwards a single SIGTERM
+    os.setpgrp()
+    from scripts import kafka_consumer
+
+    # Workers can't share a port, so each serves metrics on its own
+    settings.METRICS_CONSUMER_PORT += index
+
+    def count(messages: int) -> None:
+        with processed.get_lock():
+            processed.value += messages
+
+    asyncio.run(kafka_consumer.main(on_processed=count))
+
+
+async def _partition_count() -> Optional[int]:
+    from aiokafka import AIOKafkaConsumer
+
+    consumer = AIOKafkaConsumer(
+        bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS,
+        security_protocol="PLAINTEXT"
+    )
+    try:
+        await asyncio.wait_for(consumer.start(), timeout=10)
+        await consumer.topics()
+        partitions = consumer.partitions_for_topic(settings.KAFKA_APPLICATION_TOPIC)
+        return len(partitions) if partitions else None
+    finally:
+        await consumer.stop()
+
+
+def default_worker_count() -> int:
+    """One worker per core, but no more than the topic has partitions"""
+    cores = os.cpu_count() or 1
+    try:
+        partitions = asyncio.run(_partition_count())
+    except Exception as e:
+        logger.warning(f"Could not read the partition count, using one worker per core: {e}")
+        partitions = None
+    return min(cores, partitions) if partitions else cores
+
+
+class Worker:
+    def __init__(self, index: int, context):
+        self.index = index
+        self.context = context
+        self.processed = context.Value("Q", 0)
+        self.process: Optional[multiprocessing.Process] = None
+        self.started_at = 0.0
+        self.failures = 0
+        self.restart_at: Optional[float] = None
+
+    def start(self) -> None:
+        self.process = self.context.Process(
+            target=run_worker,
+            args=(self.index, self.processed),
+            name=f"consumer-{self.index}"
+        )
+        self.process.start()
+        self.started_at = time.monotonic()
+        self.restart_at = None
+        logger.info(f"Started worker {self.index} (pid {self.process.pid})")
+
+    def check(self) -> None:
+        """Schedule a restart if the worker died, and restart it once due"""
+        now = time.monotonic()
+        if self.restart_at is not None:
+            if now >= self.restart_at:
+                self.start()
+            return
+        if self.process.is_alive():
+            return
+
+        backoff, self.failures = restart_backoff(self.failures, now - self.started_at)
+        self.restart_at = now + backoff
+        logger.error(
+            f"Worker {self.index} exited with code {self.process.exitcode}, restarting in {backoff:.1f}s"
+        )
+
+
+class Supervisor:
+    def __init__(self, workers: int):
+        # Spawn, so workers don't inherit the parent's threads or sockets
+        context = multiprocessing.get_context("spawn")
+        self.workers = [Worker(index, context) for index in range(workers)]
+        self.stopping = False
+
+    def _request_stop(self, signum: int, frame) -> None:
+        if self.stopping:
+            logger.info("Second shutdown signal, killing workers")
+            for worker in self._running():
+                worker.process.kill()
+            return
+        logger.info(f"Received signal {signum}, stopping workers...")
+        self.stopping = True
+
+    def _running(self) -> List[Worker]:
+        return [worker for worker in self.workers if worker.process is not None and worker.process.is_alive()]
+
+    def _total_processed(self) -> int:
+        return sum(worker.processed.value for worker in self.workers)
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+        for worker in self.workers:
+            worker.start()
+
+        last_report = time.monotonic()
+        last_total = 0
+        while not self.stopping:
+            time.sleep(0.5)
+            for worker in self.workers:
+                if not self.stopping:
+                    worker.check()
+
+            now = time.monotonic()
+            if now - last_report >= settings.CONSUMER_REPORT_INTERVAL_SECONDS:
+                total = self._total_processed()
+                rate = (total - last_total) / (now - last_report)
+                logger.info(
+                    f"{len(self._running())}/{len(self.workers)} workers up, "
+                    f"{rate:.0f} messages/s, {total} processed in total"
+                )
+                last_report, last_total = now, total
+
+        self._shutdown()
+
+    def _shutdown(self) -> None:
+        for worker in self._running():
+            os.kill(worker.process.pid, signal.SIGTERM)
+
+        deadline = time.monotonic() + settings.CONSUMER_SHUTDOWN_TIMEOUT_SECONDS
+        for worker in self.workers:
+            if worker.process is None:
+                continue
+            worker.process.join(max(deadline - time.monotonic(), 0))
+            if worker.process.is_alive():
+                logger.warning(f"Worker {worker.index} did not stop in time, killing it")
+                worker.process.kill()
+                worker.process.join()
+        logger.info(f"All workers stopped, {self._total_processed()} messages processed")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.CONSUMER_WORKERS,
+        help="worker processes (default: CONSUMER_WORKERS, else min(cores, partitions))"
+    )
+    args = parser.parse_args()
+
+    workers = args.workers or default_worker_count()
+    logger.info(f"Starting {workers} consumer workers")
+    Supervisor(workers).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,15 @@
 import asyncio
 import logging
-from typing import Dict, Any
+import signal
+from typing import Dict, Any, Callable, List, Optional
+from prometheus_client import start_http_server
 from app.core.config import settings
+from app.core.profiling import batch_profiler
 from app.infrastructure.messaging.kafka_client import kafka_client
+from app.infrastructure.database.base import init_db
+from app.infrastructure.database.partitions import partition_maintainer
+from app.infrastructure.database.write_behind import write_behind_buffer
+from app.usecases.analytics import rollup_compactor
 from app.usecases.application_handlers import LoanApplicationService
 
 # Configure logging
@@ -16,31 +23,107 @@ async def process_application(message: Dict[str, Any]) -> None:
     """Process a loan application message from Kafka"""
     try:
         logger.info(f"Processing application: {message}")
-        await LoanApplicationService.process_application(message)
+        with batch_profiler.batch():
+            await LoanApplicationService.process_application(message)
     except Exception as e:
         logger.error(f"Error processing application: {e}", exc_info=True)
         raise
 
-async def main():
+async def process_applications(messages: List[Dict[str, Any]]) -> List[Optional[Exception]]:
+    """Process a batch of loan application messages from Kafka"""
+    logger.info(f"Processing batch of {len(messages)} applications")
+    with batch_profiler.batch():
+        results = await LoanApplicationService.process_applications(messages)
+    failed = sum(1 for error in results if error is not None)
+    if failed:
+        logger.error(f"{failed} of {len(messages)} applications in batch failed")
+    return results
+
+def install_shutdown_handlers(stop: asyncio.Event) -> None:
+    """Finish the in-flight batch on the first SIGTERM/SIGINT; stop at once on the second"""
+    loop = asyncio.get_running_loop()
+    main_task = asyncio.current_task()
+    
+    def request_shutdown(signum: int) -> None:
+        if stop.is_set():
+            logger.info(f"Received signal {signum}, stopping immediately")
+            main_task.cancel()
+            return
+        logger.info(f"Received signal {signum}, finishing the current batch...")
+        stop.set()
+    
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(signum, request_shutdown, signum)
+        except NotImplementedError:
+            pass  # Windows: KeyboardInterrupt still works
+
+async def main(on_processed: Optional[Callable[[int], None]] = None):
+    """Run the consumer until a shutdown signal
+    
+    ``on_processed``, if given, is called with the size of every processed
+    batch (or 1 per message in legacy mode).
+    """
     logger.info("Starting Kafka consumer...")
+    stop = asyncio.Event()
+    install_shutdown_handlers(stop)
+    
+    async def process_batch(messages: List[Dict[str, Any]]) -> List[Optional[Exception]]:
+        results = await process_applications(messages)
+        if on_processed is not None:
+            on_processed(len(messages))
+        return results
+    
+    async def process_message(message: Dict[str, Any]) -> None:
+        try:
+            await process_application(message)
+        finally:
+            if on_processed is not None:
+                on_processed(1)
     
     try:
+        if settings.METRICS_ENABLED:
+            start_http_server(settings.METRICS_CONSUMER_PORT)
+            logger.info(f"Serving metrics on port {settings.METRICS_CONSUMER_PORT}")
+        if settings.PROFILING_ENABLED:
+            batch_profiler.install_signal_handlers(asyncio.get_running_loop())
+        await init_db()
+        await partition_maintainer.start()
+        await rollup_compactor.start()
         await kafka_client.start()
         
         logger.info("Kafka consumer started. Waiting for messages...")
         
-        await kafka_client.consume_messages(
-            topic=settings.KAFKA_APPLICATION_TOPIC,
-            group_id=settings.KAFKA_CONSUMER_GROUP_ID,
-            process_message=process_application
-        )
+        if settings.KAFKA_CONSUMER_BATCH_MODE:
+            await kafka_client.consume_batches(
+                topic=settings.KAFKA_APPLICATION_TOPIC,
+                group_id=settings.KAFKA_CONSUMER_GROUP_ID,
+                process_batch=process_batch,
+                commit_gate=write_behind_buffer.flush_if_due,
+                stop=stop
+            )
+        else:
+            await kafka_client.consume_messages(
+                topic=settings.KAFKA_APPLICATION_TOPIC,
+                group_id=settings.KAFKA_CONSUMER_GROUP_ID,
+                process_message=process_message,
+                commit_gate=write_behind_buffer.flush_if_due,
+                stop=stop
+            )
         
     except asyncio.CancelledError:
         logger.info("Shutting down Kafka consumer...")
     except Exception as e:
         logger.error(f"Error in Kafka consumer: {e}", exc_info=True)
     finally:
+        await partition_maintainer.stop()
+        await rollup_compactor.stop()
+        try:
+            await write_behind_buffer.stop()
+        except Exception as e:
+            logger.error(f"Error flushing applications to the database: {e}", exc_info=True)
         await kafka_client.stop()
+        batch_profiler.finish()
         logger.info("Kafka consumer stopped")
 
 if __name__ == "__main__":
@@ -0,0 +1,128 @@
+"""
+Maintain the monthly partitions of loan_applications.
+
+Creates the partitions for the next DB_PARTITION_PREMAKE_MONTHS, then
+detaches every partition older than the retention period and archives it
+to ``<archive-dir>/<partition>.csv.gz`` before dropping it. Detached
+partitions left over from an interrupted run are archived too. Run it
+daily, e.g. from cron.
+
+Usage:
+    python -m scripts.manage_partitions [--retention-months N] [--archive-dir DIR] [--keep] [--dry-run]
+"""
+import argparse
+import asyncio
+import gzip
+import logging
+import os
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.infrastructure.database.base import engine
+from app.infrastructure.database.partitions import (
+    DEFAULT_PARTITION,
+    add_months,
+    attached_partitions,
+    current_month,
+    detach_partition,
+    detached_partitions,
+    partition_maintainer,
+    partition_month
+)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def archive_path(name: str, archive_dir: str) -> str:
+    return os.path.join(archive_dir, f"{name}.csv.gz")
+
+
+async def archive_partition(name: str, archive_dir: str) -> str:
+    """Copy a detached partition to a gzipped CSV file, returning its path"""
+    path = archive_path(name, archive_dir)
+    partial = f"{path}.partial"
+    async with engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        with gzip.open(partial, "wb") as archive:
+            async def write(chunk: bytes) -> None:
+                archive.write(chunk)
+            status = await raw.driver_connection.copy_from_table(
+                name, output=write, format="csv", header=True
+            )
+        # Only a complete archive gets the final name
+        os.replace(partial, path)
+    logger.info(f"Archived {name} to {path} ({status})")
+    return path
+
+
+async def maintain(args: argparse.Namespace) -> None:
+    if not args.dry_run:
+        created = await partition_maintainer.ensure_ahead()
+        if created:
+            logger.info(f"Created partitions: {', '.join(created)}")
+
+    cutoff = add_months(current_month(), -args.retention_months)
+    async with engine.connect() as conn:
+        attached = await attached_partitions(conn)
+        expired = [
+            name for name in attached
+            if partition_month(name) is not None and partition_month(name) < cutoff
+        ]
+        default_rows = 0
+        if DEFAULT_PARTITION in attached:
+            default_rows = (await conn.execute(text(f"SELECT count(*) FROM {DEFAULT_PARTITION}"))).scalar()
+    if default_rows:
+        logger.warning(
+            f"{DEFAULT_PARTITION} holds {default_rows} rows outside every monthly partition; "
+            f"months they belong to can't be created until they are moved"
+        )
+
+    if args.dry_run:
+        logger.info(f"Would detach and archive: {', '.join(expired) or 'nothing'}")
+        return
+
+    for name in expired:
+        async with engine.begin() as conn:
+            # Detaching locks the whole table, so don't queue behind long queries
+            await conn.execute(text(f"SET LOCAL lock_timeout = '{args.lock_timeout_ms}ms'"))
+            await detach_partition(conn, name)
+        logger.info(f"Detached {name}")
+
+    async with engine.connect() as conn:
+        detached = await detached_partitions(conn)
+    os.makedirs(args.archive_dir, exist_ok=True)
+    for name in detached:
+        # Partitions kept by an earlier --keep run are already archived
+        if not os.path.exists(archive_path(name, args.archive_dir)):
+            await archive_partition(name, args.archive_dir)
+        if not args.keep:
+            async with engine.begin() as conn:
+                await conn.execute(text(f"DROP TABLE {name}"))
+            logger.info(f"Dropped {name}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--retention-months", type=int, default=settings.DB_PARTITION_RETENTION_MONTHS)
+    parser.add_argument("--archive-dir", default=settings.DB_PARTITION_ARCHIVE_DIR)
+    parser.add_argument("--lock-timeout-ms", type=int, default=5000, help="give up detaching after waiting this long")
+    parser.add_argument("--keep", action="store_true", help="keep archived partitions as standalone tables")
+    parser.add_argument("--dry-run", action="store_true", help="only list the partitions that would be archived")
+    args = parser.parse_args()
+
+    async def run() -> None:
+        try:
+            await maintain(args)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
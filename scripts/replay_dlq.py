@@ -0,0 +1,114 @@
+"""
+Re-drive dead-lettered applications through the main topic.
+
+Reads the dead-letter topic up to its current end and republishes each
+record, with its original key and without retry headers, to the main topic,
+where it gets a fresh set of retries. Progress is committed under
+KAFKA_DLQ_REPLAY_GROUP_ID (or --group), so a second run picks up only
+records dead-lettered since. Records skipped by --error-contains are
+committed too; re-scan them with a new --group.
+
+Usage:
+    python -m scripts.replay_dlq [--dry-run] [--error-contains TEXT] [--limit N]
+"""
+import argparse
+import asyncio
+import logging
+from collections import Counter
+from typing import Dict
+
+from aiokafka import AIOKafkaConsumer, TopicPartition
+
+from app.core.config import settings
+from app.infrastructure.messaging.kafka_client import ERROR_HEADER, dead_letter_topic, kafka_client, record_header
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+async def replay(args: argparse.Namespace) -> Dict[str, int]:
+    source = dead_letter_topic(args.topic)
+    consumer = AIOKafkaConsumer(
+        bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS,
+        group_id=args.group,
+        auto_offset_reset="earliest",
+        enable_auto_commit=False,
+        value_deserializer=kafka_client.codec.decode,
+        security_protocol="PLAINTEXT"
+    )
+    counts = {"replayed": 0, "skipped": 0}
+    errors: Counter = Counter()
+    await consumer.start()
+    if not args.dry_run:
+        await kafka_client.start()
+    try:
+        await consumer.topics()
+        partitions = consumer.partitions_for_topic(source)
+        if not partitions:
+            logger.info(f"Topic {source} does not exist, nothing to replay")
+            return counts
+        assigned = [TopicPartition(source, partition) for partition in sorted(partitions)]
+        consumer.assign(assigned)
+        # Only replay what is there now, not records dead-lettered meanwhile
+        end = await consumer.end_offsets(assigned)
+        remaining = {tp for tp in assigned if await consumer.position(tp) < end[tp]}
+
+        while remaining and (args.limit is None or counts["replayed"] < args.limit):
+            batch = await consumer.getmany(*remaining, timeout_ms=1000, max_records=args.batch_size)
+            if not any(batch.values()):
+                # What is left before the end offsets holds no records, e.g.
+                # transaction markers, which the position never passes
+                break
+            deliveries = []
+            offsets: Dict[TopicPartition, int] = {}
+            for tp, msgs in batch.items():
+                for msg in msgs:
+                    if msg.offset >= end[tp] or (args.limit is not None and counts["replayed"] >= args.limit):
+                        break
+                    offsets[tp] = msg.offset + 1
+                    error = record_header(msg, ERROR_HEADER) or ""
+                    if args.error_contains and args.error_contains not in error:
+                        counts["skipped"] += 1
+                        continue
+                    counts["replayed"] += 1
+                    errors[error.split(":", 1)[0] or "unknown"] += 1
+                    if not args.dry_run:
+                        deliveries.append(
+                            await kafka_client.send_message(args.topic, msg.value, key=msg.key, wait=False)
+                        )
+
+            # Commit only once the whole batch is acknowledged by the broker
+            await asyncio.gather(*deliveries)
+            if offsets and not args.dry_run:
+                await consumer.commit(offsets)
+            remaining = {tp for tp in remaining if await consumer.position(tp) < end[tp]}
+    finally:
+        await consumer.stop()
+        if not args.dry_run:
+            await kafka_client.stop()
+
+    for error, count in errors.most_common(10):
+        logger.info(f"{count:>8} {error}")
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--topic", default=settings.KAFKA_APPLICATION_TOPIC, help="main topic to replay into")
+    parser.add_argument("--group", default=settings.KAFKA_DLQ_REPLAY_GROUP_ID, help="consumer group tracking progress")
+    parser.add_argument("--error-contains", help="only replay records whose error contains this text")
+    parser.add_argument("--limit", type=int, help="replay at most this many records")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="count and summarize errors without replaying")
+    args = parser.parse_args()
+
+    counts = asyncio.run(replay(args))
+    verb = "Would replay" if args.dry_run else "Replayed"
+    logger.info(f"{verb} {counts['replayed']} records, skipped {counts['skipped']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
 import pytest
+from unittest.mock import AsyncMock
 from fastapi.testclient import TestClient
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 
-from app.main import app
+from main import app
 from app.infrastructure.database.base import Base
 from app.core.config import settings
 
@@ -34,14 +35,32 @@ async def test_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
 
+@pytest.fixture(autouse=True)
+def mock_repository(mocker):
+    # Keep cache misses from reaching a real database
+    mock = AsyncMock()
+    mock.get_latest.return_value = None
+    mock.get_latest_many.return_value = {}
+    mock.approved_exposure_many.return_value = {}
+    mocker.patch("app.usecases.application_handlers.loan_application_repository", mock)
+    return mock
+
 @pytest.fixture
 def mock_redis(mocker):
-    mock = mocker.MagicMock()
+    mock = AsyncMock()
     mocker.patch("app.infrastructure.cache.redis_client.redis_cache", mock)
+    mocker.patch("app.usecases.application_handlers.redis_cache", mock)
+    mocker.patch("app.usecases.idempotency.redis_cache", mock)
+    mocker.patch("app.core.admission.redis_cache", mock)
+    mocker.patch("app.usecases.analytics.redis_cache", mock)
+    mock.take_token.return_value = (True, 0.0)
+    mock.get_bytes.return_value = None
+    mock.set_many_if_newer.return_value = [True]
     return mock
 
 @pytest.fixture
 def mock_kafka(mocker):
-    mock = mocker.MagicMock()
+    mock = AsyncMock()
     mocker.patch("app.infrastructure.messaging.kafka_client.kafka_client", mock)
+    mocker.patch("app.api.v1.endpoints.applications.kafka_client", mock)
     return mock
@@ -0,0 +1,129 @@
+import json
+
+import pytest
+from fastapi import HTTPException, status
+
+from app.api.v1.endpoints.applications import create_applications_bulk
+from app.core.admission import admission_controller
+from app.core.config import settings
+from app.domain.models import LoanApplicationCreate
+from app.usecases import idempotency
+
+TEST_APPLICATION = {
+    "applicant_id": "test_user_123",
+    "amount": 5000,
+    "term_months": 12
+}
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_applicant_gets_429(test_app, mock_kafka, mock_redis):
+    mock_redis.take_token.return_value = (False, 2.5)
+    
+    response = test_app.post("/api/v1/applications/", json=TEST_APPLICATION)
+    
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert response.headers["Retry-After"] == "3"
+    mock_kafka.send_message.assert_not_called()
+    mock_redis.take_token.assert_called_once_with(
+        "rate:test_user_123",
+        settings.RATE_LIMIT_PER_APPLICANT_PER_SECOND,
+        settings.RATE_LIMIT_PER_APPLICANT_BURST
+    )
+
+
+@pytest.mark.asyncio
+async def test_idempotent_retry_is_replayed_despite_the_rate_limit(test_app, mock_kafka, mock_redis):
+    original = test_app.post("/api/v1/applications/", json=TEST_APPLICATION).json()
+    mock_kafka.send_message.reset_mock()
+    mock_redis.take_token.reset_mock()
+    mock_redis.take_token.return_value = (False, 2.5)
+    mock_redis.set.return_value = False
+    mock_redis.get.return_value = {
+        "fingerprint": idempotency.fingerprint(LoanApplicationCreate(**TEST_APPLICATION).dict()),
+        "response": original
+    }
+    
+    response = test_app.post(
+        "/api/v1/applications/", json=TEST_APPLICATION, headers={"Idempotency-Key": "retry-1"}
+    )
+    
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert response.headers["Idempotent-Replayed"] == "true"
+    mock_redis.take_token.assert_not_called()
+    mock_kafka.send_message.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_request_releases_its_idempotency_key(test_app, mock_kafka, mock_redis):
+    mock_redis.take_token.return_value = (False, 2.5)
+    mock_redis.set.return_value = True
+    
+    response = test_app.post(
+        "/api/v1/applications/", json=TEST_APPLICATION, headers={"Idempotency-Key": "retry-2"}
+    )
+    
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    # Retrying once the limit refills is not mistaken for a request in progress
+    mock_redis.delete.assert_called_once_with("idempotency:test_user_123:retry-2")
+
+
+@pytest.mark.asyncio
+async def test_submissions_are_shed_at_the_in_flight_cap(test_app, mock_kafka, mock_redis, mocker):
+    mocker.patch.object(admission_controller, "in_flight", settings.ADMISSION_MAX_IN_FLIGHT)
+    
+    response = test_app.post("/api/v1/applications/", json=TEST_APPLICATION)
+    
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["Retry-After"] == str(settings.ADMISSION_RETRY_AFTER_SECONDS)
+    mock_kafka.send_message.assert_not_called()
+    mock_redis.take_token.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_submissions_are_shed_while_the_producer_is_backed_up(test_app, mock_kafka, mock_redis, mocker):
+    kafka = mocker.patch("app.core.admission.kafka_client")
+    kafka.pending_deliveries = settings.ADMISSION_MAX_PRODUCER_PENDING
+    
+    response = test_app.post("/api/v1/applications/", json=TEST_APPLICATION)
+    
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    mock_kafka.send_message.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_admitted_submission_releases_its_slot(test_app, mock_kafka, mock_redis):
+    response = test_app.post("/api/v1/applications/", json=TEST_APPLICATION)
+    
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert admission_controller.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_bulk_upload_is_shed_at_the_in_flight_cap(test_app, mock_kafka, mocker):
+    mocker.patch.object(admission_controller, "in_flight", settings.ADMISSION_MAX_IN_FLIGHT)
+    
+    response = test_app.post("/api/v1/applications/bulk", content=b'{"applicant_id": "a"}\n')
+    
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["Retry-After"] == str(settings.ADMISSION_RETRY_AFTER_SECONDS)
+    mock_kafka.send_message.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_bulk_upload_takes_its_slot_before_responding(test_app, mock_kafka, mocker):
+    mocker.patch.object(settings, "ADMISSION_MAX_IN_FLIGHT", 1)
+    mocker.patch("app.usecases.bulk_submission.kafka_client", mock_kafka)
+    mock_kafka.send_message.return_value = None
+    
+    # The first upload's body hasn't been read yet, but its slot is taken
+    await create_applications_bulk(mocker.MagicMock())
+    with pytest.raises(HTTPException) as refused:
+        await create_applications_bulk(mocker.MagicMock())
+    assert refused.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    admission_controller.release()
+    
+    response = test_app.post("/api/v1/applications/bulk", content=json.dumps(TEST_APPLICATION).encode())
+    assert response.status_code == status.HTTP_200_OK
+    assert json.loads(response.text)["status"] == "accepted"
+    assert admission_controller.in_flight == 0
@@ -0,0 +1,123 @@
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock
+
+import pytest
+from fastapi import status
+
+from app.domain.models import ApplicationStatus, LoanApplicationInDB
+from app.infrastructure.database.write_behind import WriteBehindBuffer, write_behind_buffer
+from app.usecases.analytics import record_decisions
+from app.usecases.application_handlers import LoanApplicationService
+
+
+def _decided(applicant_id, amount, term_months, decision, processed_at):
+    return LoanApplicationInDB(
+        applicant_id=applicant_id,
+        amount=amount,
+        term_months=term_months,
+        status=decision,
+        processed_at=processed_at
+    )
+
+
+@pytest.mark.asyncio
+async def test_batch_is_rolled_up_per_window_in_one_call(mock_redis):
+    processed_at = datetime(2024, 5, 1, 10, 30)
+    await record_decisions([
+        _decided("a", 4000, 12, ApplicationStatus.APPROVED, processed_at),
+        _decided("a", 30000, 60, ApplicationStatus.REJECTED, processed_at),
+        _decided("b", 250000, 36, ApplicationStatus.APPROVED, processed_at),
+    ])
+
+    mock_redis.add_rollups.assert_called_once()
+    counters, uniques = mock_redis.add_rollups.call_args.args
+    hour = int(datetime(2024, 5, 1, 10, tzinfo=timezone.utc).timestamp())
+    day = int(datetime(2024, 5, 1, tzinfo=timezone.utc).timestamp())
+    assert set(counters) == {f"rollup:hour:{hour}", f"rollup:day:{day}"}
+    assert counters[f"rollup:hour:{hour}"] == {
+        "decisions": 3,
+        "status:approved": 2,
+        "status:rejected": 1,
+        "amount_sum": 284000.0,
+        "amount:5000": 1,
+        "amount:50000": 1,
+        "amount:inf": 1,
+        "term:12": 1,
+        "term:60": 1,
+        "term:36": 1,
+    }
+    assert uniques[f"rollup_applicants:hour:{hour}"] == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_decisions_are_recorded_once_flushed(mock_redis, mocker):
+    buffer = WriteBehindBuffer(AsyncMock())
+    buffer.flush_callbacks = list(write_behind_buffer.flush_callbacks)
+    mocker.patch("app.usecases.application_handlers.write_behind_buffer", buffer)
+    mock_redis.get_many.return_value = [None, None]
+    batch = [
+        LoanApplicationInDB(applicant_id=applicant_id, amount=4000, term_months=12).dict()
+        for applicant_id in ("a", "b")
+    ]
+
+    await LoanApplicationService.process_applications(batch)
+    mock_redis.add_rollups.assert_not_called()
+
+    # A failed flush keeps the decisions, and they are counted by the next one
+    buffer.repository.upsert_many.side_effect = [ConnectionError("database down"), None]
+    with pytest.raises(ConnectionError):
+        await buffer.flush()
+    mock_redis.add_rollups.assert_not_called()
+    await buffer.flush()
+
+    mock_redis.add_rollups.assert_called_once()
+    counters, _ = mock_redis.add_rollups.call_args.args
+    assert all(window["decisions"] == 2 for window in counters.values())
+
+
+@pytest.mark.asyncio
+async def test_analytics_combines_live_and_compacted_windows(test_app, mock_redis, mocker):
+    live_window = datetime(2024, 5, 1, 2, tzinfo=timezone.utc)
+    compacted_window = datetime(2024, 5, 1, 0, tzinfo=timezone.utc)
+    live_key = f"rollup:hour:{int(live_window.timestamp())}"
+    mock_redis.get_rollups.side_effect = lambda keys: [
+        ({"decisions": 4.0, "status:approved": 3.0, "status:rejected": 1.0, "amount_sum": 8000.0}, b"live", 2)
+        if key == live_key else ({}, None, 0)
+        for key, _ in keys
+    ]
+    mock_redis.count_unique.return_value = 3
+    rollups = AsyncMock()
+    rollups.list_windows.return_value = [{
+        "window_start": compacted_window,
+        "counters": {"decisions": 1.0, "status:approved": 1.0, "amount_sum": 1000.0, "amount:1000": 1.0},
+        "applicants_hll": b"stored",
+        "unique_applicants": 1,
+    }]
+    mocker.patch("app.usecases.analytics.decision_rollup_repository", rollups)
+
+    response = test_app.get(
+        "/api/v1/analytics/?granularity=hour&start=2024-05-01T00:00:00&end=2024-05-01T03:00:00"
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert [(window["window_start"][:13], window["decisions"]) for window in data["windows"]] == [
+        ("2024-05-01T00", 1), ("2024-05-01T02", 4)
+    ]
+    assert data["summary"]["decisions"] == 5
+    assert data["summary"]["approval_rate"] == 0.8
+    assert data["summary"]["average_amount"] == 1800.0
+    assert data["summary"]["amount_histogram"]["1000"] == 1
+    # Distinct applicants are counted over the union of every window
+    assert data["summary"]["unique_applicants"] == 3
+    mock_redis.count_unique.assert_called_once_with(
+        [f"rollup_applicants:hour:{int(live_window.timestamp())}"], [b"stored"]
+    )
+
+
+def test_analytics_rejects_too_many_windows(test_app, mock_redis):
+    response = test_app.get(
+        "/api/v1/analytics/?granularity=hour&start=2020-01-01T00:00:00&end=2024-01-01T00:00:00"
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
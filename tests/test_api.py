@@ -1,6 +1,9 @@
 import pytest
+from datetime import datetime
 from fastapi import status
-from app.domain.models import ApplicationStatus
+from app.api.v1.endpoints import applications
+from app.domain.models import ApplicationStatus, LoanApplicationCreate, LoanApplicationInDB
+from app.usecases import idempotency
 
 TEST_APPLICATION = {
     "applicant_id": "test_user_123",
@@ -9,7 +12,7 @@ TEST_APPLICATION = {
 }
 
 @pytest.mark.asyncio
-async def test_create_application(test_app, mock_kafka):
+async def test_create_application(test_app, mock_kafka, mock_redis):
     # Mock the Kafka producer
     mock_kafka.send_message.return_value = None
     
@@ -52,6 +55,34 @@ async def test_get_application_status(test_app, mock_redis):
     
     # Verify Redis was called with the correct key
     mock_redis.get.assert_called_once_with(f"app_status:{test_status['applicant_id']}")
+    # The serialized response is cached for the next request
+    cache_key, cached = mock_redis.set_bytes.call_args.args
+    assert cache_key == f"app_status_response:{test_status['applicant_id']}"
+    assert cached.endswith(response.content)
+    assert cached.startswith(response.headers["ETag"].encode() + b"\n")
+
+@pytest.mark.asyncio
+async def test_get_application_status_serves_cached_response(test_app, mock_redis):
+    body = b'{"applicant_id":"test_user_123","status":"approved"}'
+    mock_redis.get_bytes.return_value = b'"abc123"\n' + body
+    
+    response = test_app.get("/api/v1/applications/test_user_123")
+    
+    # Sent as cached, without going through the status cache or the model
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == body
+    assert response.headers["ETag"] == '"abc123"'
+    mock_redis.get_bytes.assert_called_once_with("app_status_response:test_user_123")
+    mock_redis.get.assert_not_called()
+    
+    response = test_app.get(
+        "/api/v1/applications/test_user_123",
+        headers={"If-None-Match": 'W/"other", W/"abc123"'}
+    )
+    
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+    assert response.headers["ETag"] == '"abc123"'
 
 @pytest.mark.asyncio
 async def test_get_nonexistent_application(test_app, mock_redis):
@@ -64,3 +95,143 @@ async def test_get_nonexistent_application(test_app, mock_redis):
     # Verify the response
     assert response.status_code == status.HTTP_404_NOT_FOUND
     assert "No application found" in response.json()["detail"]
+
+@pytest.mark.asyncio
+async def test_get_application_history_pages(test_app, mock_redis, mock_repository):
+    # The Redis index is empty, so pages come from the database
+    mock_redis.index_range.return_value = []
+    applications = [
+        LoanApplicationInDB(
+            applicant_id="test_user_123",
+            amount=5000,
+            term_months=12,
+            created_at=datetime(2023, 1, 1, 0, minute)
+        )
+        for minute in (3, 2, 1)
+    ]
+    mock_repository.list_history.return_value = applications
+    
+    # The repository returns one more row than requested, so there is a next page
+    response = test_app.get("/api/v1/applications/test_user_123/history?limit=2")
+    
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert [a["id"] for a in data["applications"]] == [str(a.id) for a in applications[:2]]
+    assert data["next_cursor"]
+    mock_repository.list_history.assert_called_once_with("test_user_123", 3, None)
+    
+    # The cursor points past the last application on the page
+    mock_repository.list_history.reset_mock()
+    mock_repository.list_history.return_value = applications[2:]
+    response = test_app.get(
+        f"/api/v1/applications/test_user_123/history?limit=2&cursor={data['next_cursor']}"
+    )
+    
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert [a["id"] for a in data["applications"]] == [str(applications[2].id)]
+    assert data["next_cursor"] is None
+    mock_repository.list_history.assert_called_once_with(
+        "test_user_123", 3, (applications[1].created_at, applications[1].id)
+    )
+
+@pytest.mark.asyncio
+async def test_get_application_history_invalid_cursor(test_app, mock_redis):
+    response = test_app.get("/api/v1/applications/test_user_123/history?cursor=not-a-cursor")
+    
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+@pytest.mark.asyncio
+async def test_export_applications_csv(test_app, mocker):
+    application = LoanApplicationInDB(
+        applicant_id="test_user_123",
+        amount=5000,
+        term_months=12,
+        status=ApplicationStatus.APPROVED,
+        created_at=datetime(2023, 1, 1),
+        reason_codes=["LOW_AMOUNT", "SHORT_TERM"]
+    )
+    
+    class Repository:
+        async def stream_rows(self, export_filter, chunk_size):
+            self.export_filter = export_filter
+            yield [application.dict()]
+    
+    repository = Repository()
+    mocker.patch("app.usecases.export.loan_application_repository", repository)
+    
+    response = test_app.get(
+        "/api/v1/applications/export?format=csv&status=approved&created_from=2023-01-01T00:00:00"
+    )
+    
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/csv")
+    header, row = response.text.splitlines()
+    assert header.startswith("id,applicant_id,amount")
+    assert row.startswith(f"{application.id},test_user_123,5000.0,12,approved,2023-01-01T00:00:00")
+    assert "LOW_AMOUNT;SHORT_TERM" in row
+    assert repository.export_filter.status == ApplicationStatus.APPROVED
+    assert repository.export_filter.created_from == datetime(2023, 1, 1)
+
+@pytest.mark.asyncio
+async def test_export_is_refused_while_every_slot_is_taken(test_app, mocker):
+    class Repository:
+        async def stream_rows(self, export_filter, chunk_size):
+            yield []
+    
+    mocker.patch("app.usecases.export.loan_application_repository", Repository())
+    slots = applications._Slots(1)
+    mocker.patch.object(applications, "_export_slots", slots)
+    
+    assert slots.try_acquire()
+    response = test_app.get("/api/v1/applications/export")
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    
+    slots.release()
+    response = test_app.get("/api/v1/applications/export")
+    assert response.status_code == status.HTTP_200_OK
+    # Given back once the export is sent
+    assert slots.taken == 0
+
+@pytest.mark.asyncio
+async def test_create_application_with_idempotency_key(test_app, mock_kafka, mock_redis):
+    mock_redis.set.return_value = True
+    
+    response = test_app.post(
+        "/api/v1/applications/", json=TEST_APPLICATION, headers={"Idempotency-Key": "retry-1"}
+    )
+    
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    mock_kafka.send_message.assert_called_once()
+    # The claim, then the stored response
+    claim, stored = mock_redis.set.call_args_list
+    assert claim.args[0] == "idempotency:test_user_123:retry-1"
+    assert claim.kwargs["nx"] is True
+    assert stored.args[1]["response"]["id"] == response.json()["id"]
+
+@pytest.mark.asyncio
+async def test_create_application_replays_idempotent_response(test_app, mock_kafka, mock_redis):
+    original = test_app.post("/api/v1/applications/", json=TEST_APPLICATION).json()
+    mock_kafka.send_message.reset_mock()
+    mock_redis.set.return_value = False
+    mock_redis.get.return_value = {
+        "fingerprint": idempotency.fingerprint(LoanApplicationCreate(**TEST_APPLICATION).dict()),
+        "response": original
+    }
+    
+    response = test_app.post(
+        "/api/v1/applications/", json=TEST_APPLICATION, headers={"Idempotency-Key": "retry-1"}
+    )
+    
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert response.headers["Idempotent-Replayed"] == "true"
+    assert response.json()["id"] == original["id"]
+    mock_kafka.send_message.assert_not_called()
+    
+    # The same key with a different body is refused
+    response = test_app.post(
+        "/api/v1/applications/",
+        json={**TEST_APPLICATION, "amount": 9000},
+        headers={"Idempotency-Key": "retry-1"}
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
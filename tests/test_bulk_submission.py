@@ -0,0 +1,61 @@
+import pytest
+
+from app.core.config import settings
+from app.usecases.bulk_submission import RecordTooLarge, iter_records
+
+
+async def _chunks(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def _parse(*chunks):
+    return [record async for record in iter_records(_chunks(*chunks))]
+
+
+@pytest.mark.asyncio
+async def test_records_split_across_chunks():
+    assert await _parse(b'{"a": 1}\n{"a"', b': 2}\n\n{"a": 3}') == [{"a": 1}, {"a": 2}, {"a": 3}]
+    assert await _parse(b' [{"a": 1}, {"a"', b': 2} ', b', {"a": 3}]') == [{"a": 1}, {"a": 2}, {"a": 3}]
+
+
+@pytest.mark.asyncio
+async def test_scalars_split_across_chunks():
+    assert await _parse(b'[{"a":1}, 12', b'34]') == [{"a": 1}, 1234]
+    assert await _parse(b'[12', b'34, 5', b'6.', b'5]') == [1234, 56.5]
+    assert await _parse(b'12', b'34\n5') == [1234, 5]
+
+
+@pytest.mark.asyncio
+async def test_utf8_split_across_chunks_and_crlf():
+    name = "Zoë 名".encode("utf-8")
+    body = b'{"name": "' + name + b'"}\r\n{"name": "x"}\r\n'
+    for split in range(len(body)):
+        assert await _parse(body[:split], body[split:]) == [{"name": "Zoë 名"}, {"name": "x"}]
+
+
+@pytest.mark.asyncio
+async def test_malformed_input():
+    # NDJSON skips a bad line and carries on
+    records = await _parse(b'{"a": 1}\n{"a": \n{"a": 3}\n')
+    assert records[0] == {"a": 1} and isinstance(records[1], ValueError) and records[2] == {"a": 3}
+
+    # An array can't be resynchronised, so the first error ends it
+    records = await _parse(b'[{"a": 1} {"a": 2}]')
+    assert records[0] == {"a": 1} and isinstance(records[1], ValueError) and len(records) == 2
+    records = await _parse(b'[{"a": 1}, {"a": 2}')
+    assert records[:2] == [{"a": 1}, {"a": 2}] and isinstance(records[2], ValueError)
+    records = await _parse(b'[{"a": ')
+    assert len(records) == 1 and isinstance(records[0], ValueError)
+
+    assert await _parse(b"  \n ") == []
+
+
+@pytest.mark.asyncio
+async def test_oversized_records(monkeypatch):
+    monkeypatch.setattr(settings, "BULK_SUBMIT_MAX_RECORD_BYTES", 16)
+    records = await _parse(b'{"a": "' + b"x" * 20, b'"}\n{"a": 2}\n')
+    assert isinstance(records[0], RecordTooLarge) and records[1:] == [{"a": 2}]
+
+    records = await _parse(b"[" + b"1" * 20, b"1" * 20, b"]")
+    assert len(records) == 1 and isinstance(records[0], RecordTooLarge)
@@ -0,0 +1,50 @@
+import json
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+
+from app.domain.models import ApplicationStatus
+from app.infrastructure.serialization.codecs import CODECS, decode, get_codec
+
+APPLICATION = {
+    "id": uuid4(),
+    "applicant_id": "test_user_123",
+    "amount": 5000.0,
+    "term_months": 12,
+    "status": ApplicationStatus.APPROVED,
+    "created_at": datetime(2023, 1, 1, 0, 0, 0),
+    "processed_at": None,
+}
+
+
+@pytest.mark.parametrize("name", list(CODECS))
+def test_round_trip_through_any_reader(name):
+    payload = get_codec(name).encode(APPLICATION)
+
+    # Every codec reads every format
+    for reader in CODECS:
+        value = get_codec(reader).decode(payload)
+        assert value["id"] == str(APPLICATION["id"])
+        assert value["status"] == "approved"
+        assert value["created_at"] == "2023-01-01T00:00:00"
+        assert value["processed_at"] is None
+
+
+def test_reads_legacy_double_encoded_json():
+    legacy = json.dumps(json.dumps({"applicant_id": "test_user_123"})).encode()
+
+    assert decode(legacy) == {"applicant_id": "test_user_123"}
+
+
+def test_rejects_newer_schema_version():
+    payload = bytearray(get_codec("msgpack").encode({"a": 1}))
+    payload[2] += 1
+
+    with pytest.raises(ValueError):
+        decode(bytes(payload))
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        get_codec("xml")
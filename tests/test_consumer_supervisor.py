@@ -0,0 +1,57 @@
+import signal
+from unittest.mock import MagicMock
+
+from scripts import consumer_supervisor
+from scripts.consumer_supervisor import STABLE_AFTER_SECONDS, Supervisor, restart_backoff
+
+
+def test_backoff_doubles_up_to_the_cap():
+    failures = 0
+    backoffs = []
+    for _ in range(7):
+        backoff, failures = restart_backoff(failures, uptime=1)
+        backoffs.append(backoff)
+
+    assert backoffs == [1, 2, 4, 8, 16, 30, 30]
+    assert failures == 7
+
+
+def test_backoff_resets_after_a_stable_run():
+    assert restart_backoff(5, uptime=STABLE_AFTER_SECONDS) == (1, 1)
+    assert restart_backoff(5, uptime=STABLE_AFTER_SECONDS - 1) == (30, 6)
+
+
+def _supervisor(alive):
+    supervisor = Supervisor(workers=len(alive))
+    for index, (worker, is_alive) in enumerate(zip(supervisor.workers, alive)):
+        worker.process = MagicMock(pid=100 + index)
+        worker.process.is_alive.return_value = is_alive
+        # Workers exit once joined
+        worker.process.join.side_effect = lambda timeout=None, process=worker.process: setattr(
+            process.is_alive, "return_value", False
+        )
+    return supervisor
+
+
+def test_shutdown_forwards_sigterm_to_running_workers(mocker):
+    kill = mocker.patch.object(consumer_supervisor.os, "kill")
+    supervisor = _supervisor([True, False, True])
+
+    supervisor._request_stop(signal.SIGTERM, None)
+    assert supervisor.stopping
+    supervisor._shutdown()
+
+    assert kill.call_args_list == [mocker.call(100, signal.SIGTERM), mocker.call(102, signal.SIGTERM)]
+    for worker in supervisor.workers:
+        worker.process.join.assert_called()
+        worker.process.kill.assert_not_called()
+
+
+def test_second_signal_kills_running_workers():
+    supervisor = _supervisor([True, False])
+
+    supervisor._request_stop(signal.SIGINT, None)
+    supervisor._request_stop(signal.SIGINT, None)
+
+    supervisor.workers[0].process.kill.assert_called_once()
+    supervisor.workers[1].process.kill.assert_not_called()
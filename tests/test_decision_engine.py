@@ -0,0 +1,152 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from unittest.mock import MagicMock
+
+from app.core.config import settings
+from app.domain.models import ApplicationStatus, LoanApplicationInDB
+from app.usecases.application_handlers import LoanApplicationService
+from app.usecases.decision_engine import DecisionEngine
+
+RULE_TABLE = {
+    "rules": [
+        {"code": "AMOUNT_ABOVE_LIMIT", "action": "reject", "when": {"amount": {"gt": 50000}}},
+        {"code": "SHORT_TERM_AMOUNT", "action": "reject",
+         "when": {"term_months": {"lte": 6}, "amount": {"gt": 10000}}},
+        {"code": "EXPOSURE_LIMIT", "action": "reject", "when": {"exposure": {"gt": 60000}}},
+        {"code": "LARGE_AMOUNT", "action": "flag", "when": {"amount": {"gte": 40000}}},
+    ],
+    "rates": [
+        {"when": {"term_months": {"lte": 12}}, "rate": 0.09},
+        {"when": {}, "rate": 0.12},
+    ],
+}
+
+
+@pytest.fixture
+def engine():
+    return DecisionEngine(RULE_TABLE)
+
+
+def test_default_rules_match_the_original_thresholds():
+    engine = DecisionEngine.load()
+
+    assert engine.evaluate_one(5000, 12).status == ApplicationStatus.APPROVED
+    assert engine.evaluate_one(50000, 12).status == ApplicationStatus.APPROVED
+    assert engine.evaluate_one(50001, 12).reason_codes == ["AMOUNT_ABOVE_LIMIT"]
+
+
+def test_scalar_path_reports_reasons_and_rate(engine):
+    decision = engine.evaluate_one(12000, 6)
+    assert decision.status == ApplicationStatus.REJECTED
+    assert decision.reason_codes == ["SHORT_TERM_AMOUNT"]
+    assert decision.interest_rate == 0.09
+
+    # Flags do not reject
+    decision = engine.evaluate_one(45000, 24)
+    assert decision.status == ApplicationStatus.APPROVED
+    assert decision.reason_codes == ["LARGE_AMOUNT"]
+    assert decision.interest_rate == 0.12
+
+
+def test_batch_path_matches_scalar_path(engine):
+    rng = np.random.default_rng(0)
+    amounts = rng.uniform(1, 60000, size=500)
+    terms = rng.integers(1, 61, size=500)
+
+    decisions = engine.evaluate_batch(amounts, terms)
+
+    for index in range(500):
+        assert decisions[index] == engine.evaluate_one(float(amounts[index]), int(terms[index]))
+
+
+def test_exposure_accumulates_per_applicant_in_batch_order(engine):
+    decisions = engine.evaluate_batch(
+        amounts=[30000, 1000, 25000, 10000],
+        term_months=[24, 24, 24, 24],
+        applicant_ids=["a", "b", "a", "a"],
+    )
+
+    # "a" reaches 55000 with its second application and 65000 with its third
+    assert [decisions[i].status for i in range(4)] == [
+        ApplicationStatus.APPROVED,
+        ApplicationStatus.APPROVED,
+        ApplicationStatus.APPROVED,
+        ApplicationStatus.REJECTED,
+    ]
+    assert decisions[3].reason_codes == ["EXPOSURE_LIMIT"]
+
+
+def test_only_approved_amounts_add_to_exposure(engine):
+    decisions = engine.evaluate_batch(
+        amounts=[12000, 50000, 5000, 20000],
+        term_months=[6, 24, 24, 24],
+        applicant_ids=["a", "a", "a", "a"],
+        prior_exposure=[10000, 10000, 10000, 10000],
+    )
+
+    # The first is rejected on its term, so it doesn't count towards the limit
+    assert [decisions[i].status for i in range(4)] == [
+        ApplicationStatus.REJECTED,
+        ApplicationStatus.APPROVED,
+        ApplicationStatus.REJECTED,
+        ApplicationStatus.REJECTED,
+    ]
+    assert decisions[2].reason_codes == ["EXPOSURE_LIMIT"]
+    assert decisions[1] == engine.evaluate_one(50000, 24, exposure=10000)
+
+
+def test_batch_exposure_matches_deciding_one_at_a_time(engine):
+    rng = np.random.default_rng(1)
+    amounts = rng.uniform(1, 40000, size=300).tolist()
+    terms = rng.integers(1, 61, size=300).tolist()
+    applicant_ids = [f"user{n}" for n in rng.integers(0, 40, size=300)]
+
+    decisions = engine.evaluate_batch(amounts, terms, applicant_ids)
+
+    approved: dict = {}
+    for index, (amount, term, applicant_id) in enumerate(zip(amounts, terms, applicant_ids)):
+        expected = engine.evaluate_one(amount, term, approved.get(applicant_id, 0.0))
+        assert decisions[index] == expected
+        if expected.status == ApplicationStatus.APPROVED:
+            approved[applicant_id] = approved.get(applicant_id, 0.0) + amount
+
+
+@pytest.mark.asyncio
+async def test_both_paths_count_exposure_approved_before(engine, mocker, mock_redis, mock_repository):
+    mocker.patch("app.usecases.application_handlers.decision_engine", engine)
+    recent = LoanApplicationInDB(applicant_id="a", amount=15000, term_months=12, status=ApplicationStatus.APPROVED)
+    # Outside the exposure window, so it no longer counts
+    expired = LoanApplicationInDB(
+        applicant_id="a", amount=50000, term_months=12, status=ApplicationStatus.APPROVED,
+        created_at=datetime.utcnow() - timedelta(days=settings.DECISION_EXPOSURE_WINDOW_DAYS + 1)
+    )
+    buffer = MagicMock()
+    buffer.buffered = lambda: [recent, expired]
+    mocker.patch("app.usecases.application_handlers.write_behind_buffer", buffer)
+    mock_redis.get_many.return_value = [None]
+    mock_repository.approved_exposure_many.return_value = {"a": 30000.0}
+    application = LoanApplicationInDB(applicant_id="a", amount=20000, term_months=24).dict()
+
+    await LoanApplicationService.process_application(application)
+    await LoanApplicationService.process_applications([application])
+
+    scalar, batch = [call.args[0] for call in buffer.add.call_args_list]
+    # 30000 in the database, 15000 awaiting its flush and 20000 requested
+    assert scalar.status == batch.status == ApplicationStatus.REJECTED
+    assert batch.reason_codes == ["EXPOSURE_LIMIT"]
+    applicant_ids, since, exclude_ids = mock_repository.approved_exposure_many.call_args.args
+    assert applicant_ids == ["a"] and exclude_ids == [recent.id]
+    assert datetime.now(timezone.utc) - since >= timedelta(days=settings.DECISION_EXPOSURE_WINDOW_DAYS)
+
+
+def test_empty_batch(engine):
+    assert len(engine.evaluate_batch([], [])) == 0
+
+
+def test_invalid_rule_table_is_rejected():
+    with pytest.raises(ValueError):
+        DecisionEngine({"rules": [{"code": "X", "action": "reject", "when": {"income": {"gt": 1}}}]})
+    with pytest.raises(ValueError):
+        DecisionEngine({"rules": [{"code": "X", "action": "approve", "when": {}}]})
@@ -0,0 +1,75 @@
+import pytest
+from unittest.mock import AsyncMock
+
+from app.domain.models import LoanApplicationInDB
+from app.infrastructure.database.write_behind import WriteBehindBuffer
+from app.usecases import application_handlers
+from app.usecases.application_handlers import LoanApplicationService
+
+
+@pytest.fixture
+def store(mocker):
+    repository = AsyncMock()
+    buffer = WriteBehindBuffer(repository)
+    buffer.flush_callbacks.append(application_handlers._mark_decided)
+    mocker.patch("app.usecases.application_handlers.write_behind_buffer", buffer)
+    application_handlers._recent_ids.clear()
+    return buffer
+
+
+def _application(**overrides):
+    return LoanApplicationInDB(applicant_id="test_user_123", amount=5000, term_months=12, **overrides).dict()
+
+
+def _upserted_ids(repository):
+    return [application.id for call in repository.upsert_many.call_args_list for application in call.args[0]]
+
+
+@pytest.mark.asyncio
+async def test_redelivered_applications_are_not_decided_again(store, mock_redis):
+    decided_before = _application()
+    new = _application()
+    mock_redis.get_many.return_value = [{"decided": True}, None]
+
+    results = await LoanApplicationService.process_applications([decided_before, new, new])
+    await store.flush()
+
+    assert results == [None, None, None]
+    # Only the new application is decided, once
+    assert _upserted_ids(store.repository) == [new["id"]]
+    mock_redis.get_many.assert_called_once_with(
+        [f"app_decided:{decided_before['id']}", f"app_decided:{new['id']}"]
+    )
+    mock_redis.set_many.assert_called_once_with({f"app_decided:{new['id']}": {"decided": True}}, expire=3600)
+
+    # Both are now remembered, so a further redelivery needs no Redis lookup
+    mock_redis.get_many.reset_mock()
+    store.repository.upsert_many.reset_mock()
+    await LoanApplicationService.process_applications([decided_before, new])
+    await store.flush()
+
+    store.repository.upsert_many.assert_not_called()
+    mock_redis.get_many.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_decision_lost_before_its_flush_is_made_again(store, mock_redis):
+    application = _application()
+    mock_redis.get_many.return_value = [None]
+    store.repository.upsert_many.side_effect = [ConnectionError("database down"), None]
+
+    await LoanApplicationService.process_applications([application])
+    with pytest.raises(ConnectionError):
+        await store.flush()
+    # The consumer dies before the next flush, losing its buffer and memory
+    store._pending.clear()
+    application_handlers._recent_ids.clear()
+    mock_redis.set_many.assert_not_called()
+
+    # Kafka redelivers the uncommitted record
+    results = await LoanApplicationService.process_applications([application])
+    await store.flush()
+
+    assert results == [None]
+    assert _upserted_ids(store.repository) == [application["id"], application["id"]]
+    mock_redis.set_many.assert_called_once_with({f"app_decided:{application['id']}": {"decided": True}}, expire=3600)
@@ -0,0 +1,179 @@
+import asyncio
+
+import pytest
+from aiokafka import ConsumerRecord, TopicPartition
+
+from app.core.config import settings
+from app.infrastructure.messaging.kafka_client import KafkaClient
+
+TOPIC = "loan_applications"
+
+
+class FakeConsumer:
+    """Serves fixed partition logs from seekable positions and records commits"""
+
+    def __init__(self, logs, events, stop, max_records=3):
+        self.logs = {
+            TopicPartition(TOPIC, partition): [
+                ConsumerRecord(
+                    topic=TOPIC, partition=partition, offset=offset, timestamp=0, timestamp_type=0,
+                    key=None, value=value, checksum=None,
+                    serialized_key_size=0, serialized_value_size=0, headers=[]
+                )
+                for offset, value in enumerate(values)
+            ]
+            for partition, values in logs.items()
+        }
+        self.positions = {tp: 0 for tp in self.logs}
+        self.events = events
+        self.stop_event = stop
+        self.max_records = max_records
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def getmany(self, timeout_ms, max_records=None):
+        batch = {}
+        budget = self.max_records if max_records is None else min(max_records, self.max_records)
+        for tp, log in self.logs.items():
+            msgs = log[self.positions[tp]:self.positions[tp] + budget]
+            if msgs:
+                batch[tp] = msgs
+                self.positions[tp] += len(msgs)
+                budget -= len(msgs)
+        if not batch:
+            self.stop_event.set()
+        return batch
+
+    def seek(self, tp, offset):
+        self.positions[tp] = offset
+
+    async def commit(self, offsets):
+        self.events.append(("commit", {tp.partition: offset for tp, offset in offsets.items()}))
+
+    def highwater(self, tp):
+        return len(self.logs[tp])
+
+
+def _client(logs):
+    """A KafkaClient reading from fake partition logs, with the events they record"""
+    events = []
+    stop = asyncio.Event()
+    client = KafkaClient()
+    consumer = FakeConsumer(logs, events, stop)
+    client._create_consumer = lambda topic, group_id: consumer
+    return client, events, stop
+
+
+@pytest.fixture(autouse=True)
+def fast_settings(monkeypatch):
+    monkeypatch.setattr(settings, "KAFKA_RETRY_ENABLED", False)
+    monkeypatch.setattr(settings, "KAFKA_CONSUMER_LINGER_MS", 0)
+    monkeypatch.setattr(settings, "KAFKA_CONSUMER_RETRY_BACKOFF_MS", 0)
+
+
+@pytest.fixture
+def consume():
+    async def run(logs, process_batch, commit_gate=None):
+        client, events, stop = _client(logs)
+
+        async def process(values):
+            events.append(("process", values))
+            return await process_batch(values)
+
+        await asyncio.wait_for(
+            client.consume_batches(TOPIC, "group", process, commit_gate=commit_gate, stop=stop),
+            timeout=5
+        )
+        return events
+
+    return run
+
+
+@pytest.fixture
+def consume_messages():
+    async def run(logs, process_message, commit_gate=None):
+        client, events, stop = _client(logs)
+
+        async def process(value):
+            events.append(("process", value))
+            await process_message(value)
+
+        await asyncio.wait_for(
+            client.consume_messages(TOPIC, "group", process, commit_gate=commit_gate, stop=stop),
+            timeout=5
+        )
+        return events
+
+    return run
+
+
+@pytest.mark.asyncio
+async def test_partitions_keep_their_order_and_commit_after_processing(consume):
+    async def succeed(values):
+        return [None] * len(values)
+
+    events = await consume({0: ["a0", "a1", "a2", "a3"], 1: ["b0", "b1"]}, succeed)
+
+    processed = [value for kind, values in events if kind == "process" for value in values]
+    assert [value for value in processed if value[0] == "a"] == ["a0", "a1", "a2", "a3"]
+    assert [value for value in processed if value[0] == "b"] == ["b0", "b1"]
+    # Every commit follows the batch it covers, and the last covers everything
+    assert [kind for kind, _ in events] == ["process", "commit", "process", "commit"]
+    assert events[1][1] == {0: 3}
+    assert events[-1][1] == {0: 4, 1: 2}
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_not_committed_and_is_read_again(consume):
+    attempts = []
+
+    async def fail_once(values):
+        attempts.append(values)
+        if len(attempts) == 1:
+            raise ConnectionError("redis down")
+        return [None] * len(values)
+
+    events = await consume({0: ["a0", "a1"]}, fail_once)
+
+    assert attempts == [["a0", "a1"], ["a0", "a1"]]
+    assert [event for event in events if event[0] == "commit"] == [("commit", {0: 2})]
+
+
+@pytest.mark.asyncio
+async def test_offsets_wait_for_the_commit_gate(consume):
+    gate = iter([False, True])
+
+    async def succeed(values):
+        return [None] * len(values)
+
+    async def commit_gate(force):
+        return force or next(gate, True)
+
+    events = await consume({0: ["a0", "a1", "a2", "a3", "a4"]}, succeed, commit_gate)
+
+    assert [kind for kind, _ in events] == ["process", "process", "commit"]
+    # The held back batch is committed along with the next one
+    assert events[2][1] == {0: 5}
+
+
+@pytest.mark.asyncio
+async def test_legacy_mode_commits_only_through_the_commit_gate(consume_messages):
+    gate_calls = []
+
+    async def succeed(value):
+        pass
+
+    async def commit_gate(force):
+        gate_calls.append(force)
+        return force
+
+    events = await consume_messages({0: ["a0", "a1", "a2", "a3"]}, succeed, commit_gate)
+
+    # Nothing is committed until the buffer is flushed, here on shutdown
+    assert [kind for kind, _ in events] == ["process"] * 4 + ["commit"]
+    assert events[-1][1] == {0: 4}
+    assert gate_calls[-1] is True and not any(gate_calls[:-1])
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+from unittest.mock import AsyncMock, MagicMock
+
+from app.infrastructure.messaging.kafka_client import KafkaClient
+
+TOPIC = "loan_applications"
+
+
+def _pending() -> float:
+    return REGISTRY.get_sample_value("kafka_producer_pending_deliveries")
+
+
+def _failures() -> float:
+    return REGISTRY.get_sample_value("kafka_producer_delivery_failures_total", {"topic": TOPIC}) or 0.0
+
+
+@pytest.fixture
+def client():
+    client = KafkaClient()
+    client.producer = MagicMock()
+    client.producer.send_and_wait = AsyncMock()
+    client.producer.send = AsyncMock()
+    return client
+
+
+def test_submissions_are_keyed_by_applicant(test_app, mock_kafka, mock_redis):
+    test_app.post("/api/v1/applications/", json={"applicant_id": "user1", "amount": 5000, "term_months": 12})
+
+    call = mock_kafka.send_message.call_args
+    assert call.kwargs["topic"] == TOPIC
+    assert call.kwargs["key"] == b"user1"
+    assert call.kwargs["value"]["applicant_id"] == "user1"
+
+
+@pytest.mark.asyncio
+async def test_waiting_send_returns_once_acknowledged(client):
+    assert await client.send_message(TOPIC, {"applicant_id": "user1"}, key=b"user1", wait=True) is None
+
+    client.producer.send_and_wait.assert_called_once_with(
+        topic=TOPIC, value={"applicant_id": "user1"}, key=b"user1", headers=None
+    )
+    client.producer.send.assert_not_called()
+    assert client.pending_deliveries == 0
+
+
+@pytest.mark.asyncio
+async def test_buffered_send_returns_the_delivery_future(client):
+    delivery = asyncio.get_running_loop().create_future()
+    client.producer.send.return_value = delivery
+    before = _pending()
+
+    future = await client.send_message(TOPIC, {"applicant_id": "user1"}, key=b"user1", wait=False)
+
+    assert future is delivery
+    assert client.producer.send.call_args.kwargs["key"] == b"user1"
+    assert client.pending_deliveries == 1 and _pending() == before + 1
+
+    delivery.set_result(None)
+    await asyncio.sleep(0)
+    assert client.pending_deliveries == 0 and _pending() == before
+    assert client.delivery_failures == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_delivery_is_counted_and_reported(client):
+    delivery = asyncio.get_running_loop().create_future()
+    client.producer.send.return_value = delivery
+    reported = []
+    client.delivery_error_callbacks.append(lambda topic, error: reported.append((topic, error)))
+    # A failing callback doesn't keep the others from running
+    client.delivery_error_callbacks.insert(0, MagicMock(side_effect=RuntimeError("callback failed")))
+    pending_before, failures_before = _pending(), _failures()
+
+    await client.send_message(TOPIC, {"applicant_id": "user1"}, key=b"user1", wait=False)
+    error = ConnectionError("broker down")
+    delivery.set_exception(error)
+    await asyncio.sleep(0)
+
+    assert client.pending_deliveries == 0 and _pending() == pending_before
+    assert client.delivery_failures == 1 and _failures() == failures_before + 1
+    assert reported == [(TOPIC, error)]
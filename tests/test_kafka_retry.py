@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+import pytest
+from aiokafka import ConsumerRecord
+from unittest.mock import AsyncMock
+
+from app.core.config import settings
+from app.infrastructure.messaging.kafka_client import (
+    ERROR_HEADER,
+    ORIGINAL_OFFSET_HEADER,
+    RETRY_ATTEMPT_HEADER,
+    RETRY_NOT_BEFORE_HEADER,
+    KafkaClient
+)
+
+
+def _record(topic="loan_applications", offset=7, headers=()):
+    return ConsumerRecord(
+        topic=topic, partition=2, offset=offset, timestamp=0, timestamp_type=0,
+        key=b"user1", value={"applicant_id": "user1"}, checksum=None,
+        serialized_key_size=5, serialized_value_size=10, headers=list(headers)
+    )
+
+
+def _headers(call):
+    return {name: value.decode() for name, value in call.kwargs["headers"]}
+
+
+@pytest.mark.asyncio
+async def test_failed_record_goes_to_first_retry_topic():
+    client = KafkaClient()
+    client.send_message = AsyncMock()
+    
+    before = int(time.time() * 1000)
+    await client._route_failures("loan_applications", [(_record(), ValueError("boom"))])
+    
+    call = client.send_message.call_args
+    assert call.args[0] == "loan_applications.retry.1"
+    assert call.kwargs["key"] == b"user1"
+    headers = _headers(call)
+    assert headers[RETRY_ATTEMPT_HEADER] == "1"
+    assert headers[ORIGINAL_OFFSET_HEADER] == "7"
+    assert headers[ERROR_HEADER] == "ValueError: boom"
+    assert int(headers[RETRY_NOT_BEFORE_HEADER]) >= before + settings.KAFKA_RETRY_DELAYS_MS[0]
+
+
+@pytest.mark.asyncio
+async def test_record_out_of_retries_goes_to_dead_letter_topic():
+    client = KafkaClient()
+    client.send_message = AsyncMock()
+    attempts = len(settings.KAFKA_RETRY_DELAYS_MS)
+    retried = _record(
+        topic=f"loan_applications.retry.{attempts}",
+        offset=1,
+        headers=[(RETRY_ATTEMPT_HEADER, str(attempts).encode()), (ORIGINAL_OFFSET_HEADER, b"7")]
+    )
+    
+    await client._route_failures("loan_applications", [(retried, RuntimeError("still failing"))])
+    
+    call = client.send_message.call_args
+    assert call.args[0] == "loan_applications.dlq"
+    headers = _headers(call)
+    assert headers[RETRY_ATTEMPT_HEADER] == str(attempts + 1)
+    # The original position is kept across retries
+    assert headers[ORIGINAL_OFFSET_HEADER] == "7"
+    assert RETRY_NOT_BEFORE_HEADER not in headers
+
+
+@pytest.mark.asyncio
+async def test_retry_waits_until_due_unless_stopped():
+    client = KafkaClient()
+    due = str(int(time.time() * 1000) + 60000).encode()
+    stop = asyncio.Event()
+    stop.set()
+    
+    assert await client._wait_until_due([_record(headers=[(RETRY_NOT_BEFORE_HEADER, due)])], stop) is False
+    assert await client._wait_until_due([_record()], None) is True
@@ -0,0 +1,77 @@
+import time
+
+from app.infrastructure.cache.local_cache import LocalCache, MISSING, RecentSet
+
+
+def test_get_returns_cached_value_and_counts_hits():
+    cache = LocalCache(max_entries=10, max_bytes=1000, ttl=60)
+    cache.set("a", {"status": "approved"}, size=10)
+
+    assert cache.get("a") == {"status": "approved"}
+    assert cache.get("b") is MISSING
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = LocalCache(max_entries=2, max_bytes=1000, ttl=60)
+    cache.set("a", 1, size=1)
+    cache.set("b", 2, size=1)
+
+    # Touch "a" so "b" becomes the least recently used
+    cache.get("a")
+    cache.set("c", 3, size=1)
+
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_cap_is_enforced():
+    cache = LocalCache(max_entries=100, max_bytes=10, ttl=60)
+    cache.set("a", "x", size=6)
+    cache.set("b", "y", size=6)
+
+    assert cache.get("a") is MISSING
+    assert cache.stats()["bytes"] == 6
+
+    # A value larger than the whole cache is never stored
+    cache.set("huge", "z", size=11)
+    assert cache.get("huge") is MISSING
+
+
+def test_entries_expire_after_the_shorter_ttl():
+    cache = LocalCache(max_entries=10, max_bytes=1000, ttl=60)
+    cache.set("a", 1, size=1, ttl=0.01)
+    time.sleep(0.02)
+
+    assert cache.get("a") is MISSING
+    assert cache.stats()["expirations"] == 1
+
+
+def test_delete_invalidates_entry():
+    cache = LocalCache(max_entries=10, max_bytes=1000, ttl=60)
+    cache.set("a", 1, size=1)
+    cache.delete("a")
+
+    assert cache.get("a") is MISSING
+    assert cache.stats()["invalidations"] == 1
+    assert len(cache) == 0
+
+
+def test_recent_set_keeps_the_latest_keys_until_they_expire():
+    recent = RecentSet(max_entries=2, ttl=60)
+    recent.add_many(["a", "b"])
+    recent.add_many(["a"])
+    recent.add_many(["c"])
+
+    # "a" was added again, so "b" is the oldest
+    assert "b" not in recent
+    assert "a" in recent and "c" in recent
+    assert len(recent) == 2
+
+    recent.ttl = 0.01
+    recent.add_many(["d"])
+    time.sleep(0.02)
+    assert "d" not in recent
@@ -0,0 +1,89 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import status
+from prometheus_client import REGISTRY
+
+from app.core.metrics import LOCAL_CACHES, MetricsMiddleware
+from app.infrastructure.cache.local_cache import LocalCache
+
+STATUS_ROUTE_LABELS = {
+    "method": "GET",
+    "route": "/api/v1/applications/{applicant_id}",
+    "status": "404",
+}
+
+def _status_request_count() -> float:
+    return REGISTRY.get_sample_value("http_request_duration_seconds_count", STATUS_ROUTE_LABELS) or 0.0
+
+@pytest.mark.asyncio
+async def test_metrics_label_requests_by_route_template(test_app, mock_redis):
+    mock_redis.get.return_value = None
+    before = _status_request_count()
+    
+    test_app.get("/api/v1/applications/metrics_user_1")
+    test_app.get("/api/v1/applications/metrics_user_2")
+    
+    assert _status_request_count() == before + 2
+    response = test_app.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "metrics_user_1" not in response.text
+
+@pytest.mark.asyncio
+async def test_metrics_expose_service_metrics(test_app):
+    text = test_app.get("/metrics").text
+    for name in (
+        "kafka_producer_pending_deliveries",
+        "cache_requests_total",
+        "db_pool_checkout_wait_seconds",
+        "decision_evaluation_duration_seconds",
+    ):
+        assert name in text
+
+@pytest.mark.asyncio
+async def test_streamed_responses_are_timed_to_their_start():
+    async def app(scope, receive, send):
+        await asyncio.sleep(0.05)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        if scope["path"] == "/stream":
+            await send({"type": "http.response.body", "body": b"a", "more_body": True})
+        # A slow client for the stream, a slow body for the other
+        await asyncio.sleep(0.2)
+        await send({"type": "http.response.body", "body": b"b"})
+
+    async def sent(message):
+        pass
+
+    def duration(path):
+        labels = {"method": "GET", "route": f"/test{path}", "status": "200"}
+        return REGISTRY.get_sample_value("http_request_duration_seconds_sum", labels) or 0.0
+
+    middleware = MetricsMiddleware(app)
+    observed = {}
+    for path in ("/stream", "/whole"):
+        before = duration(path)
+        scope = {"type": "http", "method": "GET", "path": path, "route": SimpleNamespace(path_format=f"/test{path}")}
+        await middleware(scope, None, sent)
+        observed[path] = duration(path) - before
+
+    assert 0.05 <= observed["/stream"] < 0.2
+    assert observed["/whole"] >= 0.25
+
+def test_local_cache_counters_are_exported():
+    cache = LocalCache(max_entries=1, max_bytes=100, ttl=60)
+    LOCAL_CACHES.track("test", cache)
+    cache.set("a", 1, size=10)
+    cache.set("b", 2, size=10)
+    cache.get("a")
+    cache.get("b")
+
+    def sample(name, **labels):
+        return REGISTRY.get_sample_value(name, {"cache": "test", **labels})
+
+    assert sample("local_cache_events_total", event="hits") == 1
+    assert sample("local_cache_events_total", event="misses") == 1
+    assert sample("local_cache_events_total", event="evictions") == 1
+    assert sample("local_cache_entries") == 1
+    assert sample("local_cache_bytes") == 10
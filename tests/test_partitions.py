@@ -0,0 +1,33 @@
+from datetime import date
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from app.infrastructure.database.models import LoanApplicationDB
+from app.infrastructure.database.partitions import add_months, partition_month, partition_name
+
+
+def test_months_roll_over_years():
+    assert add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+    assert add_months(date(2024, 1, 1), -24) == date(2022, 1, 1)
+
+
+def test_partition_names_round_trip():
+    assert partition_name(date(2024, 3, 1)) == "loan_applications_p2024_03"
+    assert partition_month("loan_applications_p2024_03") == date(2024, 3, 1)
+    assert partition_month("loan_applications_default") is None
+
+
+def test_table_is_range_partitioned_by_created_at():
+    table = LoanApplicationDB.__table__
+    ddl = str(CreateTable(table).compile(dialect=postgresql.dialect()))
+
+    assert "PARTITION BY RANGE (created_at)" in ddl
+    # Unique constraints on a partitioned table must include the partition key
+    assert "PRIMARY KEY (id, created_at)" in ddl
+    brin = [
+        str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+        for index in table.indexes if index.dialect_options["postgresql"]["using"] == "brin"
+    ]
+    assert len(brin) == 2
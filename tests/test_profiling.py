@@ -0,0 +1,79 @@
+import os
+import pstats
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.profiling import BatchProfiler, ProfilingMiddleware
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILING_OUTPUT_DIR", str(tmp_path))
+    return tmp_path
+
+def _client(monkeypatch, token=None, sample_rate=0.0) -> TestClient:
+    monkeypatch.setattr(settings, "PROFILING_TOKEN", token)
+    monkeypatch.setattr(settings, "PROFILING_SAMPLE_RATE", sample_rate)
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware)
+    
+    @app.get("/ping")
+    async def ping():
+        return {"pong": True}
+    
+    return TestClient(app)
+
+def test_request_with_header_is_profiled(profile_dir, monkeypatch):
+    client = _client(monkeypatch)
+    
+    response = client.get("/ping", headers={"X-Profile": "1"})
+    
+    assert response.status_code == 200
+    name = response.headers["X-Profile-Id"]
+    assert os.listdir(profile_dir) == [name]
+    pstats.Stats(str(profile_dir / name))
+
+def test_requests_are_not_profiled_by_default(profile_dir, monkeypatch):
+    client = _client(monkeypatch, token="secret")
+    
+    assert "X-Profile-Id" not in client.get("/ping").headers
+    assert "X-Profile-Id" not in client.get("/ping", headers={"X-Profile": "wrong"}).headers
+    assert os.listdir(profile_dir) == []
+    
+    assert "X-Profile-Id" in client.get("/ping", headers={"X-Profile": "secret"}).headers
+
+def test_sampled_requests_are_profiled(profile_dir, monkeypatch):
+    client = _client(monkeypatch, sample_rate=1.0)
+    
+    assert "X-Profile-Id" in client.get("/ping").headers
+
+def test_batch_profiler_writes_one_profile_for_n_batches(profile_dir):
+    profiler = BatchProfiler()
+    with profiler.batch():
+        pass
+    assert os.listdir(profile_dir) == []
+    
+    profiler.profile_batches(2)
+    with profiler.batch():
+        sum(range(1000))
+    assert os.listdir(profile_dir) == []
+    with profiler.batch():
+        sum(range(1000))
+    with profiler.batch():
+        pass
+    
+    assert len(os.listdir(profile_dir)) == 1
+
+def test_batch_profiler_time_window(profile_dir, monkeypatch):
+    profiler = BatchProfiler()
+    profiler.profile_for(60)
+    with profiler.batch():
+        pass
+    with profiler.batch():
+        pass
+    assert os.listdir(profile_dir) == []
+    
+    profiler.finish()
+    assert len(os.listdir(profile_dir)) == 1
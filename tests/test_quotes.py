@@ -0,0 +1,71 @@
+import json
+
+import pytest
+from fastapi import status
+
+from app.usecases.quotes import QuoteEngine
+
+
+def _rows(engine, *args, **kwargs):
+    return [row for chunk in engine.schedule(*args, **kwargs) for row in chunk]
+
+
+@pytest.mark.parametrize("amount, term_months, annual_rate", [
+    (100000, 12, 0.12),
+    (350000, 360, 0.065),
+    (1000, 12, 0.0),
+    (12.5, 480, 0.0),
+])
+def test_schedule_adds_up_to_the_quote(amount, term_months, annual_rate):
+    engine = QuoteEngine(max_entries=10)
+    quote = engine.quote_many([(amount, term_months, annual_rate)])[0]
+    rows = _rows(engine, amount, term_months, annual_rate, chunk_months=50)
+
+    assert [row["month"] for row in rows] == list(range(1, term_months + 1))
+    assert all(row["payment"] == quote["monthly_payment"] for row in rows[:-1])
+    assert rows[-1]["payment"] == quote["final_payment"]
+    assert rows[-1]["balance"] == 0
+    assert min(row["balance"] for row in rows) >= 0
+    assert round(sum(row["principal"] for row in rows), 2) == amount
+    assert round(sum(row["payment"] for row in rows), 2) == quote["total_payment"]
+    assert round(sum(row["interest"] for row in rows), 2) == quote["total_interest"]
+
+
+def test_quotes_are_computed_once_and_cached():
+    engine = QuoteEngine(max_entries=10)
+    first = engine.quote_many([(100000, 12, 0.12), (1000, 12, 0.0), (100000.001, 12, 0.12)])
+
+    assert first[0]["monthly_payment"] == 8884.88
+    assert first[0]["total_interest"] == 6618.55
+    assert first[1]["monthly_payment"] == 83.33
+    assert first[1]["total_interest"] == 0
+    # Inputs are rounded to the cent, so these are the same loan
+    assert first[2] is first[0]
+    assert len(engine.cache) == 2
+
+    assert engine.quote_many([(1000, 12, 0.0)])[0] is first[1]
+    with pytest.raises(ValueError):
+        engine.quote_many([(1000, 10000, 0.1)])
+
+
+def test_quote_endpoints(test_app, mock_redis):
+    response = test_app.post("/api/v1/quotes/", json={"quotes": [
+        {"amount": 100000, "term_months": 12, "annual_rate": 0.12},
+        {"amount": 5000, "term_months": 36},
+    ]})
+
+    assert response.status_code == status.HTTP_200_OK
+    quotes = response.json()["quotes"]
+    assert quotes[0]["monthly_payment"] == 8884.88
+    # Without a rate, the decision engine's rate band applies
+    assert quotes[1]["annual_rate"] > 0
+
+    response = test_app.get("/api/v1/quotes/schedule?amount=100000&term_months=12&annual_rate=0.12")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == 12
+    assert rows[0] == {"month": 1, "payment": 8884.88, "principal": 7884.88, "interest": 1000.0, "balance": 92115.12}
+
+    response = test_app.get("/api/v1/quotes/schedule?amount=100000&term_months=100000")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
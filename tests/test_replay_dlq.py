@@ -0,0 +1,132 @@
+import argparse
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aiokafka import TopicPartition
+from aiokafka.structs import ConsumerRecord
+
+from app.infrastructure.messaging.kafka_client import ERROR_HEADER, dead_letter_topic
+from scripts import replay_dlq
+
+TOPIC = "loan_applications"
+SOURCE = dead_letter_topic(TOPIC)
+
+
+class FakeConsumer:
+    """Serves fixed dead-letter partitions, each read up to its last record"""
+
+    def __init__(self, logs, end_offsets):
+        self.logs = {
+            TopicPartition(SOURCE, partition): [
+                ConsumerRecord(
+                    topic=SOURCE, partition=partition, offset=offset, timestamp=0, timestamp_type=0,
+                    key=key, value={"id": key.decode()}, checksum=None,
+                    serialized_key_size=0, serialized_value_size=0,
+                    headers=[(ERROR_HEADER, error.encode("utf-8"))]
+                )
+                for offset, key, error in records
+            ]
+            for partition, records in logs.items()
+        }
+        self.end = {TopicPartition(SOURCE, partition): offset for partition, offset in end_offsets.items()}
+        self.positions = {tp: 0 for tp in self.logs}
+        self.commits = []
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def topics(self):
+        return {SOURCE}
+
+    def partitions_for_topic(self, topic):
+        return {tp.partition for tp in self.logs}
+
+    def assign(self, partitions):
+        pass
+
+    async def end_offsets(self, partitions):
+        return {tp: self.end[tp] for tp in partitions}
+
+    async def position(self, tp):
+        return self.positions[tp]
+
+    async def getmany(self, *partitions, timeout_ms, max_records):
+        await asyncio.sleep(0)
+        batch = {}
+        for tp in partitions:
+            msgs = [msg for msg in self.logs[tp] if msg.offset >= self.positions[tp]][:max_records]
+            if msgs:
+                batch[tp] = msgs
+                self.positions[tp] = msgs[-1].offset + 1
+                max_records -= len(msgs)
+        return batch
+
+    async def commit(self, offsets):
+        self.commits.append(dict(offsets))
+
+
+@pytest.fixture
+def producer(mocker):
+    producer = MagicMock()
+    producer.start = AsyncMock()
+    producer.stop = AsyncMock()
+
+    async def send_message(topic, value, key=None, wait=True):
+        delivery = asyncio.get_running_loop().create_future()
+        delivery.set_result(None)
+        return delivery
+    producer.send_message = AsyncMock(side_effect=send_message)
+    mocker.patch.object(replay_dlq, "kafka_client", producer)
+    return producer
+
+
+def _args(**overrides):
+    args = dict(topic=TOPIC, group="replay", error_contains=None, limit=None, batch_size=2, dry_run=False)
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+
+def _replay(consumer, mocker, **overrides):
+    mocker.patch.object(replay_dlq, "AIOKafkaConsumer", return_value=consumer)
+    return asyncio.wait_for(replay_dlq.replay(_args(**overrides)), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_replay_stops_when_only_markers_remain(producer, mocker):
+    consumer = FakeConsumer(
+        {
+            0: [(0, b"a", "TimeoutError: slow"), (1, b"b", "TimeoutError: slow")],
+            1: [(0, b"c", "ValueError: bad"), (1, b"d", "TimeoutError: slow"), (2, b"e", "TimeoutError: slow")],
+        },
+        # Offset 2 of partition 0 is a transaction marker, never returned
+        end_offsets={0: 3, 1: 3},
+    )
+
+    counts = await _replay(consumer, mocker, error_contains="Timeout")
+
+    assert counts == {"replayed": 4, "skipped": 1}
+    assert sorted(call.kwargs["key"] for call in producer.send_message.call_args_list) == [b"a", b"b", b"d", b"e"]
+    assert all(call.args[0] == TOPIC for call in producer.send_message.call_args_list)
+    # Skipped records are committed too
+    committed = {}
+    for offsets in consumer.commits:
+        committed.update(offsets)
+    assert committed == {TopicPartition(SOURCE, 0): 2, TopicPartition(SOURCE, 1): 3}
+
+
+@pytest.mark.asyncio
+async def test_replay_reads_only_up_to_the_end_offsets_and_the_limit(producer, mocker):
+    # Offset 2 was dead-lettered after the replay started
+    consumer = FakeConsumer({0: [(0, b"a", "E"), (1, b"b", "E"), (2, b"c", "E")]}, end_offsets={0: 2})
+
+    assert await _replay(consumer, mocker) == {"replayed": 2, "skipped": 0}
+    assert consumer.commits[-1] == {TopicPartition(SOURCE, 0): 2}
+
+    consumer = FakeConsumer({0: [(0, b"a", "E"), (1, b"b", "E"), (2, b"c", "E")]}, end_offsets={0: 3})
+
+    assert await _replay(consumer, mocker, limit=1) == {"replayed": 1, "skipped": 0}
+    assert consumer.commits == [{TopicPartition(SOURCE, 0): 1}]
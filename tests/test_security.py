@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+import pytest
+from jose import JWTError
+from passlib.context import CryptContext
+
+from app.core import security
+
+@pytest.fixture
+def fast_hashing(monkeypatch):
+    monkeypatch.setattr(security, "pwd_context", CryptContext(schemes=["bcrypt"], bcrypt__rounds=4))
+
+@pytest.fixture
+def count_decodes(monkeypatch):
+    calls = []
+    decode = security.jwt.decode
+    
+    def counting_decode(*args, **kwargs):
+        calls.append(args[0])
+        return decode(*args, **kwargs)
+    
+    monkeypatch.setattr(security.jwt, "decode", counting_decode)
+    security._token_cache.clear()
+    return calls
+
+@pytest.mark.asyncio
+async def test_async_password_hashing_round_trip(fast_hashing):
+    hashed = await security.get_password_hash_async("s3cret")
+    
+    assert await security.verify_password_async("s3cret", hashed)
+    assert not await security.verify_password_async("wrong", hashed)
+
+def test_verified_tokens_are_cached(count_decodes):
+    token = security.create_access_token({"sub": "alice"}, expires_delta=timedelta(minutes=5))
+    
+    assert security.decode_access_token(token)["sub"] == "alice"
+    assert security.decode_access_token(token)["sub"] == "alice"
+    assert len(count_decodes) == 1
+
+def test_invalid_and_expired_tokens_are_not_cached(count_decodes):
+    expired = security.create_access_token({"sub": "alice"}, expires_delta=timedelta(seconds=-1))
+    for token in (expired, expired, "not-a-token"):
+        with pytest.raises(JWTError):
+            security.decode_access_token(token)
+    assert len(count_decodes) == 3
+    assert len(security._token_cache) == 0
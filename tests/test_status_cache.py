@@ -0,0 +1,241 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.core.config import settings
+from app.domain.models import ApplicationStatus, LoanApplicationInDB
+from app.infrastructure.cache.redis_client import RedisCache
+from app.infrastructure.cache.local_cache import MISSING
+from app.infrastructure.cache.status_events import applicant_channel, application_channel
+from app.infrastructure.database import repository
+from app.infrastructure.database.write_behind import WriteBehindBuffer
+from app.usecases.application_handlers import NOT_FOUND_MARKER, LoanApplicationService
+from app.usecases.decision_engine import Decision
+from benchmarks.fakes import FakeRedisCache
+
+APPROVED = Decision(ApplicationStatus.APPROVED, [], 0.05)
+
+
+@pytest.fixture
+def cache(mocker):
+    cache = FakeRedisCache()
+    mocker.patch("app.usecases.application_handlers.redis_cache", cache)
+    mocker.patch("app.usecases.application_handlers.write_behind_buffer", WriteBehindBuffer(AsyncMock()))
+    return cache
+
+
+def _application(created_at, applicant_id="test_user_123", **overrides):
+    return LoanApplicationInDB(
+        applicant_id=applicant_id, amount=5000, term_months=12, created_at=created_at, **overrides
+    )
+
+
+@pytest.mark.asyncio
+async def test_older_decision_does_not_replace_a_newer_status(cache, mocker, monkeypatch):
+    monkeypatch.setattr(settings, "STATUS_STREAM_ENABLED", True)
+    publish = mocker.spy(cache, "publish")
+    newer = _application(datetime(2024, 1, 2))
+    older = _application(datetime(2024, 1, 1))
+
+    await LoanApplicationService._store_decision(newer, APPROVED)
+    # E.g. the older application failed once and came back from a retry topic
+    await LoanApplicationService._store_decision(older, APPROVED)
+
+    status = await LoanApplicationService.get_application_status("test_user_123")
+    assert status["id"] == str(newer.id)
+    _, body = await LoanApplicationService.get_application_status_response("test_user_123")
+    assert json.loads(body)["id"] == str(newer.id)
+    # The older application is still cached and announced on its own
+    assert (await LoanApplicationService.get_application(older.id))["id"] == str(older.id)
+    assert publish.call_args_list[1].args[0] == [application_channel(older.id)]
+    assert applicant_channel("test_user_123") in publish.call_args_list[0].args[0]
+
+
+@pytest.mark.asyncio
+async def test_database_fill_does_not_replace_a_newer_decision(cache, mock_repository):
+    newer = _application(datetime(2024, 1, 2))
+    await LoanApplicationService._store_decision(newer, APPROVED)
+    await cache.delete(f"app_status:{newer.applicant_id}")
+    # A lagging replica still returns the previous application
+    mock_repository.get_latest.return_value = _application(datetime(2024, 1, 1), status=ApplicationStatus.APPROVED)
+
+    await LoanApplicationService.get_application_status("test_user_123")
+
+    assert (await cache.get("app_status:test_user_123")) is None
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_database_query(cache, mock_repository):
+    application = _application(datetime(2024, 1, 1), status=ApplicationStatus.APPROVED)
+
+    async def get_latest(applicant_id):
+        await asyncio.sleep(0.01)
+        return application
+    mock_repository.get_latest.side_effect = get_latest
+
+    statuses = await asyncio.gather(
+        *(LoanApplicationService.get_application_status("test_user_123") for _ in range(5))
+    )
+
+    assert [status["id"] for status in statuses] == [str(application.id)] * 5
+    mock_repository.get_latest.assert_called_once_with("test_user_123")
+
+
+@pytest.mark.asyncio
+async def test_miss_is_written_back_to_redis(cache, mock_repository):
+    application = _application(datetime(2024, 1, 1), status=ApplicationStatus.APPROVED)
+    mock_repository.get_latest.return_value = application
+
+    await LoanApplicationService.get_application_status("test_user_123")
+    cache.local.clear()
+    status = await LoanApplicationService.get_application_status("test_user_123")
+
+    assert status["id"] == str(application.id)
+    assert mock_repository.get_latest.call_count == 1
+    assert cache.codec.decode(cache.store["app_status:test_user_123"][0])["status"] == "approved"
+
+
+@pytest.mark.asyncio
+async def test_unknown_applicant_is_cached_until_the_marker_expires(cache, mock_repository, monkeypatch):
+    monkeypatch.setattr(settings, "STATUS_CACHE_NOT_FOUND_TTL", 0.05)
+
+    assert await LoanApplicationService.get_application_status("nobody") is None
+    assert await LoanApplicationService.get_application_status("nobody") is None
+    assert await cache.get("app_status:nobody") == NOT_FOUND_MARKER
+    assert mock_repository.get_latest.call_count == 1
+
+    await asyncio.sleep(0.1)
+    assert await LoanApplicationService.get_application_status("nobody") is None
+    assert mock_repository.get_latest.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_set_many_if_newer_reports_each_group(monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_L1_ENABLED", True)
+    cache = RedisCache()
+    cache.local.set("b", {"stale": True}, size=1)
+    pipe = MagicMock()
+    pipe.__aenter__.return_value = pipe
+    # One script reply per group, each followed by a PUBLISH per key
+    pipe.execute = AsyncMock(return_value=[1, 0, 0, 0, 0, 0])
+    cache.redis.pipeline = MagicMock(return_value=pipe)
+    cache._set_if_newer = AsyncMock()
+
+    results = await cache.set_many_if_newer([
+        ("version:a", 2.0, {"a": {"id": 1}}),
+        ("version:b", 1.0, {"b": {"id": 2}, "b_raw": b"raw"}),
+        ("version:c", 3.0, {"c": {"id": 3}}),
+    ])
+
+    assert results == [True, False, False]
+    second = cache._set_if_newer.call_args_list[1].kwargs
+    assert second["keys"] == ["version:b", "b", "b_raw"]
+    assert second["args"][:2] == ["1.0", settings.REDIS_TTL] and second["args"][3] == b"raw"
+    # Written groups are cached locally; groups refused drop any local copy
+    assert cache.local.get("a") == {"id": 1}
+    assert "b" not in cache.local._entries
+
+
+
+@pytest.mark.asyncio
+async def test_status_batch_loads_every_miss_in_one_query_and_caches_them(cache, mock_repository, test_app):
+    cached = _application(datetime(2024, 1, 1), applicant_id="cached", status=ApplicationStatus.APPROVED)
+    await LoanApplicationService._store_decision(cached, APPROVED)
+    await cache.set("app_status:unknown", NOT_FOUND_MARKER)
+    loaded = _application(datetime(2024, 1, 1), applicant_id="loaded", status=ApplicationStatus.REJECTED)
+    mock_repository.get_latest_many.return_value = {"loaded": loaded}
+
+    response = test_app.post(
+        "/api/v1/applications/status:batch",
+        json={"applicant_ids": ["cached", "unknown", "loaded", "missing", "cached"]}
+    )
+
+    assert response.status_code == 200
+    applications = response.json()["applications"]
+    assert applications["cached"]["id"] == str(cached.id)
+    assert applications["loaded"]["id"] == str(loaded.id)
+    assert applications["unknown"] is None and applications["missing"] is None
+    mock_repository.get_latest_many.assert_called_once_with(["loaded", "missing"])
+    # Both misses are cached, so the next batch doesn't query at all
+    assert (await cache.get("app_status:loaded"))["id"] == str(loaded.id)
+    assert await cache.get("app_status:missing") == NOT_FOUND_MARKER
+    test_app.post("/api/v1/applications/status:batch", json={"applicant_ids": ["loaded", "missing"]})
+    assert mock_repository.get_latest_many.call_count == 1
+
+
+def _redis_cache(monkeypatch, replies):
+    """A RedisCache with L1, whose pipelines return ``replies``"""
+    monkeypatch.setattr(settings, "CACHE_L1_ENABLED", True)
+    cache = RedisCache()
+    pipe = MagicMock()
+    pipe.__aenter__.return_value = pipe
+    pipe.execute = AsyncMock(return_value=replies)
+    cache.redis.pipeline = MagicMock(return_value=pipe)
+    return cache, pipe
+
+
+@pytest.mark.asyncio
+async def test_get_many_fetches_only_local_misses_with_one_mget(monkeypatch):
+    cache, _ = _redis_cache(monkeypatch, [])
+    cache.local.set("a", {"n": 1}, size=1)
+    cache.redis.mget = AsyncMock(return_value=[cache.codec.encode({"n": 2}), None])
+
+    assert await cache.get_many(["a", "b", "c"]) == [{"n": 1}, {"n": 2}, None]
+    cache.redis.mget.assert_called_once_with(["b", "c"])
+    # The Redis hit is kept locally
+    assert cache.local.get("b") == {"n": 2}
+    assert cache.local.get("c") is MISSING
+
+
+@pytest.mark.asyncio
+async def test_set_many_pipelines_every_key(monkeypatch):
+    # One SET reply and one invalidation PUBLISH per key
+    cache, pipe = _redis_cache(monkeypatch, [True, 1, None, 1])
+    cache.local.set("b", {"stale": True}, size=1)
+
+    results = await cache.set_many({"a": {"n": 1}, "b": {"n": 2}}, expire=60, nx=True)
+
+    assert results == [True, False]
+    assert [call.args[0] for call in pipe.set.call_args_list] == ["a", "b"]
+    assert all(call.kwargs == {"ex": 60, "nx": True} for call in pipe.set.call_args_list)
+    pipe.execute.assert_called_once()
+    assert cache.local.get("a") == {"n": 1}
+    assert cache.local.get("b") is MISSING
+
+
+@pytest.mark.asyncio
+async def test_get_latest_many_searches_recent_partitions_first(monkeypatch):
+    recent = _application(datetime(2024, 1, 2), applicant_id="recent")
+    old = _application(datetime(2020, 1, 1), applicant_id="old")
+    rows = {"recent": recent, "old": old}
+    queries = []
+
+    class Session:
+        async def execute(self, statement):
+            params = statement.compile().params
+            queries.append(params)
+            found = [rows[applicant_id] for applicant_id in params["applicant_ids"] if applicant_id in rows]
+            # The recent partitions only hold the recent application
+            if any(isinstance(value, datetime) for value in params.values()):
+                found = [application for application in found if application is recent]
+            return SimpleNamespace(scalars=lambda: [
+                SimpleNamespace(applicant_id=application.applicant_id, to_domain=lambda a=application: a)
+                for application in found
+            ])
+
+    @asynccontextmanager
+    async def read_session():
+        yield Session()
+
+    monkeypatch.setattr(repository, "read_session", read_session)
+
+    latest = await repository.LoanApplicationRepository().get_latest_many(["recent", "old", "none"])
+
+    assert latest == {"recent": recent, "old": old}
+    # All applicants go in one array parameter; only those not found come back
+    assert [query["applicant_ids"] for query in queries] == [["recent", "old", "none"], ["old", "none"]]
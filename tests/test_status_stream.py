@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.v1.endpoints import applications
+from app.core.config import settings
+from app.infrastructure.cache.status_events import RESYNC, applicant_channel, status_events
+from app.usecases.status_stream import StatusStreamService
+
+
+def _status(application_id, status="approved"):
+    return {"id": application_id, "applicant_id": "test_user_123", "status": status}
+
+
+def _data(event):
+    return json.loads(event.split("data: ", 1)[1])
+
+
+@pytest.mark.asyncio
+async def test_stream_sends_current_status_then_new_decisions(mock_redis):
+    mock_redis.get.return_value = _status("first")
+    events = StatusStreamService.applicant_events("test_user_123")
+
+    assert (await events.__anext__()).startswith("retry: ")
+    assert _data(await events.__anext__()) == _status("first")
+
+    channel = applicant_channel("test_user_123")
+    # The decision already sent is not repeated
+    status_events._dispatch(channel, _status("first"))
+    status_events._dispatch(channel, _status("second", "rejected"))
+    event = await events.__anext__()
+    assert event.startswith("id: second\nevent: status\n")
+    assert _data(event) == _status("second", "rejected")
+
+    # After a lost connection the current state is loaded again
+    mock_redis.get.return_value = _status("third")
+    status_events._resync()
+    assert _data(await events.__anext__()) == _status("third")
+
+    await events.aclose()
+    assert channel not in status_events.subscribers
+
+
+@pytest.mark.asyncio
+async def test_stream_resumes_after_last_event_id(mock_redis, mocker):
+    mocker.patch.object(settings, "STATUS_STREAM_HEARTBEAT_SECONDS", 0.01)
+    mock_redis.get.return_value = _status("first")
+    events = StatusStreamService.applicant_events("test_user_123", last_event_id="first")
+
+    await events.__anext__()
+    # Nothing new since the client's last event, so only heartbeats follow
+    assert await events.__anext__() == ": ping\n\n"
+
+    await events.aclose()
+
+
+@pytest.mark.asyncio
+async def test_slow_subscribers_keep_the_latest_events(mocker):
+    mocker.patch.object(settings, "STATUS_STREAM_QUEUE_SIZE", 2)
+    async with status_events.subscribe("channel") as queue:
+        for index in range(3):
+            status_events._dispatch("channel", index)
+        status_events._resync()
+
+        assert [queue.get_nowait() for _ in range(queue.qsize())] == [2, RESYNC]
+
+
+@pytest.mark.asyncio
+async def test_stream_slot_is_taken_before_responding_and_given_back(monkeypatch):
+    monkeypatch.setattr(settings, "STATUS_STREAM_ENABLED", True)
+    slots = applications._Slots(1)
+    monkeypatch.setattr(applications, "_stream_slots", slots)
+
+    async def events():
+        yield "data: {}\n\n"
+
+    response = applications._event_stream(events())
+    # The second stream is refused before the first has sent anything
+    with pytest.raises(HTTPException) as refused:
+        applications._event_stream(events())
+    assert refused.value.status_code == 503
+
+    async def receive():
+        await asyncio.Event().wait()
+
+    async def send(message):
+        pass
+
+    await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+    assert slots.taken == 0
@@ -0,0 +1,118 @@
+import pytest
+
+from app.core.config import settings
+from app.domain.models import ApplicationStatus, LoanApplicationInDB
+from app.infrastructure.database.write_behind import WriteBehindBuffer
+from app.usecases.application_handlers import LoanApplicationService
+
+
+class FakeRepository:
+    def __init__(self):
+        self.batches = []
+        self.failures = 0
+
+    async def upsert_many(self, applications):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("database down")
+        self.batches.append(list(applications))
+
+
+def _application(**overrides):
+    return LoanApplicationInDB(applicant_id="test_user_123", amount=5000, term_months=12, **overrides)
+
+
+@pytest.fixture
+def buffer(monkeypatch):
+    monkeypatch.setattr(settings, "DB_WRITE_BEHIND_MAX_ROWS", 3)
+    monkeypatch.setattr(settings, "DB_WRITE_BEHIND_FLUSH_INTERVAL_MS", 60000)
+    return WriteBehindBuffer(FakeRepository())
+
+
+@pytest.mark.asyncio
+async def test_flushes_once_full_keeping_the_latest_version(buffer):
+    first = _application()
+    buffer.add(first)
+    buffer.add(first.copy(update={"status": ApplicationStatus.APPROVED}))
+    buffer.add(_application())
+    assert await buffer.flush_if_due() is False
+    assert buffer.repository.batches == [] and len(buffer) == 2
+
+    buffer.add(_application())
+    # Adding never writes; the commit gate does
+    assert buffer.repository.batches == []
+    assert await buffer.flush_if_due() is True
+
+    [batch] = buffer.repository.batches
+    assert len(batch) == 3 and len(buffer) == 0
+    assert batch[0].status == ApplicationStatus.APPROVED
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_puts_rows_back(buffer):
+    older = _application()
+    other = _application()
+    buffer.add(older)
+    buffer.add(other)
+    buffer.repository.failures = 1
+
+    with pytest.raises(ConnectionError):
+        await buffer.flush()
+    assert len(buffer) == 2
+
+    # A version added after the failure is not replaced by the one put back
+    newer = older.copy(update={"status": ApplicationStatus.REJECTED})
+    buffer.repository.failures = 1
+    buffer.add(newer)
+    with pytest.raises(ConnectionError):
+        await buffer.flush()
+    await buffer.flush()
+
+    [batch] = buffer.repository.batches
+    assert {application.id: application.status for application in batch} == {
+        older.id: ApplicationStatus.REJECTED,
+        other.id: ApplicationStatus.PENDING,
+    }
+
+
+@pytest.mark.asyncio
+async def test_flush_if_due_holds_back_offset_commits(buffer, monkeypatch):
+    assert await buffer.flush_if_due() is True
+
+    buffer.add(_application())
+    # Not due yet: nothing is written, so the offsets must wait
+    assert await buffer.flush_if_due() is False
+    assert buffer.repository.batches == []
+
+    monkeypatch.setattr(settings, "DB_WRITE_BEHIND_FLUSH_INTERVAL_MS", 0)
+    buffer.repository.failures = 1
+    with pytest.raises(ConnectionError):
+        await buffer.flush_if_due()
+    assert len(buffer) == 1
+
+    assert await buffer.flush_if_due() is True
+    assert len(buffer.repository.batches) == 1
+
+
+@pytest.mark.asyncio
+async def test_forced_flush_ignores_the_limits(buffer):
+    buffer.add(_application())
+
+    assert await buffer.flush_if_due(force=True) is True
+    assert len(buffer.repository.batches) == 1
+
+
+@pytest.mark.asyncio
+async def test_database_failure_holds_back_commits_without_failing_records(buffer, mocker, mock_redis):
+    mocker.patch("app.usecases.application_handlers.write_behind_buffer", buffer)
+    buffer.repository.failures = 1
+
+    results = await LoanApplicationService.process_applications([_application().dict() for _ in range(4)])
+
+    # Every decision is buffered, so no record is sent to a retry topic
+    assert results == [None] * 4
+    with pytest.raises(ConnectionError):
+        await buffer.flush_if_due()
+    assert len(buffer) == 4
+    assert await buffer.flush_if_due() is True
+    assert len(buffer.repository.batches[0]) == 4